@@ -2,7 +2,13 @@
 # MANOR OF SHADOW - COMPLETE GAME WITH AUTHENTICATION & SAVE SYSTEM
 # =============================================================================
 
-from flask import Flask, render_template, request, session, redirect, url_for, g, flash, jsonify
+from flask import (Flask, render_template, request, session, redirect, url_for, g, flash, jsonify,
+                   has_app_context, has_request_context, make_response, send_from_directory,
+                   before_render_template, template_rendered, Response, stream_with_context)
+from markupsafe import Markup, escape
+from werkzeug.datastructures import MultiDict
+from werkzeug.http import parse_accept_header
+from werkzeug.serving import ThreadedWSGIServer, WSGIRequestHandler
 import sqlite3
 import datetime
 import os
@@ -10,14 +16,200 @@ import random
 import hashlib
 import secrets
 import json
+import queue
+import bisect
+import heapq
+import itertools
+import time
+import re
+import csv
+import io
+import base64
+import atexit
+import hmac
+import math
+import zlib
+import mimetypes
+import click
+import functools
+import signal
+import socket
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+import threading
 
 # =============================================================================
 # FLASK APPLICATION INITIALIZATION
 # =============================================================================
 
 app = Flask(__name__)
-app.secret_key = 'manor_of_shadow_secret_key_2024_enhanced'
-DATABASE = 'manor_of_shadow.db'
+# Development defaults: set MANOR_SECRET_KEY and MANOR_DATABASE in production.
+# create_app() refuses to run with the development key unless DEBUG is on.
+DEVELOPMENT_SECRET_KEY = 'manor_of_shadow_secret_key_2024_enhanced'
+app.secret_key = DEVELOPMENT_SECRET_KEY
+app.config['DATABASE'] = 'manor_of_shadow.db'
+
+# Connection pool settings: one writer plus DB_POOL_SIZE read-only connections
+# per worker process. DB_POOL_SIZE = 0 sends reads through the writer as well.
+app.config['DB_POOL_SIZE'] = int(os.environ.get('MANOR_DB_POOL_SIZE', 4))
+app.config['DB_BUSY_TIMEOUT_MS'] = 5000
+app.config['DB_MMAP_SIZE'] = 64 * 1024 * 1024
+app.config['DB_STATEMENT_CACHE'] = 128
+
+# Per-user game data (players, puzzle_attempts, saves and their rollups) is
+# split over DB_SHARDS files next to DATABASE (name.shard0.db, ...), picked
+# by a hash of user_id; users stay in DATABASE itself. With one shard
+# everything lives in DATABASE. Existing rows are not moved when DB_SHARDS
+# changes: `flask export` them first and `flask import` them afterwards.
+# DB_BACKEND = 'memory' keeps every database in memory (for tests; the data
+# is gone when the pool closes, so not with a multi-worker `flask serve`).
+app.config['DB_SHARDS'] = 1
+app.config['DB_BACKEND'] = 'sqlite'
+
+# In-process leaderboard: how many entries to keep, and how often (seconds)
+# to re-read it so finishes recorded by other worker processes show up.
+app.config['LEADERBOARD_SIZE'] = 20
+app.config['LEADERBOARD_RELOAD_SECONDS'] = 60
+
+# /events/leaderboard (Server-Sent Events). Per worker: the last
+# LEADERBOARD_EVENTS_HISTORY changes are kept for Last-Event-ID resumes, and
+# a client more than LEADERBOARD_EVENTS_BUFFER events behind is disconnected
+# (it reconnects and resumes). While clients are listening the board is
+# re-read every LEADERBOARD_EVENTS_POLL_SECONDS so other workers' finishes
+# are pushed too. Streams end after LEADERBOARD_EVENTS_MAX_SECONDS; browsers
+# reconnect on their own.
+app.config['LEADERBOARD_EVENTS_HISTORY'] = 100
+app.config['LEADERBOARD_EVENTS_BUFFER'] = 16
+app.config['LEADERBOARD_EVENTS_MAX_SUBSCRIBERS'] = 500
+app.config['LEADERBOARD_EVENTS_HEARTBEAT_SECONDS'] = 15
+app.config['LEADERBOARD_EVENTS_POLL_SECONDS'] = 5
+app.config['LEADERBOARD_EVENTS_MAX_SECONDS'] = 300
+
+# Player history pages (keyset pagination on start_time, id)
+app.config['PLAYERS_PAGE_SIZE'] = 20
+app.config['PLAYERS_PAGE_MAX'] = 100
+
+# Write-behind batching for puzzle_attempts. WRITE_BEHIND_SYNC writes every
+# row inline in the calling request instead (handy for tests and debugging).
+app.config['WRITE_BEHIND_SYNC'] = os.environ.get('MANOR_WRITE_BEHIND_SYNC') == '1'
+app.config['ATTEMPT_LOG_BATCH_SIZE'] = 200
+app.config['ATTEMPT_LOG_FLUSH_SECONDS'] = 0.5
+app.config['ATTEMPT_LOG_MAX_PENDING'] = 10000
+
+# Password hashing: PBKDF2-SHA256 on a bounded worker pool. Legacy unsalted
+# sha256 hashes are upgraded the next time their owner logs in.
+app.config['PASSWORD_HASH_ITERATIONS'] = 600000
+app.config['PASSWORD_HASH_WORKERS'] = 4
+app.config['LAST_LOGIN_FLUSH_SECONDS'] = 5
+
+# Player progress cache (per process). 0 entries disables it.
+app.config['PROGRESS_CACHE_MAX_ENTRIES'] = int(os.environ.get('MANOR_PROGRESS_CACHE_SIZE', 10000))
+app.config['PROGRESS_CACHE_TTL_SECONDS'] = 30
+
+# Saves: snapshots kept per save (0 disables history) and how long
+# soft-deleted saves are kept before `flask purge-saves` removes them.
+app.config['SAVE_HISTORY_SIZE'] = 5
+app.config['DELETED_SAVE_RETENTION_DAYS'] = 30
+
+# Retention: `flask archive` moves older rows into ARCHIVE_DATABASE in
+# ARCHIVE_BATCH_SIZE-row transactions, then hands the freed pages back to the
+# filesystem ARCHIVE_VACUUM_PAGES at a time.
+app.config['ARCHIVE_DATABASE'] = 'manor_of_shadow_archive.db'
+app.config['ABANDONED_SESSION_RETENTION_DAYS'] = 30
+app.config['ATTEMPT_RETENTION_DAYS'] = 180
+app.config['ARCHIVE_BATCH_SIZE'] = 500
+app.config['ARCHIVE_VACUUM_PAGES'] = 256
+app.config['ARCHIVE_PAUSE_SECONDS'] = 0.05
+
+# `flask export` and /admin/export/<table>.<ndjson|csv> stream rows in
+# EXPORT_CHUNK_ROWS chunks; `flask import` commits every IMPORT_BATCH_SIZE rows.
+app.config['EXPORT_CHUNK_ROWS'] = 1000
+app.config['IMPORT_BATCH_SIZE'] = 50000
+
+# Quick saves share one rolling slot per user and unchanged states are never
+# rewritten. For QUICK_SAVE_DEBOUNCE_SECONDS after a save, a repeat of the
+# same state is answered from memory without even reading the slot.
+app.config['QUICK_SAVE_SLOT'] = 'QuickSave'
+app.config['QUICK_SAVE_DEBOUNCE_SECONDS'] = 10
+app.config['QUICK_SAVE_TRACKED_USERS'] = 10000
+
+# Fingerprinted assets written by build_assets.py
+app.config['ASSET_MANIFEST'] = os.path.join(app.static_folder, 'dist', 'manifest.json')
+app.config['IMMUTABLE_MAX_AGE'] = 365 * 24 * 3600
+# Responsive image variants written by build_images.py
+app.config['IMAGE_MANIFEST'] = os.path.join(app.static_folder, 'images', 'variants', 'manifest.json')
+
+# Rendered room fragments kept per process (keyed by puzzle inputs; room3
+# and final render one fragment per puzzle variant)
+app.config['ROOM_FRAGMENT_CACHE_SIZE'] = 512
+
+# Answer POSTs per (player, room): burst answers at once, then `rate` more
+# per second. Room name -> [rate, burst]; a missing room or a rate of 0 is
+# not throttled. Starting a game over gives no fresh bucket, and new games
+# (POST /) have their own [rate, burst] per player. Limits are per worker
+# process, and the idlest of the ANSWER_RATE_LIMIT_BUCKETS tracked buckets
+# are forgotten first.
+app.config['ANSWER_RATE_LIMITS'] = {
+    'room1': [1, 10],
+    'room2': [1, 10],
+    'room3': [1, 10],
+    'final': [1, 10],
+}
+app.config['NEW_GAME_RATE_LIMIT'] = [0.2, 5]
+app.config['ANSWER_RATE_LIMIT_BUCKETS'] = 100000
+
+# Usernames allowed to open /admin/stats (MANOR_ADMIN_USERNAMES='["alice"]')
+app.config['ADMIN_USERNAMES'] = []
+
+# Room3/final puzzle variants written by build_puzzles.py. Until it has been
+# run, the built-in LABORATORY_PATTERNS and CONTROL_CLUES are the only variants.
+app.config['PUZZLE_STORE'] = os.path.join(app.root_path, 'puzzle_variants.json')
+
+# Response compression (CompressionMiddleware). zstd and br are only offered
+# when the zstandard / brotli packages are installed.
+app.config['COMPRESSION_ENABLED'] = True
+app.config['COMPRESSION_MIN_SIZE'] = 500
+app.config['COMPRESSION_MIMETYPES'] = [
+    'text/html', 'text/css', 'text/plain', 'text/csv', 'text/javascript',
+    'application/javascript', 'application/json', 'application/x-ndjson',
+    'image/svg+xml',
+]
+app.config['COMPRESSION_PREFERENCE'] = ['zstd', 'br', 'gzip']
+app.config['COMPRESSION_GZIP_LEVEL'] = 6
+app.config['COMPRESSION_BROTLI_QUALITY'] = 4
+app.config['COMPRESSION_ZSTD_LEVEL'] = 3
+
+# Request, template and SQL timings exported at /metrics (per process).
+# Statements slower than SLOW_QUERY_MS are logged; 0 turns the log off.
+# METRICS_MAX_QUERIES caps the distinct query names (verb and table) tracked.
+# /metrics and /api/stats/cache answer loopback clients only, unless
+# METRICS_TOKEN is set: then any client sending "Authorization: Bearer <token>".
+app.config['METRICS_ENABLED'] = os.environ.get('MANOR_METRICS', '1') == '1'
+app.config['METRICS_TOKEN'] = os.environ.get('MANOR_METRICS_TOKEN') or None
+app.config['SLOW_QUERY_MS'] = float(os.environ.get('MANOR_SLOW_QUERY_MS', 100))
+app.config['METRICS_REQUEST_BUCKETS'] = [0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                                         0.1, 0.25, 0.5, 1.0, 2.5, 5.0]
+app.config['METRICS_SQL_BUCKETS'] = [0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005,
+                                     0.01, 0.025, 0.05, 0.1, 0.25, 1.0]
+app.config['METRICS_MAX_QUERIES'] = 100
+
+# `flask serve`: idle keep-alive connections are closed after this many
+# seconds, which also bounds how long a graceful shutdown waits for them.
+app.config['SERVE_KEEPALIVE_SECONDS'] = 5
+
+# Any setting above can be overridden with a MANOR_<NAME> environment variable;
+# values are parsed as JSON when possible (MANOR_DB_POOL_SIZE=8, MANOR_DEBUG=true).
+app.config.from_prefixed_env('MANOR')
 
 # =============================================================================
 # PUZZLE CONFIGURATIONS
@@ -51,115 +243,1087 @@ CONTROL_CLUES = [
     "The Green System owner is the Mechanic"
 ]
 
+CONTROL_SOLUTION = {
+    'red_system': 'plumber',
+    'blue_system': 'electrician',
+    'green_system': 'mechanic',
+    'alex_role': 'electrician',
+    'sam_role': 'mechanic',
+    'taylor_role': 'plumber'
+}
+
+# =============================================================================
+# METRICS
+# =============================================================================
+# Request, template and SQL timings in the Prometheus text format. Every
+# worker process keeps its own numbers; scrape each worker's /metrics.
+
+METRIC_FAMILIES = {
+    'http_request_duration_seconds': ('histogram', 'Time to produce a response, by endpoint.'),
+    'http_requests_total': ('counter', 'Responses sent, by endpoint and status.'),
+    'http_request_sql_seconds': ('histogram', 'Time spent in SQL while handling one request, by endpoint.'),
+    'http_request_sql_statements': ('histogram', 'SQL statements run while handling one request, by endpoint.'),
+    'template_render_seconds': ('histogram', 'Jinja render time, by template.'),
+    'sql_query_duration_seconds': ('histogram', 'Statement execution time, by query name (verb and table).'),
+    'sql_commit_duration_seconds': ('histogram', 'COMMIT time on pooled connections.'),
+    'sql_slow_queries_total': ('counter', 'Statements slower than SLOW_QUERY_MS, by query name.'),
+}
+STATEMENT_COUNT_BUCKETS = [0, 1, 2, 3, 5, 10, 20, 50, 100]
+
+_SQL_VERB = re.compile(r'\b(INSERT|REPLACE|UPDATE|DELETE)\b', re.IGNORECASE)
+_SQL_TABLE = {
+    'SELECT': re.compile(r'\bFROM\s+(\w+)', re.IGNORECASE),
+    'INSERT': re.compile(r'\bINTO\s+(\w+)', re.IGNORECASE),
+    'REPLACE': re.compile(r'\bINTO\s+(\w+)', re.IGNORECASE),
+    'UPDATE': re.compile(r'\bUPDATE\s+(?:OR\s+\w+\s+)?(\w+)', re.IGNORECASE),
+    'DELETE': re.compile(r'\bFROM\s+(\w+)', re.IGNORECASE),
+}
+
+@functools.lru_cache(maxsize=1024)
+def query_name(sql):
+    """Label a statement by verb and main table, e.g. 'SELECT players'.
+
+    DDL, PRAGMA and transaction control all share the label 'other', so the
+    label set is bounded by the schema rather than by the SQL text.
+    """
+    words = sql.split(None, 1)
+    verb = words[0].upper() if words else ''
+    if verb == 'WITH':
+        match = _SQL_VERB.search(sql)
+        verb = match.group(1).upper() if match else 'SELECT'
+    if verb not in _SQL_TABLE:
+        return 'other'
+    match = _SQL_TABLE[verb].search(sql)
+    return f'{verb} {match.group(1)}' if match else verb
+
+class Histogram:
+    """Latency histogram with Prometheus (cumulative, le-inclusive) buckets."""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+class Metrics:
+    """Histograms and counters keyed by (family, labels), plus per-thread
+    accounting of the SQL run by the request the thread is handling."""
+
+    def __init__(self, request_buckets, sql_buckets, max_queries=200):
+        self.request_buckets = request_buckets
+        self.sql_buckets = sql_buckets
+        self.max_queries = max_queries
+        self._histograms = {}
+        self._counters = {}
+        self._queries = set()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def observe(self, family, labels, value, buckets):
+        key = (family, labels)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(buckets)
+            histogram.observe(value)
+
+    def increment(self, family, labels, amount=1):
+        key = (family, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def query_label(self, sql):
+        label = query_name(sql)
+        with self._lock:
+            if label in self._queries:
+                return label
+            if len(self._queries) >= self.max_queries:
+                # Keep the label set bounded if statements are built dynamically
+                return 'other'
+            self._queries.add(label)
+            return label
+
+    def start_request(self):
+        self._local.statements = 0
+        self._local.sql_seconds = 0.0
+
+    def request_sql(self):
+        return getattr(self._local, 'statements', 0), getattr(self._local, 'sql_seconds', 0.0)
+
+    def count_statement(self, statement):
+        # set_trace_callback hook: sees every statement SQLite actually runs,
+        # including each row of an executemany()
+        self._local.statements = getattr(self._local, 'statements', 0) + 1
+
+    def record_query(self, sql, elapsed):
+        label = self.query_label(sql)
+        self.observe('sql_query_duration_seconds', (('query', label),), elapsed, self.sql_buckets)
+        self._local.sql_seconds = getattr(self._local, 'sql_seconds', 0.0) + elapsed
+        slow_ms = app.config['SLOW_QUERY_MS']
+        if slow_ms and elapsed * 1000 >= slow_ms:
+            self.increment('sql_slow_queries_total', (('query', label),))
+            # Parameters are left out on purpose: they include password hashes
+            app.logger.warning('slow query (%.1f ms) on %s: %s', elapsed * 1000,
+                               request.endpoint if has_request_context() else 'background',
+                               ' '.join(sql.split()))
+
+    def record_commit(self, elapsed):
+        self.observe('sql_commit_duration_seconds', (), elapsed, self.sql_buckets)
+        self._local.sql_seconds = getattr(self._local, 'sql_seconds', 0.0) + elapsed
+
+    def render(self, extra=()):
+        """Prometheus text exposition; ``extra`` adds (name, type, help, labels, value) samples."""
+        with self._lock:
+            histograms = {key: (list(h.buckets), list(h.counts), h.count, h.sum)
+                          for key, h in self._histograms.items()}
+            counters = dict(self._counters)
+
+        families = {}
+        for (family, labels), value in list(histograms.items()) + list(counters.items()):
+            families.setdefault(family, []).append((labels, value))
+        lines = []
+        for family in sorted(families):
+            kind, help_text = METRIC_FAMILIES[family]
+            name = f'manor_{family}'
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+            for labels, value in sorted(families[family]):
+                if kind != 'histogram':
+                    lines.append(f'{name}{_format_labels(labels)} {_format_value(value)}')
+                    continue
+                buckets, counts, count, total = value
+                cumulative = 0
+                for bound, bucket_count in zip(buckets + [float('inf')], counts):
+                    cumulative += bucket_count
+                    lines.append(f'{name}_bucket{_format_labels(labels + (("le", bound),))} {cumulative}')
+                lines.append(f'{name}_sum{_format_labels(labels)} {_format_value(total)}')
+                lines.append(f'{name}_count{_format_labels(labels)} {count}')
+
+        described = set()
+        for name, kind, help_text, labels, value in extra:
+            if name not in described:
+                described.add(name)
+                lines.append(f'# HELP manor_{name} {help_text}')
+                lines.append(f'# TYPE manor_{name} {kind}')
+            lines.append(f'manor_{name}{_format_labels(labels)} {_format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+def _format_value(value):
+    if isinstance(value, float):
+        if value == float('inf'):
+            return '+Inf'
+        return repr(value)
+    return str(value)
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    pairs = []
+    for key, value in labels:
+        value = _format_value(value) if key == 'le' else str(value)
+        value = value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        pairs.append(f'{key}="{value}"')
+    return '{' + ','.join(pairs) + '}'
+
+metrics = Metrics(app.config['METRICS_REQUEST_BUCKETS'], app.config['METRICS_SQL_BUCKETS'],
+                  app.config['METRICS_MAX_QUERIES'])
+
+class TracedCursor(sqlite3.Cursor):
+    """Cursor that times execute()/executemany() into ``metrics``."""
+
+    def execute(self, sql, parameters=()):
+        started = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            metrics.record_query(sql, time.perf_counter() - started)
+
+    def executemany(self, sql, seq_of_parameters):
+        started = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            metrics.record_query(sql, time.perf_counter() - started)
+
+class TracedConnection(sqlite3.Connection):
+    """Connection whose statements and commits are timed into ``metrics``."""
+
+    def cursor(self, factory=TracedCursor):
+        return super().cursor(factory)
+
+    # The built-in shortcuts bypass an overridden cursor(), so route them
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def commit(self):
+        started = time.perf_counter()
+        try:
+            super().commit()
+        finally:
+            metrics.record_commit(time.perf_counter() - started)
+
+@app.before_request
+def start_request_timer():
+    if app.config['METRICS_ENABLED']:
+        g._request_started = time.perf_counter()
+        metrics.start_request()
+
+@app.after_request
+def record_request_metrics(response):
+    started = g.pop('_request_started', None)
+    if started is None:
+        return response
+    endpoint = (('endpoint', request.endpoint or 'unmatched'),)
+    metrics.observe('http_request_duration_seconds', endpoint + (('method', request.method),),
+                    time.perf_counter() - started, metrics.request_buckets)
+    metrics.increment('http_requests_total', endpoint + (('method', request.method),
+                                                         ('status', response.status_code)))
+    statements, sql_seconds = metrics.request_sql()
+    metrics.observe('http_request_sql_statements', endpoint, statements, STATEMENT_COUNT_BUCKETS)
+    metrics.observe('http_request_sql_seconds', endpoint, sql_seconds, metrics.request_buckets)
+    return response
+
+def _template_started(sender, template, context, **extra):
+    if app.config['METRICS_ENABLED']:
+        g.setdefault('_template_timers', []).append(time.perf_counter())
+
+def _template_finished(sender, template, context, **extra):
+    timers = g.get('_template_timers')
+    if timers:
+        metrics.observe('template_render_seconds', (('template', template.name),),
+                        time.perf_counter() - timers.pop(), metrics.request_buckets)
+
+before_render_template.connect(_template_started, app)
+template_rendered.connect(_template_finished, app)
+
 # =============================================================================
 # DATABASE FUNCTIONS
 # =============================================================================
 
-def get_db():
-    db = getattr(g, '_database', None)
-    if db is None:
-        db = g._database = sqlite3.connect(DATABASE)
-        db.row_factory = sqlite3.Row
-    return db
+class ConnectionPool:
+    """Long-lived SQLite connections shared by the requests of one process.
+
+    SQLite allows a single writer at a time, so there is exactly one writer
+    connection; reads are served by up to ``read_size`` read-only connections
+    which, in WAL mode, never block on (or block) the writer.
+    """
+
+    def __init__(self, database, read_size=4, busy_timeout_ms=5000,
+                 mmap_size=0, statement_cache=128):
+        self.database = database
+        self.read_size = read_size
+        self.busy_timeout_ms = busy_timeout_ms
+        self.mmap_size = mmap_size
+        self.statement_cache = statement_cache
+        self._writer = queue.LifoQueue(maxsize=1)
+        self._readers = queue.LifoQueue(maxsize=max(read_size, 1))
+        self._lock = threading.Lock()
+        self._connections = []
+        self._reader_count = 0
+
+        # The writer is opened first so WAL mode (and the -shm file the
+        # read-only connections depend on) exists before any reader.
+        self._writer.put(self._connect(read_only=False))
+
+    def _connect(self, read_only):
+        traced = app.config['METRICS_ENABLED']
+        factory = TracedConnection if traced else sqlite3.Connection
+        if read_only:
+            conn = sqlite3.connect(f'file:{self.database}?mode=ro', uri=True,
+                                   check_same_thread=False, factory=factory,
+                                   cached_statements=self.statement_cache)
+        else:
+            conn = sqlite3.connect(self.database, uri=self.database.startswith('file:'),
+                                   check_same_thread=False, factory=factory,
+                                   cached_statements=self.statement_cache)
+        if traced:
+            conn.set_trace_callback(metrics.count_statement)
+        conn.row_factory = sqlite3.Row
+        conn.execute(f'PRAGMA busy_timeout = {int(self.busy_timeout_ms)}')
+        if not read_only:
+            # Only applies to a new, empty file, and only before WAL mode
+            # writes the header; lets `flask archive` shrink the database
+            conn.execute('PRAGMA auto_vacuum = INCREMENTAL')
+            conn.execute('PRAGMA journal_mode = WAL')
+        conn.execute('PRAGMA synchronous = NORMAL')
+        if self.mmap_size:
+            conn.execute(f'PRAGMA mmap_size = {int(self.mmap_size)}')
+        with self._lock:
+            self._connections.append(conn)
+        return conn
+
+    def _timeout(self):
+        return self.busy_timeout_ms / 1000.0
+
+    def acquire_writer(self):
+        try:
+            return self._writer.get(timeout=self._timeout())
+        except queue.Empty:
+            raise sqlite3.OperationalError('database is locked (writer connection busy)')
+
+    def release_writer(self, conn):
+        if conn.in_transaction:
+            conn.rollback()
+        self._writer.put(conn)
+
+    def acquire_reader(self):
+        try:
+            return self._readers.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            can_grow = self._reader_count < self.read_size
+            if can_grow:
+                self._reader_count += 1
+        if can_grow:
+            return self._connect(read_only=True)
+        try:
+            return self._readers.get(timeout=self._timeout())
+        except queue.Empty:
+            raise sqlite3.OperationalError('database is locked (no read connection available)')
+
+    def release_reader(self, conn):
+        if conn.in_transaction:
+            conn.rollback()
+        self._readers.put(conn)
+
+    def close(self):
+        with self._lock:
+            connections, self._connections = self._connections, []
+            self._reader_count = 0
+        for conn in connections:
+            conn.close()
+
+def shard_database(database, index):
+    root, extension = os.path.splitext(database)
+    return f'{root}.shard{index}{extension or ".db"}'
+
+class ShardedStorage:
+    """Routes each table to its database: ``users`` and profiles to the global
+    one, per-user game data to one of ``shards`` databases picked by user_id.
+
+    Every database has its own pool, so each has its own writer lock. With a
+    single shard the global database holds everything and both roles share
+    one pool, which keeps transactions exactly as they were.
+    """
+
+    def __init__(self, database, shards=1, backend='sqlite', **pool_options):
+        self.shard_count = max(int(shards), 1)
+        self.global_pool = self._open(database, backend, pool_options)
+        if self.shard_count == 1:
+            self.shard_pools = [self.global_pool]
+        else:
+            self.shard_pools = [self._open(shard_database(database, index), backend, pool_options)
+                                for index in range(self.shard_count)]
+
+    @staticmethod
+    def _open(database, backend, pool_options):
+        if backend == 'memory':
+            # A shared-cache memory database lives as long as its writer
+            # connection; read-only connections cannot open one
+            name = os.path.splitext(os.path.basename(database))[0]
+            return ConnectionPool(f'file:{name}?mode=memory&cache=shared',
+                                  **dict(pool_options, read_size=0))
+        return ConnectionPool(database, **pool_options)
+
+    def shard_for_user(self, user_id):
+        if self.shard_count == 1 or user_id is None:
+            return 0
+        # crc32, unlike hash(), gives every process the same answer
+        return zlib.crc32(str(user_id).encode()) % self.shard_count
+
+    def shards(self):
+        return range(self.shard_count)
+
+    def pool(self, shard=None):
+        return self.global_pool if shard is None else self.shard_pools[shard]
+
+    def pools(self):
+        """Each distinct pool once, the global one first."""
+        return list(dict.fromkeys([self.global_pool] + self.shard_pools))
+
+    def close(self):
+        for pool in self.pools():
+            pool.close()
+
+_storage = None
+_storage_lock = threading.Lock()
+
+def get_storage():
+    global _storage
+    if _storage is None:
+        with _storage_lock:
+            if _storage is None:
+                _storage = ShardedStorage(
+                    app.config['DATABASE'],
+                    shards=app.config['DB_SHARDS'],
+                    backend=app.config['DB_BACKEND'],
+                    read_size=app.config['DB_POOL_SIZE'],
+                    busy_timeout_ms=app.config['DB_BUSY_TIMEOUT_MS'],
+                    mmap_size=app.config['DB_MMAP_SIZE'],
+                    statement_cache=app.config['DB_STATEMENT_CACHE'])
+    return _storage
+
+def get_pool(shard=None):
+    """The global database's pool, or the pool of ``shard``."""
+    return get_storage().pool(shard)
+
+def close_pool():
+    """Close every connection of every database."""
+    global _storage
+    with _storage_lock:
+        if _storage is not None:
+            _storage.close()
+            _storage = None
+
+def get_db(shard=None):
+    """Writer connection held for the rest of the request (global database by default)."""
+    pool = get_pool(shard)
+    writers = g.setdefault('_writers', {})
+    if pool not in writers:
+        writers[pool] = pool.acquire_writer()
+    return writers[pool]
+
+def get_read_db(shard=None):
+    pool = get_pool(shard)
+    if pool.read_size <= 0:
+        return get_db(shard)
+    readers = g.setdefault('_readers', {})
+    if pool not in readers:
+        readers[pool] = pool.acquire_reader()
+    return readers[pool]
+
+def get_user_db(user_id):
+    """Writer for the shard holding ``user_id``'s game data."""
+    return get_db(get_storage().shard_for_user(user_id))
+
+def get_user_read_db(user_id):
+    return get_read_db(get_storage().shard_for_user(user_id))
+
+def shard_read_dbs():
+    """One read connection per shard, for queries that span every user."""
+    return [get_read_db(shard) for shard in get_storage().shards()]
+
+# =============================================================================
+# SCHEMA MIGRATIONS
+# =============================================================================
+# Each migration runs once, in order, inside its own transaction. The schema
+# version is kept in PRAGMA user_version, so existing databases are upgraded
+# at startup. Never edit a shipped migration - append a new one instead.
+
+def _migration_001_base_schema(cursor):
+    # Players table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS players (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            session_id TEXT UNIQUE NOT NULL,
+            player_name TEXT NOT NULL,
+            user_id INTEGER,
+            start_time TEXT NOT NULL,
+            end_time TEXT,
+            total_time TEXT,
+            room1_complete BOOLEAN DEFAULT 0,
+            room2_complete BOOLEAN DEFAULT 0,
+            room3_complete BOOLEAN DEFAULT 0,
+            final_complete BOOLEAN DEFAULT 0,
+            created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+    ''')
+    
+    # Puzzle attempts table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS puzzle_attempts (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            session_id TEXT NOT NULL,
+            player_name TEXT NOT NULL,
+            user_id INTEGER,
+            room_name TEXT NOT NULL,
+            attempt TEXT NOT NULL,
+            is_correct BOOLEAN DEFAULT 0,
+            attempted_at TEXT DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+    ''')
+    
+    # Users table for authentication
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT UNIQUE NOT NULL,
+            password_hash TEXT NOT NULL,
+            email TEXT,
+            created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+            last_login TEXT
+        )
+    ''')
+    
+    # User profiles table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS user_profiles (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER UNIQUE NOT NULL,
+            display_name TEXT,
+            avatar_url TEXT,
+            bio TEXT,
+            preferences TEXT,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+    ''')
+    
+    # Saved games table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS saved_games (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            save_name TEXT NOT NULL,
+            session_id TEXT NOT NULL,
+            player_name TEXT NOT NULL,
+            current_room TEXT NOT NULL,
+            game_data TEXT NOT NULL,
+            created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+            last_updated TEXT DEFAULT CURRENT_TIMESTAMP,
+            is_active BOOLEAN DEFAULT 1,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+    ''')
+
+def _migration_002_hot_query_indexes(cursor):
+    # get_player_progress is already served by the UNIQUE index on
+    # players.session_id, and authenticate_user by the one on users.username.
+
+    # get_leaderboard: partial covering index, already in ORDER BY order
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_players_leaderboard
+        ON players (total_time, player_name, start_time, end_time)
+        WHERE final_complete = 1
+    ''')
+
+    # get_all_players: newest sessions first, id breaks start_time ties
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_players_start_time
+        ON players (start_time DESC, id DESC)
+    ''')
+
+    # get_user_saves / save_game: active saves of one user, newest first
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_saved_games_user_active
+        ON saved_games (user_id, last_updated DESC, save_name, current_room, created_at)
+        WHERE is_active = 1
+    ''')
+
+    # puzzle_attempts lookups per game session and per user
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_puzzle_attempts_session_room
+        ON puzzle_attempts (session_id, room_name, is_correct)
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_puzzle_attempts_user_room
+        ON puzzle_attempts (user_id, room_name, is_correct)
+    ''')
+
+_DURATION_PATTERN = re.compile(r'^(?:(-?\d+) days?, )?(\d+):(\d{2}):(\d{2})(?:\.(\d+))?$')
+
+def parse_duration_ms(text):
+    """Turn a ``str(timedelta)`` value such as '1 day, 0:03:20' into milliseconds."""
+    match = _DURATION_PATTERN.match((text or '').strip())
+    if not match:
+        return None
+    days, hours, minutes, seconds, fraction = match.groups()
+    total_seconds = int(days or 0) * 86400 + int(hours) * 3600 + int(minutes) * 60 + int(seconds)
+    millis = int((fraction or '0')[:3].ljust(3, '0'))
+    return total_seconds * 1000 + millis
+
+def _migration_003_numeric_total_time(cursor):
+    cursor.execute('ALTER TABLE players ADD COLUMN total_time_ms INTEGER')
+
+    cursor.execute('SELECT id, total_time FROM players WHERE total_time IS NOT NULL')
+    backfill = [(parse_duration_ms(row[1]), row[0]) for row in cursor.fetchall()]
+    cursor.executemany('UPDATE players SET total_time_ms = ? WHERE id = ?', backfill)
+
+    # The TEXT index sorted '10:00:00' before '9:00:00'; rank by milliseconds
+    cursor.execute('DROP INDEX IF EXISTS idx_players_leaderboard')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_players_leaderboard_ms
+        ON players (total_time_ms, id, player_name, total_time, start_time, end_time)
+        WHERE final_complete = 1 AND total_time_ms IS NOT NULL
+    ''')
+
+def _migration_004_unique_active_saves(cursor):
+    # Concurrent saves could race into duplicate active rows; keep the newest
+    cursor.execute('''
+        UPDATE saved_games SET is_active = 0
+        WHERE is_active = 1 AND id NOT IN (
+            SELECT MAX(id) FROM saved_games WHERE is_active = 1
+            GROUP BY user_id, save_name
+        )
+    ''')
+    cursor.execute('''
+        CREATE UNIQUE INDEX IF NOT EXISTS ux_saved_games_active_name
+        ON saved_games (user_id, save_name)
+        WHERE is_active = 1
+    ''')
+    
+    # Ring buffer of the last SAVE_HISTORY_SIZE snapshots of each save
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS saved_game_history (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            save_name TEXT NOT NULL,
+            current_room TEXT NOT NULL,
+            game_data TEXT NOT NULL,
+            saved_at TEXT NOT NULL,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_saved_game_history_save
+        ON saved_game_history (user_id, save_name, id)
+    ''')
+    
+    # purge_deleted_saves: soft-deleted rows by age
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_saved_games_deleted
+        ON saved_games (last_updated)
+        WHERE is_active = 0
+    ''')
+
+def _migration_005_analytics_rollups(cursor):
+    # Running totals kept current by the attempt writer and
+    # complete_player_game; `flask rebuild-rollups` fills them from history
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS room_daily_stats (
+            day TEXT NOT NULL,
+            room_name TEXT NOT NULL,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            correct INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (day, room_name)
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS user_room_stats (
+            user_id INTEGER NOT NULL,
+            room_name TEXT NOT NULL,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            correct INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (user_id, room_name)
+        ) WITHOUT ROWID
+    ''')
+    # How many attempts sessions needed to solve each room (a histogram)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS room_solve_attempts (
+            room_name TEXT NOT NULL,
+            attempts INTEGER NOT NULL,
+            sessions INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (room_name, attempts)
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS daily_completions (
+            day TEXT PRIMARY KEY,
+            completions INTEGER NOT NULL DEFAULT 0,
+            total_time_ms INTEGER NOT NULL DEFAULT 0,
+            best_time_ms INTEGER
+        ) WITHOUT ROWID
+    ''')
+    # Bookkeeping for a rebuild in progress
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS rollup_state (
+            name TEXT PRIMARY KEY,
+            value INTEGER NOT NULL
+        )
+    ''')
+
+def _migration_006_user_stats(cursor):
+    # One row per player account for the profile page, kept current by
+    # create_player_session and complete_player_game. Per-room attempt
+    # counts come from user_room_stats, which init_db() fills from history
+    # (rebuild_rollups) when this migration or 005 has just been applied.
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS user_stats (
+            user_id INTEGER PRIMARY KEY,
+            games_started INTEGER NOT NULL DEFAULT 0,
+            games_completed INTEGER NOT NULL DEFAULT 0,
+            best_time_ms INTEGER,
+            total_time_ms INTEGER NOT NULL DEFAULT 0,
+            last_played_at TEXT
+        )
+    ''')
+    # One-time backfill from the games already played
+    cursor.execute('''
+        INSERT OR REPLACE INTO user_stats (user_id, games_started, games_completed, best_time_ms,
+                                           total_time_ms, last_played_at)
+        SELECT user_id, COUNT(*),
+               COUNT(CASE WHEN final_complete = 1 THEN total_time_ms END),
+               MIN(CASE WHEN final_complete = 1 THEN total_time_ms END),
+               COALESCE(SUM(CASE WHEN final_complete = 1 THEN total_time_ms END), 0),
+               MAX(start_time)
+        FROM players
+        WHERE user_id IS NOT NULL
+        GROUP BY user_id
+    ''')
+
+MIGRATIONS = [
+    (1, 'base schema', _migration_001_base_schema),
+    (2, 'indexes for hot queries', _migration_002_hot_query_indexes),
+    (3, 'numeric total_time_ms column', _migration_003_numeric_total_time),
+    (4, 'unique active save names and save history', _migration_004_unique_active_saves),
+    (5, 'analytics rollup tables', _migration_005_analytics_rollups),
+    (6, 'per-user stats', _migration_006_user_stats),
+]
+
+def get_schema_version(db):
+    return db.execute('PRAGMA user_version').fetchone()[0]
+
+def migrate_db(db, target=None):
+    """Apply pending migrations up to ``target`` (default: latest).
+
+    Returns the list of versions that were applied.
+    """
+    applied = []
+    current = get_schema_version(db)
+    for version, description, migration in MIGRATIONS:
+        if version <= current or (target is not None and version > target):
+            continue
+        cursor = db.cursor()
+        cursor.execute('BEGIN IMMEDIATE')
+        try:
+            migration(cursor)
+            cursor.execute(f'PRAGMA user_version = {int(version)}')
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        applied.append(version)
+    if applied:
+        db.execute('PRAGMA optimize')
+    return applied
+
+# Migrations that add rollup tables; the games already played are counted
+# into them by a full rebuild right after they are applied
+ROLLUP_MIGRATIONS = {5, 6}
 
 def init_db():
+    # Every database gets the whole schema; the tables a database does not
+    # own simply stay empty
     with app.app_context():
-        db = get_db()
-        cursor = db.cursor()
-        
-        # Players table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS players (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                session_id TEXT UNIQUE NOT NULL,
-                player_name TEXT NOT NULL,
-                user_id INTEGER,
-                start_time TEXT NOT NULL,
-                end_time TEXT,
-                total_time TEXT,
-                room1_complete BOOLEAN DEFAULT 0,
-                room2_complete BOOLEAN DEFAULT 0,
-                room3_complete BOOLEAN DEFAULT 0,
-                final_complete BOOLEAN DEFAULT 0,
-                created_at TEXT DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (user_id) REFERENCES users (id)
-            )
-        ''')
-        
-        # Puzzle attempts table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS puzzle_attempts (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                session_id TEXT NOT NULL,
-                player_name TEXT NOT NULL,
-                user_id INTEGER,
-                room_name TEXT NOT NULL,
-                attempt TEXT NOT NULL,
-                is_correct BOOLEAN DEFAULT 0,
-                attempted_at TEXT DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (user_id) REFERENCES users (id)
-            )
-        ''')
-        
-        # Users table for authentication
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS users (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                username TEXT UNIQUE NOT NULL,
-                password_hash TEXT NOT NULL,
-                email TEXT,
-                created_at TEXT DEFAULT CURRENT_TIMESTAMP,
-                last_login TEXT
-            )
-        ''')
-        
-        # User profiles table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS user_profiles (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER UNIQUE NOT NULL,
-                display_name TEXT,
-                avatar_url TEXT,
-                bio TEXT,
-                preferences TEXT,
-                FOREIGN KEY (user_id) REFERENCES users (id)
-            )
-        ''')
-        
-        # Saved games table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS saved_games (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER NOT NULL,
-                save_name TEXT NOT NULL,
-                session_id TEXT NOT NULL,
-                player_name TEXT NOT NULL,
-                current_room TEXT NOT NULL,
-                game_data TEXT NOT NULL,
-                created_at TEXT DEFAULT CURRENT_TIMESTAMP,
-                last_updated TEXT DEFAULT CURRENT_TIMESTAMP,
-                is_active BOOLEAN DEFAULT 1,
-                FOREIGN KEY (user_id) REFERENCES users (id)
-            )
-        ''')
-        
-        db.commit()
+        applied = migrate_db(get_db())
+        rebuild = bool(ROLLUP_MIGRATIONS.intersection(applied))
+        for shard in get_storage().shards():
+            rebuild |= bool(ROLLUP_MIGRATIONS.intersection(migrate_db(get_db(shard))))
+        leaderboard_cache.load(shard_read_dbs())
+    if rebuild:
+        # Outside the app context: the rebuild takes each shard's writer itself
+        rebuild_rollups()
+    return applied
+
+# =============================================================================
+# WRITE-BEHIND QUEUES
+# =============================================================================
+
+_WAKE_UP = object()
+
+class WriteBehindQueue:
+    """Collects rows in memory and writes them in batches from a background thread.
+
+    ``flush(db, items)`` is called with the writer connection and a list of
+    queued items; the queue commits after it returns. A batch is written once
+    ``batch_size`` items are waiting or ``flush_interval`` seconds have passed
+    since the first of them arrived. When ``max_pending`` items are already
+    queued, submit() blocks for up to ``put_timeout`` seconds and then writes
+    the item inline, so a slow disk slows callers down instead of losing rows.
+    A batch that fails with sqlite3.OperationalError (a busy writer, a locked
+    or unavailable file) goes back to the front of the queue and is retried
+    with backoff up to ``retry_max_seconds`` apart; only other errors, which
+    no retry can fix, drop the batch. With ``user_key(item)`` each batch is
+    split by shard and written to the shard databases; without it, items go
+    to the global database.
+    """
+
+    def __init__(self, name, flush, batch_size=200, flush_interval=0.5,
+                 max_pending=10000, put_timeout=1.0, user_key=None, retry_max_seconds=5.0):
+        self.name = name
+        self._flush = flush
+        self._user_key = user_key
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.put_timeout = put_timeout
+        self.retry_max_seconds = retry_max_seconds
+        self._queue = queue.Queue(maxsize=max_pending)
+        # Items from failed batches, written again before anything queued after them
+        self._retry = deque()
+        self._retry_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self.written = 0
+        self.batches = 0
+        self.inline_writes = 0
+        self.retries = 0
+        self.failed = 0
+
+    def pending(self):
+        return self._queue.qsize() + len(self._retry)
+
+    def submit(self, item):
+        if app.config['WRITE_BEHIND_SYNC']:
+            self._write_inline(item)
+            return
+        self._ensure_started()
+        try:
+            self._queue.put(item, timeout=self.put_timeout)
+        except queue.Full:
+            self.inline_writes += 1
+            self._write_inline(item)
+
+    def _write_inline(self, item):
+        if self._write([item]):
+            # Leave it to the background thread's retries
+            self._requeue([item])
+            self._ensure_started()
+
+    def _ensure_started(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stop.clear()
+                self._thread = threading.Thread(target=self._run, name=f'write-behind-{self.name}',
+                                                daemon=True)
+                self._thread.start()
+
+    def _take_batch(self, wait):
+        with self._retry_lock:
+            if self._retry:
+                return [self._retry.popleft() for _ in range(min(self.batch_size, len(self._retry)))]
+        while True:
+            try:
+                item = self._queue.get(timeout=wait)
+            except queue.Empty:
+                return []
+            if item is not _WAKE_UP:
+                break
+            wait = 0
+        batch = [item]
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining > 0 and not self._stop.is_set():
+                    item = self._queue.get(timeout=remaining)
+                else:
+                    item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not _WAKE_UP:
+                batch.append(item)
+        return batch
+
+    def _requeue(self, items):
+        with self._retry_lock:
+            self._retry.extendleft(reversed(items))
+        self.retries += 1
+
+    def _backoff(self, delay):
+        return min(self.retry_max_seconds, delay * 2 if delay else 0.05)
+
+    def _run(self):
+        delay = 0
+        while not self._stop.is_set():
+            batch = self._take_batch(wait=self.flush_interval)
+            if not batch:
+                continue
+            unwritten = self._write(batch)
+            if unwritten:
+                self._requeue(unwritten)
+                delay = self._backoff(delay)
+                self._stop.wait(delay)
+            else:
+                delay = 0
+
+    def _write(self, batch):
+        """Write ``batch``; returns the items to try again later."""
+        if self._user_key is None:
+            return self._write_to(None, batch)
+        storage = get_storage()
+        by_shard = {}
+        for item in batch:
+            by_shard.setdefault(storage.shard_for_user(self._user_key(item)), []).append(item)
+        unwritten = []
+        for shard, items in by_shard.items():
+            unwritten.extend(self._write_to(shard, items))
+        return unwritten
+
+    def _write_to(self, shard, batch):
+        try:
+            if has_app_context():
+                # Reuse the request's writer connection; it may already hold it
+                db = get_db(shard)
+                # A savepoint undoes a half-written batch without touching
+                # whatever else the request has pending on this connection
+                db.execute('SAVEPOINT write_behind')
+                try:
+                    self._flush(db, batch)
+                except Exception:
+                    db.execute('ROLLBACK TO write_behind')
+                    raise
+                finally:
+                    db.execute('RELEASE write_behind')
+                db.commit()
+            else:
+                pool = get_pool(shard)
+                db = pool.acquire_writer()
+                try:
+                    self._flush(db, batch)
+                    db.commit()
+                finally:
+                    pool.release_writer(db)
+        except sqlite3.OperationalError as error:
+            app.logger.warning('write-behind queue %s will retry %d rows: %s', self.name, len(batch), error)
+            return batch
+        except Exception:
+            self.failed += len(batch)
+            app.logger.exception('write-behind queue %s dropped %d rows', self.name, len(batch))
+            return []
+        self.written += len(batch)
+        self.batches += 1
+        return []
+
+    def drain(self, timeout=10):
+        """Write everything queued so far from the calling thread.
+
+        Failed batches are retried for up to ``timeout`` seconds; after that
+        they are dropped (and logged) so shutdown cannot hang on a dead disk.
+        """
+        deadline = time.monotonic() + timeout
+        delay = 0
+        while True:
+            batch = self._take_batch(wait=0)
+            if not batch:
+                return
+            unwritten = self._write(batch)
+            if not unwritten:
+                delay = 0
+            elif time.monotonic() < deadline:
+                self._requeue(unwritten)
+                delay = self._backoff(delay)
+                time.sleep(delay)
+            else:
+                self.failed += len(unwritten)
+                app.logger.error('write-behind queue %s dropped %d rows at shutdown',
+                                 self.name, len(unwritten))
+
+    def close(self, timeout=10):
+        self._stop.set()
+        try:
+            # Wake a flusher that is waiting out flush_interval on a partial batch
+            self._queue.put_nowait(_WAKE_UP)
+        except queue.Full:
+            pass
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        self.drain(timeout)
+
+_background_writers = []
+
+def register_background_writer(writer):
+    _background_writers.append(writer)
+    return writer
+
+def shutdown_background_writers():
+    for writer in _background_writers:
+        writer.close()
+
+atexit.register(shutdown_background_writers)
 
 # =============================================================================
 # AUTHENTICATION SYSTEM
 # =============================================================================
 
+_password_executor = None
+_password_executor_lock = threading.Lock()
+_password_slots = None
+
+def _run_password_job(fn, *args):
+    """Run a KDF call on the hashing pool.
+
+    The slot semaphore bounds how many hashes can be queued at once, so a
+    login flood waits here instead of piling up unbounded work.
+    """
+    global _password_executor, _password_slots
+    if _password_executor is None:
+        with _password_executor_lock:
+            if _password_executor is None:
+                workers = app.config['PASSWORD_HASH_WORKERS']
+                _password_slots = threading.BoundedSemaphore(workers * 2)
+                _password_executor = ThreadPoolExecutor(max_workers=workers,
+                                                        thread_name_prefix='password-hash')
+    with _password_slots:
+        return _password_executor.submit(fn, *args).result()
+
+def _pbkdf2(password, salt, iterations):
+    # hashlib releases the GIL while deriving, so pool threads run in parallel
+    return hashlib.pbkdf2_hmac('sha256', password.encode(), salt, iterations)
+
 def hash_password(password):
-    return hashlib.sha256(password.encode()).hexdigest()
+    iterations = app.config['PASSWORD_HASH_ITERATIONS']
+    salt = secrets.token_bytes(16)
+    derived = _run_password_job(_pbkdf2, password, salt, iterations)
+    return f'pbkdf2_sha256${iterations}${salt.hex()}${derived.hex()}'
+
+def _is_legacy_hash(stored_password):
+    return '$' not in stored_password
 
 def verify_password(stored_password, provided_password):
-    return stored_password == hash_password(provided_password)
+    if _is_legacy_hash(stored_password):
+        legacy = hashlib.sha256(provided_password.encode()).hexdigest()
+        return hmac.compare_digest(stored_password, legacy)
+    try:
+        algorithm, iterations, salt, expected = stored_password.split('$')
+        iterations = int(iterations)
+        salt = bytes.fromhex(salt)
+    except ValueError:
+        return False
+    if algorithm != 'pbkdf2_sha256':
+        return False
+    derived = _run_password_job(_pbkdf2, provided_password, salt, iterations)
+    return hmac.compare_digest(derived.hex(), expected)
+
+def password_needs_rehash(stored_password):
+    if _is_legacy_hash(stored_password):
+        return True
+    iterations = stored_password.split('$')[1]
+    return iterations != str(app.config['PASSWORD_HASH_ITERATIONS'])
+
+def _write_last_logins(db, logins):
+    # Only the newest login per user matters; collapse the batch first
+    latest = {}
+    for user_id, logged_in_at in logins:
+        if logged_in_at > latest.get(user_id, ''):
+            latest[user_id] = logged_in_at
+    db.executemany('UPDATE users SET last_login = ? WHERE id = ?',
+                   [(logged_in_at, user_id) for user_id, logged_in_at in latest.items()])
+
+login_log = register_background_writer(WriteBehindQueue(
+    'last_login', _write_last_logins,
+    batch_size=500,
+    flush_interval=app.config['LAST_LOGIN_FLUSH_SECONDS']))
 
 def create_user(username, password, email=None):
+    # Hash before taking the writer: the KDF must not hold up other writes
+    password_hash = hash_password(password)
     db = get_db()
     cursor = db.cursor()
     try:
-        password_hash = hash_password(password)
         cursor.execute('''
             INSERT INTO users (username, password_hash, email, created_at)
             VALUES (?, ?, ?, ?)
@@ -174,23 +1338,27 @@ def create_user(username, password, email=None):
         db.commit()
         return user_id
     except sqlite3.IntegrityError:
+        db.rollback()
         return None
 
 def authenticate_user(username, password):
-    db = get_db()
+    db = get_read_db()
     cursor = db.cursor()
     cursor.execute('SELECT id, username, password_hash FROM users WHERE username = ?', (username,))
     user = cursor.fetchone()
     
     if user and verify_password(user['password_hash'], password):
-        cursor.execute('UPDATE users SET last_login = ? WHERE id = ?', 
-                      (datetime.datetime.now().isoformat(), user['id']))
-        db.commit()
+        if password_needs_rehash(user['password_hash']):
+            password_hash = hash_password(password)
+            db = get_db()
+            db.execute('UPDATE users SET password_hash = ? WHERE id = ?', (password_hash, user['id']))
+            db.commit()
+        login_log.submit((user['id'], datetime.datetime.now().isoformat()))
         return user
     return None
 
 def get_user_profile(user_id):
-    db = get_db()
+    db = get_read_db()
     cursor = db.cursor()
     cursor.execute('''
         SELECT u.username, u.email, u.created_at, u.last_login,
@@ -205,36 +1373,64 @@ def get_user_profile(user_id):
 # SAVE/LOAD SYSTEM
 # =============================================================================
 
-def save_game(user_id, save_name, session_id, player_name, current_room, game_data):
-    db = get_db()
+def save_game(user_id, save_name, session_id, player_name, current_room, game_data,
+              only_if_changed=False):
+    """Write the save. With ``only_if_changed``, an active save that already
+    holds this session and game_data is left alone and False is returned."""
+    db = get_user_db(user_id)
     cursor = db.cursor()
+    saved_at = datetime.datetime.now().isoformat()
+    unchanged = ('WHERE saved_games.session_id IS NOT excluded.session_id '
+                 'OR saved_games.game_data IS NOT excluded.game_data') if only_if_changed else ''
     
-    cursor.execute('''
-        SELECT id FROM saved_games 
-        WHERE user_id = ? AND save_name = ? AND is_active = 1
-    ''', (user_id, save_name))
-    existing_save = cursor.fetchone()
+    # One statement: ux_saved_games_active_name turns a second active save
+    # with the same name into an update of the first
+    cursor.execute(f'''
+        INSERT INTO saved_games 
+        (user_id, save_name, session_id, player_name, current_room, game_data, last_updated)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT (user_id, save_name) WHERE is_active = 1 DO UPDATE
+        SET session_id = excluded.session_id, player_name = excluded.player_name,
+            current_room = excluded.current_room, game_data = excluded.game_data,
+            last_updated = excluded.last_updated
+        {unchanged}
+    ''', (user_id, save_name, session_id, player_name, current_room, game_data, saved_at))
+    if cursor.rowcount == 0:
+        db.commit()
+        return False
     
-    if existing_save:
+    history_size = app.config['SAVE_HISTORY_SIZE']
+    if history_size > 0:
         cursor.execute('''
-            UPDATE saved_games 
-            SET session_id = ?, player_name = ?, current_room = ?, 
-                game_data = ?, last_updated = ?
-            WHERE id = ?
-        ''', (session_id, player_name, current_room, game_data, 
-              datetime.datetime.now().isoformat(), existing_save['id']))
-    else:
+            INSERT INTO saved_game_history (user_id, save_name, current_room, game_data, saved_at)
+            VALUES (?, ?, ?, ?, ?)
+        ''', (user_id, save_name, current_room, game_data, saved_at))
         cursor.execute('''
-            INSERT INTO saved_games 
-            (user_id, save_name, session_id, player_name, current_room, game_data)
-            VALUES (?, ?, ?, ?, ?, ?)
-        ''', (user_id, save_name, session_id, player_name, current_room, game_data))
+            DELETE FROM saved_game_history
+            WHERE user_id = ? AND save_name = ? AND id <= (
+                SELECT id FROM saved_game_history
+                WHERE user_id = ? AND save_name = ?
+                ORDER BY id DESC LIMIT 1 OFFSET ?
+            )
+        ''', (user_id, save_name, user_id, save_name, history_size))
     
     db.commit()
     return True
 
+def get_save_history(user_id, save_id):
+    db = get_user_read_db(user_id)
+    cursor = db.cursor()
+    cursor.execute('''
+        SELECT h.current_room, h.game_data, h.saved_at
+        FROM saved_games s
+        JOIN saved_game_history h ON h.user_id = s.user_id AND h.save_name = s.save_name
+        WHERE s.id = ? AND s.user_id = ? AND s.is_active = 1
+        ORDER BY h.id DESC
+    ''', (save_id, user_id))
+    return cursor.fetchall()
+
 def load_game(user_id, save_id):
-    db = get_db()
+    db = get_user_read_db(user_id)
     cursor = db.cursor()
     cursor.execute('''
         SELECT * FROM saved_games 
@@ -243,7 +1439,7 @@ def load_game(user_id, save_id):
     return cursor.fetchone()
 
 def get_user_saves(user_id):
-    db = get_db()
+    db = get_user_read_db(user_id)
     cursor = db.cursor()
     cursor.execute('''
         SELECT id, save_name, current_room, created_at, last_updated
@@ -254,18 +1450,89 @@ def get_user_saves(user_id):
     return cursor.fetchall()
 
 def delete_save(user_id, save_id):
-    db = get_db()
+    db = get_user_db(user_id)
     cursor = db.cursor()
     cursor.execute('''
-        UPDATE saved_games 
-        SET is_active = 0 
-        WHERE id = ? AND user_id = ?
+        DELETE FROM saved_game_history
+        WHERE (user_id, save_name) IN (
+            SELECT user_id, save_name FROM saved_games
+            WHERE id = ? AND user_id = ? AND is_active = 1
+        )
     ''', (save_id, user_id))
+    # last_updated records the deletion time so purge_deleted_saves can age it
+    cursor.execute('''
+        UPDATE saved_games 
+        SET is_active = 0, last_updated = ?
+        WHERE id = ? AND user_id = ? AND is_active = 1
+    ''', (datetime.datetime.now().isoformat(), save_id, user_id))
     db.commit()
     return cursor.rowcount > 0
 
-def get_game_state(session_id):
-    progress = get_player_progress(session_id)
+def purge_deleted_saves(older_than_days):
+    """Hard-delete saves that were soft-deleted more than ``older_than_days`` ago."""
+    cutoff = (datetime.datetime.now() - datetime.timedelta(days=older_than_days)).isoformat()
+    removed = 0
+    for shard in get_storage().shards():
+        db = get_db(shard)
+        cursor = db.cursor()
+        cursor.execute('''
+            DELETE FROM saved_games
+            WHERE is_active = 0 AND last_updated < ?
+        ''', (cutoff,))
+        db.commit()
+        removed += cursor.rowcount
+    return removed
+
+class QuickSaveCoalescer:
+    """Remembers the last quick-saved state per user to skip redundant writes.
+
+    A changed state is always written. The same state again within
+    ``debounce_seconds`` is skipped from memory; after that, save_game()
+    compares it with the stored slot. The memory is per process, so under
+    `flask serve --workers N` it is the slot comparison that keeps page
+    unloads landing on different workers from rewriting the same state.
+    """
+
+    def __init__(self, debounce_seconds=10, max_users=10000):
+        self.debounce_seconds = debounce_seconds
+        self.max_users = max_users
+        self._last = OrderedDict()
+        self._lock = threading.Lock()
+        self.written = 0
+        self.skipped_recent = 0
+        self.skipped_unchanged = 0
+
+    def is_recent(self, user_id, digest):
+        """True if this exact state was saved (or found saved) moments ago."""
+        with self._lock:
+            last = self._last.get(user_id)
+            if last is not None and last[0] == digest and \
+                    time.monotonic() - last[1] < self.debounce_seconds:
+                self.skipped_recent += 1
+                return True
+            return False
+
+    def record(self, user_id, digest, written):
+        with self._lock:
+            self._last[user_id] = (digest, time.monotonic())
+            self._last.move_to_end(user_id)
+            while len(self._last) > self.max_users:
+                self._last.popitem(last=False)
+            if written:
+                self.written += 1
+            else:
+                self.skipped_unchanged += 1
+
+    def forget(self, user_id):
+        with self._lock:
+            self._last.pop(user_id, None)
+
+quick_saves = QuickSaveCoalescer(app.config['QUICK_SAVE_DEBOUNCE_SECONDS'],
+                                 app.config['QUICK_SAVE_TRACKED_USERS'])
+
+def get_game_state(session_id, user_id, progress=None):
+    if progress is None:
+        progress = get_player_progress(session_id, user_id)
     if not progress:
         return None
     
@@ -291,10 +1558,10 @@ def determine_current_room(progress):
     else:
         return 'completed'
 
-def restore_game_state(session_id, game_data):
+def restore_game_state(session_id, user_id, game_data):
     data = json.loads(game_data)
     
-    db = get_db()
+    db = get_user_db(user_id)
     cursor = db.cursor()
     
     cursor.execute('''
@@ -307,74 +1574,1156 @@ def restore_game_state(session_id, game_data):
           data['start_time'], session_id))
     
     db.commit()
+    progress_cache.update(session_id, {
+        'room1_complete': data['room1_complete'],
+        'room2_complete': data['room2_complete'],
+        'room3_complete': data['room3_complete'],
+        'final_complete': data['final_complete'],
+        'start_time': data['start_time'],
+    })
+    
+    if not data['final_complete']:
+        cursor.execute('SELECT id FROM players WHERE session_id = ?', (session_id,))
+        player = cursor.fetchone()
+        if player:
+            leaderboard_cache.discard(player['id'])
+
+# =============================================================================
+# LEADERBOARD CACHE
+# =============================================================================
+
+class Leaderboard:
+    """Top-N fastest finishes kept sorted in memory.
+
+    Loaded with one indexed query per shard (merged by time), then kept
+    current by complete_player_game, so reading the board never touches the
+    database. Each worker process has
+    its own copy; ``reload_seconds`` bounds how long a finish recorded by
+    another process can be missing from it.
+    """
+
+    def __init__(self, size=20, reload_seconds=60):
+        self.size = size
+        self.reload_seconds = reload_seconds
+        self._keys = []
+        self._entries = []
+        self._loaded_at = None
+        self._lock = threading.Lock()
+
+    def is_stale(self):
+        if self._loaded_at is None:
+            return True
+        return bool(self.reload_seconds) and time.monotonic() - self._loaded_at > self.reload_seconds
+
+    def load(self, dbs):
+        """Reload the top ``size`` finishes from ``dbs``, one connection per shard."""
+        per_shard = [[dict(row) for row in db.execute('''
+            SELECT id, player_name, total_time, total_time_ms, start_time, end_time
+            FROM players
+            WHERE final_complete = 1 AND total_time_ms IS NOT NULL
+            ORDER BY total_time_ms ASC, id ASC
+            LIMIT ?
+        ''', (self.size,))] for db in dbs]
+        merged = heapq.merge(*per_shard, key=lambda entry: (entry['total_time_ms'], entry['id']))
+        entries = list(itertools.islice(merged, self.size))
+        with self._lock:
+            self._entries = entries
+            self._keys = [(entry['total_time_ms'], entry['id']) for entry in entries]
+            self._loaded_at = time.monotonic()
+
+    def _remove(self, player_id):
+        for index, entry in enumerate(self._entries):
+            if entry['id'] == player_id:
+                del self._entries[index]
+                del self._keys[index]
+                return True
+        return False
+
+    def record(self, entry):
+        key = (entry['total_time_ms'], entry['id'])
+        with self._lock:
+            self._remove(entry['id'])
+            if len(self._entries) >= self.size and key >= self._keys[-1]:
+                return False
+            index = bisect.bisect_left(self._keys, key)
+            self._keys.insert(index, key)
+            self._entries.insert(index, entry)
+            del self._keys[self.size:]
+            del self._entries[self.size:]
+            return True
+
+    def discard(self, player_id):
+        with self._lock:
+            removed = self._remove(player_id)
+        if removed:
+            # A slot opened up; refill it from the database on the next read
+            self._loaded_at = None
+        return removed
+
+    def top(self):
+        with self._lock:
+            return list(self._entries)
+
+leaderboard_cache = Leaderboard(app.config['LEADERBOARD_SIZE'],
+                                app.config['LEADERBOARD_RELOAD_SECONDS'])
+
+# =============================================================================
+# LEADERBOARD EVENTS
+# =============================================================================
+# /events/leaderboard pushes leaderboard changes as Server-Sent Events. Each
+# change to leaderboard_cache is diffed and encoded once, then handed to every
+# subscriber's bounded queue, so idle listeners cost a thread and nothing else.
+
+SSE_RETRY_MS = 3000
+
+def format_event(event_id, name, data):
+    return f'id: {event_id}\nevent: {name}\ndata: {json.dumps(data, separators=(",", ":"))}\n\n'
+
+def leaderboard_entry(entry):
+    return {'player_name': entry['player_name'], 'total_time': entry['total_time']}
+
+class Subscriber:
+    def __init__(self, buffer_size):
+        self.events = queue.Queue(buffer_size)
+        # Set when the broker gave up on this subscriber (it fell too far
+        # behind, or the worker is stopping); its stream ends once drained
+        self.dropped = False
+
+class LeaderboardBroker:
+    """Per-process fan-out of leaderboard diffs to /events/leaderboard streams.
+
+    Event ids are ``<epoch>-<n>``. The epoch is new for every worker process,
+    so a Last-Event-ID issued by another worker (or before a restart) gets a
+    fresh snapshot instead of a replay of the wrong history.
+    """
+
+    def __init__(self, history=100, buffer_size=16, max_subscribers=500):
+        self.history = history
+        self.buffer_size = buffer_size
+        self.max_subscribers = max_subscribers
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self.published = 0
+        self.dropped = 0
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.epoch = secrets.token_hex(4)
+            self._sequence = 0
+            self._events = deque(maxlen=self.history)
+            self._keys = None
+            self._entries = []
+            self._polled_at = 0.0
+            self.closed = False
+
+    def _event_id(self):
+        return f'{self.epoch}-{self._sequence}'
+
+    def _set_board(self, board):
+        self._keys = [(entry['id'], entry['total_time_ms']) for entry in board]
+        self._entries = [leaderboard_entry(entry) for entry in board]
+
+    def publish(self, board):
+        """Send subscribers the ranks of ``board`` that differ from the last one."""
+        keys = [(entry['id'], entry['total_time_ms']) for entry in board]
+        with self._lock:
+            if self._keys is None:
+                # Nothing published yet to diff against
+                self._set_board(board)
+                return
+            if keys == self._keys:
+                return
+            changes = [[rank, leaderboard_entry(entry)] for rank, entry in enumerate(board)
+                       if rank >= len(self._keys) or self._keys[rank] != keys[rank]]
+            self._set_board(board)
+            self._sequence += 1
+            event = format_event(self._event_id(), 'update', {'changes': changes, 'size': len(board)})
+            self._events.append((self._sequence, event))
+            self.published += 1
+            for subscriber in list(self._subscribers):
+                try:
+                    subscriber.events.put_nowait(event)
+                except queue.Full:
+                    # It reconnects and resumes from its Last-Event-ID
+                    subscriber.dropped = True
+                    self._subscribers.discard(subscriber)
+                    self.dropped += 1
+
+    def _replay(self, last_event_id):
+        epoch, _, sequence = (last_event_id or '').partition('-')
+        if epoch != self.epoch or not sequence.isdigit():
+            return None
+        sequence = int(sequence)
+        if sequence == self._sequence:
+            return []
+        if sequence > self._sequence or not self._events or self._events[0][0] > sequence + 1:
+            return None
+        return [event for number, event in self._events if number > sequence]
+
+    def subscribe(self, board, last_event_id=None):
+        """Register a stream; returns (subscriber, events to send first), or (None, None) when full."""
+        with self._lock:
+            if self.closed or len(self._subscribers) >= self.max_subscribers:
+                return None, None
+            if self._keys is None:
+                self._set_board(board)
+            backlog = self._replay(last_event_id)
+            if backlog is None:
+                backlog = [format_event(self._event_id(), 'snapshot', {'entries': self._entries})]
+            subscriber = Subscriber(self.buffer_size)
+            self._subscribers.add(subscriber)
+            return subscriber, backlog
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def claim_poll(self, interval):
+        """True for one caller per ``interval`` seconds, which then re-reads the board."""
+        with self._lock:
+            now = time.monotonic()
+            if now - self._polled_at < interval:
+                return False
+            self._polled_at = now
+            return True
+
+    def subscriber_count(self):
+        with self._lock:
+            return len(self._subscribers)
+
+    def close(self):
+        """End every stream (worker shutdown waits for in-flight requests)."""
+        with self._lock:
+            self.closed = True
+            for subscriber in self._subscribers:
+                subscriber.dropped = True
+                try:
+                    subscriber.events.put_nowait(None)
+                except queue.Full:
+                    pass
+            self._subscribers.clear()
+
+leaderboard_events = LeaderboardBroker(app.config['LEADERBOARD_EVENTS_HISTORY'],
+                                       app.config['LEADERBOARD_EVENTS_BUFFER'],
+                                       app.config['LEADERBOARD_EVENTS_MAX_SUBSCRIBERS'])
+
+# =============================================================================
+# PROGRESS CACHE
+# =============================================================================
+
+class ProgressCache:
+    """LRU cache of players rows keyed by session_id, with a TTL.
+
+    Writers update cached rows in place (write-through), so within one process
+    the cache never lags the database. The TTL bounds how long a change made
+    by another worker process can go unseen.
+    """
+
+    def __init__(self, max_entries=10000, ttl_seconds=30):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, session_id):
+        with self._lock:
+            entry = self._entries.get(session_id)
+            if entry is not None and time.monotonic() - entry[0] <= self.ttl_seconds:
+                self._entries.move_to_end(session_id)
+                self.hits += 1
+                return dict(entry[1])
+            if entry is not None:
+                del self._entries[session_id]
+            self.misses += 1
+            return None
+
+    def put(self, session_id, progress):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[session_id] = (time.monotonic(), dict(progress))
+            self._entries.move_to_end(session_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def update(self, session_id, changes):
+        with self._lock:
+            entry = self._entries.get(session_id)
+            if entry is not None:
+                entry[1].update(changes)
+
+    def invalidate(self, session_id):
+        with self._lock:
+            self._entries.pop(session_id, None)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl_seconds': self.ttl_seconds,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_ratio': round(self.hits / lookups, 4) if lookups else None,
+            }
+
+progress_cache = ProgressCache(app.config['PROGRESS_CACHE_MAX_ENTRIES'],
+                               app.config['PROGRESS_CACHE_TTL_SECONDS'])
+
+# =============================================================================
+# GAME PROGRESS FUNCTIONS
+# =============================================================================
+
+def create_player_session(session_id, player_name, user_id=None):
+    storage = get_storage()
+    db = get_user_db(user_id)
+    cursor = db.cursor()
+    started = datetime.datetime.now().isoformat()
+    if storage.shard_count == 1:
+        cursor.execute('''
+            INSERT INTO players (session_id, player_name, user_id, start_time)
+            VALUES (?, ?, ?, ?)
+        ''', (session_id, player_name, user_id, started))
+    else:
+        # The leaderboard and players page mix shards, so player ids must be
+        # unique across them: shard n hands out n + 1, n + 1 + N, n + 1 + 2N...
+        # Counting up from the AUTOINCREMENT high-water mark rather than
+        # MAX(id) means ids of archived rows are never handed out again.
+        shard = storage.shard_for_user(user_id)
+        cursor.execute('''
+            INSERT INTO players (id, session_id, player_name, user_id, start_time)
+            SELECT last + 1 + ((? - last - 1) % ? + ?) % ?, ?, ?, ?, ?
+            FROM (SELECT MAX(COALESCE((SELECT seq FROM sqlite_sequence WHERE name = 'players'), 0),
+                             COALESCE((SELECT MAX(id) FROM players), 0)) AS last)
+        ''', (shard + 1, storage.shard_count, storage.shard_count, storage.shard_count,
+              session_id, player_name, user_id, started))
+    record_game_start_rollup(db, cursor.lastrowid, user_id, started)
+    db.commit()
+    progress_cache.invalidate(session_id)
+
+def update_player_progress(session_id, user_id, room=None, completed=False):
+    db = get_user_db(user_id)
+    cursor = db.cursor()
+    if room and completed:
+        cursor.execute(f'UPDATE players SET {room}_complete = 1 WHERE session_id = ?', (session_id,))
+    db.commit()
+    if room and completed:
+        progress_cache.update(session_id, {f'{room}_complete': 1})
+
+def get_player_progress(session_id, user_id, require=None):
+    """Progress row for a game session, served from progress_cache when possible.
+
+    Completion flags only move forward during play, so if the cached row does
+    not have ``require`` set yet it is re-read: another worker may have set it.
+    """
+    progress = progress_cache.get(session_id)
+    if progress is not None and (require is None or progress[require]):
+        return progress
+    
+    db = get_user_read_db(user_id)
+    cursor = db.cursor()
+    cursor.execute('SELECT * FROM players WHERE session_id = ?', (session_id,))
+    row = cursor.fetchone()
+    if row is None:
+        return None
+    progress = dict(row)
+    progress_cache.put(session_id, progress)
+    return progress
+
+def _write_puzzle_attempts(db, attempts):
+    db.executemany('''
+        INSERT INTO puzzle_attempts (session_id, player_name, user_id, room_name, attempt,
+                                     is_correct, attempted_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    ''', attempts)
+    # This transaction holds the write lock from the first insert, and
+    # AUTOINCREMENT hands out consecutive ids, so the batch got the last
+    # len(attempts) ids in order. The real ids keep a later row in the
+    # batch from counting towards an earlier one's solve.
+    last_id = db.execute('SELECT MAX(id) FROM puzzle_attempts').fetchone()[0]
+    first_id = last_id - len(attempts) + 1
+    fold_attempt_rollups(db, [(first_id + offset, session_id, user_id, room_name, is_correct, attempted_at)
+                              for offset, (session_id, _, user_id, room_name, _, is_correct, attempted_at)
+                              in enumerate(attempts)])
+
+attempt_log = register_background_writer(WriteBehindQueue(
+    'puzzle_attempts', _write_puzzle_attempts,
+    batch_size=app.config['ATTEMPT_LOG_BATCH_SIZE'],
+    flush_interval=app.config['ATTEMPT_LOG_FLUSH_SECONDS'],
+    max_pending=app.config['ATTEMPT_LOG_MAX_PENDING'],
+    user_key=lambda attempt: attempt[2]))
+
+def log_puzzle_attempt(session_id, player_name, user_id, room_name, attempt, is_correct):
+    # Stamp the time now (same format as CURRENT_TIMESTAMP), not at flush time
+    attempted_at = datetime.datetime.now(datetime.timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+    attempt_log.submit((session_id, player_name, user_id, room_name, attempt,
+                        1 if is_correct else 0, attempted_at))
+
+def complete_player_game(session_id, user_id, total_time, total_time_ms):
+    db = get_user_db(user_id)
+    cursor = db.cursor()
+    cursor.execute('''
+        UPDATE players 
+        SET end_time = ?, total_time = ?, total_time_ms = ?, final_complete = 1
+        WHERE session_id = ?
+    ''', (datetime.datetime.now().isoformat(), total_time, total_time_ms, session_id))
+    cursor.execute('''
+        SELECT id, player_name, total_time, total_time_ms, start_time, end_time
+        FROM players WHERE session_id = ?
+    ''', (session_id,))
+    finished = cursor.fetchone()
+    if finished:
+        record_completion_rollup(db, finished['id'], finished['end_time'], total_time_ms,
+                                 user_id=user_id)
+    db.commit()
+    if finished:
+        progress_cache.update(session_id, {
+            'end_time': finished['end_time'],
+            'total_time': total_time,
+            'total_time_ms': total_time_ms,
+            'final_complete': 1,
+        })
+        if leaderboard_cache.record(dict(finished)):
+            leaderboard_events.publish(leaderboard_cache.top())
+
+def refresh_leaderboard():
+    leaderboard_cache.load(shard_read_dbs())
+    leaderboard_events.publish(leaderboard_cache.top())
+
+def get_leaderboard():
+    if leaderboard_cache.is_stale():
+        refresh_leaderboard()
+    return leaderboard_cache.top()
+
+def encode_player_cursor(player):
+    raw = json.dumps([player['start_time'], player['id']]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+def decode_player_cursor(cursor):
+    """Inverse of encode_player_cursor; raises ValueError for a malformed cursor."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        start_time, player_id = json.loads(raw)
+    except (ValueError, TypeError) as exc:
+        raise ValueError('invalid cursor') from exc
+    if not isinstance(start_time, str) or not isinstance(player_id, int):
+        raise ValueError('invalid cursor')
+    return start_time, player_id
+
+def get_players_page(after=None, limit=20):
+    """One page of players, newest first, starting after the ``after`` cursor.
+
+    Returns ``(players, next_cursor)``; ``next_cursor`` is None on the last page.
+    Each shard returns its own newest page and the pages are merged.
+    """
+    columns = '''
+        SELECT id, player_name, start_time, end_time, total_time,
+               room1_complete, room2_complete, room3_complete, final_complete
+        FROM players 
+    '''
+    if after:
+        start_time, player_id = decode_player_cursor(after)
+        query = columns + '''
+            WHERE (start_time, id) < (?, ?)
+            ORDER BY start_time DESC, id DESC
+            LIMIT ?
+        '''
+        params = (start_time, player_id, limit + 1)
+    else:
+        query = columns + '''
+            ORDER BY start_time DESC, id DESC
+            LIMIT ?
+        '''
+        params = (limit + 1,)
+    per_shard = [db.execute(query, params).fetchall() for db in shard_read_dbs()]
+    merged = heapq.merge(*per_shard, key=lambda player: (player['start_time'], player['id']),
+                         reverse=True)
+    players = list(itertools.islice(merged, limit + 1))
+    
+    next_cursor = None
+    if len(players) > limit:
+        players = players[:limit]
+        next_cursor = encode_player_cursor(players[-1])
+    return players, next_cursor
+
+# =============================================================================
+# ANALYTICS ROLLUPS
+# =============================================================================
+# Per-room/day, per-user and solve-attempt totals, updated in the same
+# transaction as the rows they summarize, so /admin/stats and /profile never
+# scan puzzle_attempts or players.
+
+ROOM_ORDER = ['room1', 'room2', 'room3', 'final']
+ROLLUP_TABLES = ['room_daily_stats', 'user_room_stats', 'room_solve_attempts', 'daily_completions',
+                 'user_stats']
+def fold_attempt_rollups(db, attempts, source='puzzle_attempts'):
+    """Add attempts, as (id, session_id, user_id, room_name, is_correct,
+    attempted_at) rows, to the rollups. The rows must already be in ``source``."""
+    by_day, by_user, solved = {}, {}, []
+    for attempt_id, session_id, user_id, room_name, is_correct, attempted_at in attempts:
+        counts = by_day.setdefault(((attempted_at or '')[:10], room_name), [0, 0])
+        counts[0] += 1
+        counts[1] += is_correct
+        if user_id is not None:
+            counts = by_user.setdefault((user_id, room_name), [0, 0])
+            counts[0] += 1
+            counts[1] += is_correct
+        if is_correct:
+            solved.append((session_id, room_name, attempt_id))
+
+    db.executemany('''
+        INSERT INTO room_daily_stats (day, room_name, attempts, correct) VALUES (?, ?, ?, ?)
+        ON CONFLICT (day, room_name) DO UPDATE SET
+            attempts = attempts + excluded.attempts, correct = correct + excluded.correct
+    ''', [key + tuple(counts) for key, counts in by_day.items()])
+    db.executemany('''
+        INSERT INTO user_room_stats (user_id, room_name, attempts, correct) VALUES (?, ?, ?, ?)
+        ON CONFLICT (user_id, room_name) DO UPDATE SET
+            attempts = attempts + excluded.attempts, correct = correct + excluded.correct
+    ''', [key + tuple(counts) for key, counts in by_user.items()])
+
+    solve_counts = {}
+    for session_id, room_name, attempt_id in solved:
+        # Index lookup on (session_id, room_name); only a session's first
+        # correct answer counts as solving the room
+        attempts_made, correct = db.execute(f'''
+            SELECT COUNT(*), SUM(is_correct) FROM {source}
+            WHERE session_id = ? AND room_name = ? AND id <= ?
+        ''', (session_id, room_name, attempt_id)).fetchone()
+        if correct == 1:
+            key = (room_name, attempts_made)
+            solve_counts[key] = solve_counts.get(key, 0) + 1
+    db.executemany('''
+        INSERT INTO room_solve_attempts (room_name, attempts, sessions) VALUES (?, ?, ?)
+        ON CONFLICT (room_name, attempts) DO UPDATE SET sessions = sessions + excluded.sessions
+    ''', [key + (count,) for key, count in solve_counts.items()])
+
+# While a rebuild is running, players it has not reached yet are left to it
+REBUILD_PENDING = '''
+    NOT EXISTS (SELECT 1 FROM rollup_state WHERE name = 'players_rebuild_cursor' AND value < ?)
+'''
+
+def record_game_start_rollup(db, player_id, user_id, start_time):
+    if user_id is None:
+        return
+    db.execute(f'''
+        INSERT INTO user_stats (user_id, games_started, last_played_at)
+        SELECT ?, 1, ? WHERE {REBUILD_PENDING}
+        ON CONFLICT (user_id) DO UPDATE SET
+            games_started = games_started + 1,
+            last_played_at = MAX(COALESCE(last_played_at, ''), excluded.last_played_at)
+    ''', (user_id, start_time, player_id))
+
+def record_completion_rollup(db, player_id, end_time, total_time_ms, count=1, user_id=None):
+    if user_id is not None and total_time_ms is not None:
+        db.execute(f'''
+            INSERT INTO user_stats (user_id, games_completed, best_time_ms, total_time_ms)
+            SELECT ?, 1, ?, ? WHERE {REBUILD_PENDING}
+            ON CONFLICT (user_id) DO UPDATE SET
+                games_completed = games_completed + excluded.games_completed,
+                best_time_ms = COALESCE(MIN(best_time_ms, excluded.best_time_ms),
+                                        best_time_ms, excluded.best_time_ms),
+                total_time_ms = total_time_ms + excluded.total_time_ms
+        ''', (user_id, total_time_ms, total_time_ms, player_id))
+    db.execute(f'''
+        INSERT INTO daily_completions (day, completions, total_time_ms, best_time_ms)
+        SELECT ?, ?, COALESCE(?, 0), ? WHERE {REBUILD_PENDING}
+        ON CONFLICT (day) DO UPDATE SET
+            completions = completions + excluded.completions,
+            total_time_ms = total_time_ms + excluded.total_time_ms,
+            best_time_ms = COALESCE(MIN(best_time_ms, excluded.best_time_ms),
+                                    best_time_ms, excluded.best_time_ms)
+    ''', ((end_time or '')[:10], count, total_time_ms, total_time_ms, player_id))
+
+def rebuild_rollups(chunk_size=5000, progress=None):
+    """Recompute the rollups from puzzle_attempts and players in short transactions.
+
+    The game keeps writing meanwhile: attempts newer than the MAX(id) taken
+    at the start are already counted live, and live completions of players
+    the scan has not reached yet are skipped (rollup_state cursor) and picked
+    up by the scan instead. Attempts moved out by `flask archive` are counted
+    too. Shards are rebuilt one after another; ``progress(table, rows_done)``
+    is called per chunk.
+    """
+    for shard in get_storage().shards():
+        _rebuild_shard_rollups(shard, chunk_size, progress)
+
+def _rebuild_shard_rollups(shard, chunk_size, progress):
+    pool = get_pool(shard)
+    db = pool.acquire_writer()
+    source, players = 'puzzle_attempts', 'players'
+    try:
+        if attach_archive(db, shard, create=False):
+            # Archived rows keep their ids, so one id-ordered view covers both
+            db.execute('''
+                CREATE TEMP VIEW IF NOT EXISTS all_puzzle_attempts AS
+                SELECT id, session_id, user_id, room_name, is_correct, attempted_at
+                FROM main.puzzle_attempts
+                UNION ALL
+                SELECT id, session_id, user_id, room_name, is_correct, attempted_at
+                FROM archive.puzzle_attempts
+            ''')
+            db.execute('''
+                CREATE TEMP VIEW IF NOT EXISTS all_players AS
+                SELECT id, user_id, start_time, end_time, total_time_ms, final_complete
+                FROM main.players
+                UNION ALL
+                SELECT id, user_id, start_time, end_time, total_time_ms, final_complete
+                FROM archive.players
+            ''')
+            source, players = 'all_puzzle_attempts', 'all_players'
+        db.execute('BEGIN IMMEDIATE')
+        attempts_upto = db.execute(f'SELECT COALESCE(MAX(id), 0) FROM {source}').fetchone()[0]
+        for table in ROLLUP_TABLES:
+            db.execute(f'DELETE FROM {table}')
+        db.execute('''
+            INSERT OR REPLACE INTO rollup_state (name, value) VALUES ('players_rebuild_cursor', 0)
+        ''')
+        db.commit()
+
+        last_id, done = 0, 0
+        while True:
+            db.execute('BEGIN IMMEDIATE')
+            rows = db.execute(f'''
+                SELECT id, session_id, user_id, room_name, is_correct, attempted_at
+                FROM {source} WHERE id > ? AND id <= ?
+                ORDER BY id LIMIT ?
+            ''', (last_id, attempts_upto, chunk_size)).fetchall()
+            if not rows:
+                db.rollback()
+                break
+            fold_attempt_rollups(db, [tuple(row) for row in rows], source)
+            db.commit()
+            last_id, done = rows[-1]['id'], done + len(rows)
+            if progress:
+                progress('puzzle_attempts', done)
+
+        last_id, done = 0, 0
+        while True:
+            db.execute('BEGIN IMMEDIATE')
+            rows = db.execute(f'''
+                SELECT id FROM {players}
+                WHERE id > ? ORDER BY id LIMIT ?
+            ''', (last_id, chunk_size)).fetchall()
+            if not rows:
+                # Caught up with the newest player: live writes take over
+                db.execute("DELETE FROM rollup_state WHERE name = 'players_rebuild_cursor'")
+                db.commit()
+                break
+            last_id, done = rows[-1]['id'], done + len(rows)
+            db.execute("UPDATE rollup_state SET value = ? WHERE name = 'players_rebuild_cursor'",
+                       (last_id,))
+            finished = db.execute(f'''
+                SELECT substr(end_time, 1, 10) AS day, COUNT(*) AS completions,
+                       SUM(total_time_ms) AS total_time_ms, MIN(total_time_ms) AS best_time_ms
+                FROM {players}
+                WHERE id > ? AND id <= ? AND final_complete = 1
+                GROUP BY day
+            ''', (rows[0]['id'] - 1, last_id)).fetchall()
+            db.executemany('''
+                INSERT INTO daily_completions (day, completions, total_time_ms, best_time_ms)
+                VALUES (?, ?, COALESCE(?, 0), ?)
+                ON CONFLICT (day) DO UPDATE SET
+                    completions = completions + excluded.completions,
+                    total_time_ms = total_time_ms + excluded.total_time_ms,
+                    best_time_ms = COALESCE(MIN(best_time_ms, excluded.best_time_ms),
+                                            best_time_ms, excluded.best_time_ms)
+            ''', [tuple(row) for row in finished])
+            by_user = db.execute(f'''
+                SELECT user_id, COUNT(*),
+                       COUNT(CASE WHEN final_complete = 1 THEN total_time_ms END),
+                       MIN(CASE WHEN final_complete = 1 THEN total_time_ms END),
+                       COALESCE(SUM(CASE WHEN final_complete = 1 THEN total_time_ms END), 0),
+                       MAX(start_time)
+                FROM {players}
+                WHERE id > ? AND id <= ? AND user_id IS NOT NULL
+                GROUP BY user_id
+            ''', (rows[0]['id'] - 1, last_id)).fetchall()
+            db.executemany('''
+                INSERT INTO user_stats (user_id, games_started, games_completed, best_time_ms,
+                                        total_time_ms, last_played_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT (user_id) DO UPDATE SET
+                    games_started = games_started + excluded.games_started,
+                    games_completed = games_completed + excluded.games_completed,
+                    best_time_ms = COALESCE(MIN(best_time_ms, excluded.best_time_ms),
+                                            best_time_ms, excluded.best_time_ms),
+                    total_time_ms = total_time_ms + excluded.total_time_ms,
+                    last_played_at = MAX(COALESCE(last_played_at, ''), excluded.last_played_at)
+            ''', [tuple(row) for row in by_user])
+            db.commit()
+            if progress:
+                progress('players', done)
+    finally:
+        if source != 'puzzle_attempts':
+            detach_archive(db)
+            db.execute('DROP VIEW temp.all_puzzle_attempts')
+            db.execute('DROP VIEW temp.all_players')
+        pool.release_writer(db)
+
+def median_from_histogram(buckets):
+    """Median value of a [(value, count), ...] histogram sorted by value."""
+    total = sum(count for _, count in buckets)
+    seen = 0
+    for value, count in buckets:
+        seen += count
+        if seen * 2 >= total:
+            return value
+    return None
+
+def get_rollup_stats(days=30):
+    """Room, solve and completion figures, summed over the rollups of every shard."""
+    since = (datetime.datetime.now(datetime.timezone.utc).date()
+             - datetime.timedelta(days=days)).isoformat()
+
+    def new_room(name):
+        return {'room': name, 'attempts': 0, 'correct': 0, 'players': 0, 'players_solved': 0,
+                'success_rate': None, 'median_attempts_to_solve': None}
+
+    rooms = {room: new_room(room) for room in ROOM_ORDER}
+    histograms, daily, completions = {}, {}, {}
+    for db in shard_read_dbs():
+        for row in db.execute('''
+            SELECT room_name, SUM(attempts) AS attempts, SUM(correct) AS correct
+            FROM room_daily_stats GROUP BY room_name
+        '''):
+            room = rooms.setdefault(row['room_name'], new_room(row['room_name']))
+            room['attempts'] += row['attempts']
+            room['correct'] += row['correct']
+        # A user's rows all live on one shard, so the counts simply add up
+        for row in db.execute('''
+            SELECT room_name, COUNT(*) AS players, SUM(correct > 0) AS players_solved
+            FROM user_room_stats GROUP BY room_name
+        '''):
+            room = rooms.setdefault(row['room_name'], new_room(row['room_name']))
+            room['players'] += row['players']
+            room['players_solved'] += row['players_solved']
+        for row in db.execute('SELECT room_name, attempts, sessions FROM room_solve_attempts'):
+            buckets = histograms.setdefault(row['room_name'], {})
+            buckets[row['attempts']] = buckets.get(row['attempts'], 0) + row['sessions']
+        for row in db.execute('''
+            SELECT day, room_name, attempts, correct FROM room_daily_stats WHERE day >= ?
+        ''', (since,)):
+            totals = daily.setdefault((row['day'], row['room_name']), [0, 0])
+            totals[0] += row['attempts']
+            totals[1] += row['correct']
+        for row in db.execute('''
+            SELECT day, completions, total_time_ms, best_time_ms FROM daily_completions
+            WHERE day >= ?
+        ''', (since,)):
+            totals = completions.setdefault(row['day'], [0, 0, None])
+            totals[0] += row['completions']
+            totals[1] += row['total_time_ms']
+            if totals[2] is None or (row['best_time_ms'] is not None and row['best_time_ms'] < totals[2]):
+                totals[2] = row['best_time_ms']
+
+    for room in rooms.values():
+        if room['attempts']:
+            room['success_rate'] = round(room['correct'] / room['attempts'], 4)
+        buckets = sorted(histograms.get(room['room'], {}).items())
+        if buckets:
+            room['median_attempts_to_solve'] = median_from_histogram(buckets)
+            room['attempts_to_solve'] = dict(buckets)
+    # Newest day first, rooms alphabetically within a day
+    daily_rows = sorted(sorted(daily.items()), key=lambda item: item[0][0], reverse=True)
+    return {
+        'since': since,
+        'rooms': list(rooms.values()),
+        'daily_attempts': [
+            {'day': day, 'room_name': room_name, 'attempts': attempts, 'correct': correct}
+            for (day, room_name), (attempts, correct) in daily_rows
+        ],
+        'daily_completions': [
+            {'day': day, 'completions': count,
+             'average_time_ms': total_ms // count if count else None, 'best_time_ms': best_ms}
+            for day, (count, total_ms, best_ms) in sorted(completions.items(), reverse=True)
+        ],
+    }
+
+def format_duration_ms(milliseconds):
+    # Same H:MM:SS form as players.total_time
+    return str(datetime.timedelta(milliseconds=milliseconds)).split('.')[0]
+
+def get_user_stats(user_id):
+    """Profile statistics: the user's user_stats row joined to its
+    user_room_stats rows, all on primary keys in the user's shard."""
+    rows = get_user_read_db(user_id).execute('''
+        SELECT s.games_started, s.games_completed, s.best_time_ms, s.total_time_ms,
+               s.last_played_at, r.room_name, r.attempts, r.correct
+        FROM user_stats s
+        LEFT JOIN user_room_stats r ON r.user_id = s.user_id
+        WHERE s.user_id = ?
+    ''', (user_id,)).fetchall()
+    rooms = {room: {'room': room, 'attempts': 0, 'correct': 0, 'success_rate': None}
+             for room in ROOM_ORDER}
+    stats = {'games_started': 0, 'games_completed': 0, 'best_time': None, 'average_time': None,
+             'last_played_at': None, 'puzzles_solved': 0, 'rooms': list(rooms.values())}
+    if not rows:
+        return stats
+    
+    first = rows[0]
+    stats.update(games_started=first['games_started'], games_completed=first['games_completed'],
+                 last_played_at=first['last_played_at'])
+    if first['best_time_ms'] is not None:
+        stats['best_time'] = format_duration_ms(first['best_time_ms'])
+    if first['games_completed']:
+        stats['average_time'] = format_duration_ms(first['total_time_ms'] // first['games_completed'])
+    for row in rows:
+        room = rooms.get(row['room_name'])
+        if room is None:
+            continue
+        room['attempts'], room['correct'] = row['attempts'], row['correct']
+        if row['attempts']:
+            room['success_rate'] = round(row['correct'] / row['attempts'], 4)
+        stats['puzzles_solved'] += row['correct']
+    return stats
+
+# =============================================================================
+# RETENTION & ARCHIVE
+# =============================================================================
+# Abandoned sessions, old puzzle attempts and soft-deleted saves are copied to
+# a separate archive database and then deleted here, a batch at a time, so
+# live players only ever wait for one short transaction. Completed games stay
+# for the leaderboard, and abandoned sessions an active save still points at
+# stay so the save can be loaded. Rollup totals are not touched. Each shard
+# has its own archive file (ARCHIVE_DATABASE named like the shard files).
+
+# table -> (age column, extra condition) for rows to move
+ARCHIVE_RULES = {
+    'players': ('start_time', '''final_complete = 0 AND session_id NOT IN (
+        SELECT session_id FROM main.saved_games WHERE is_active = 1)'''),
+    'puzzle_attempts': ('attempted_at', '1'),
+    'saved_games': ('last_updated', 'is_active = 0'),
+}
+
+def archive_database(shard):
+    path = app.config['ARCHIVE_DATABASE']
+    return path if get_storage().shard_count == 1 else shard_database(path, shard)
+
+def attach_archive(db, shard, create=True):
+    """ATTACH the shard's archive as ``archive``; False if it is missing and ``create`` is off."""
+    path = archive_database(shard)
+    if not create and not os.path.exists(path):
+        return False
+    db.execute('ATTACH DATABASE ? AS archive', (path,))
+    return True
+
+def detach_archive(db):
+    if db.in_transaction:
+        db.rollback()
+    db.execute('DETACH DATABASE archive')
+
+def ensure_archive_table(db, table):
+    """Create or widen archive.<table> to match main.<table>; returns its columns."""
+    columns = [row[1] for row in db.execute(f'PRAGMA main.table_info({table})')]
+    archived = {row[1] for row in db.execute(f'PRAGMA archive.table_info({table})')}
+    if not archived:
+        # Same columns without the constraints; ids are kept so rows can be
+        # traced back, and the unique index makes re-running a batch harmless
+        db.execute(f'CREATE TABLE archive.{table} AS SELECT * FROM main.{table} WHERE 0')
+        db.execute(f'CREATE UNIQUE INDEX archive.ux_{table}_id ON {table} (id)')
+        if table == 'puzzle_attempts':
+            db.execute('''
+                CREATE INDEX archive.idx_puzzle_attempts_session_room
+                ON puzzle_attempts (session_id, room_name, is_correct)
+            ''')
+    else:
+        for column in columns:
+            if column not in archived:
+                db.execute(f'ALTER TABLE archive.{table} ADD COLUMN {column}')
+    return columns
+
+def archive_table(db, table, cutoff, batch_size, pause):
+    """Move rows of ``table`` older than ``cutoff`` to the archive; returns the count."""
+    age_column, condition = ARCHIVE_RULES[table]
+    columns = ', '.join(ensure_archive_table(db, table))
+    select = f'''
+        SELECT id FROM main.{table}
+        WHERE id > ? AND {age_column} < ? AND {condition}
+        ORDER BY id LIMIT ?
+    '''
+    moved, last_id = 0, 0
+    while True:
+        db.execute('BEGIN IMMEDIATE')
+        ids = [row[0] for row in db.execute(select, (last_id, cutoff, batch_size))]
+        if not ids:
+            db.rollback()
+            return moved
+        # A commit across a WAL database and an attached one is not atomic:
+        # copy and commit first, so a crash can only leave a duplicate behind
+        placeholders = ', '.join('?' * len(ids))
+        db.execute(f'''
+            INSERT OR IGNORE INTO archive.{table} ({columns})
+            SELECT {columns} FROM main.{table} WHERE id IN ({placeholders})
+        ''', ids)
+        db.commit()
+        db.execute('BEGIN IMMEDIATE')
+        # Rechecked: a row may have changed (e.g. a game resumed) since the copy
+        cursor = db.execute(f'''
+            DELETE FROM main.{table}
+            WHERE id IN ({placeholders}) AND {age_column} < ? AND {condition}
+        ''', ids + [cutoff])
+        db.commit()
+        moved += cursor.rowcount
+        last_id = ids[-1]
+        if pause:
+            time.sleep(pause)
+
+def reclaim_free_pages(db, step_pages, pause):
+    """Run incremental_vacuum in short steps; returns (pages_before, pages_after).
+
+    Only databases with auto_vacuum = INCREMENTAL shrink this way; elsewhere
+    freed pages stay on the freelist and are reused by new rows.
+    """
+    before = db.execute('PRAGMA page_count').fetchone()[0]
+    if db.execute('PRAGMA auto_vacuum').fetchone()[0] == 2:
+        while db.execute('PRAGMA freelist_count').fetchone()[0]:
+            # Each call is its own short write transaction
+            db.execute(f'PRAGMA incremental_vacuum({int(step_pages)})').fetchall()
+            if pause:
+                time.sleep(pause)
+        # Never waits on readers; the file shrinks once the WAL is checkpointed
+        db.execute('PRAGMA wal_checkpoint(PASSIVE)').fetchall()
+    return before, db.execute('PRAGMA page_count').fetchone()[0]
+
+def archive_old_rows(session_days, attempt_days, save_days, vacuum=True):
+    """Move expired rows to the archive databases and give the space back.
+
+    Returns rows moved per table, the page count before and after the
+    vacuum, the page size and the pages still on the freelist, all summed
+    over the shards.
+    """
+    now = datetime.datetime.now()
+    utc_now = datetime.datetime.now(datetime.timezone.utc)
+    # players and saved_games hold local isoformat() times, attempts UTC ones
+    cutoffs = {
+        'players': (now - datetime.timedelta(days=session_days)).isoformat(),
+        'puzzle_attempts': (utc_now - datetime.timedelta(days=attempt_days)).strftime('%Y-%m-%d %H:%M:%S'),
+        'saved_games': (now - datetime.timedelta(days=save_days)).isoformat(),
+    }
+    pause = app.config['ARCHIVE_PAUSE_SECONDS']
+    report = {'moved': dict.fromkeys(cutoffs, 0), 'pages_before': 0, 'pages_after': 0,
+              'page_size': 0, 'free_pages': 0}
+    for shard in get_storage().shards():
+        pool = get_pool(shard)
+        db = pool.acquire_writer()
+        try:
+            attach_archive(db, shard)
+            try:
+                for table, cutoff in cutoffs.items():
+                    report['moved'][table] += archive_table(db, table, cutoff,
+                                                            app.config['ARCHIVE_BATCH_SIZE'], pause)
+            finally:
+                detach_archive(db)
+            if vacuum:
+                before, after = reclaim_free_pages(db, app.config['ARCHIVE_VACUUM_PAGES'], pause)
+            else:
+                before = after = db.execute('PRAGMA page_count').fetchone()[0]
+            report['pages_before'] += before
+            report['pages_after'] += after
+            report['page_size'] = db.execute('PRAGMA page_size').fetchone()[0]
+            report['free_pages'] += db.execute('PRAGMA freelist_count').fetchone()[0]
+        finally:
+            pool.release_writer(db)
+    return report
+
+# =============================================================================
+# EXPORT & IMPORT
+# =============================================================================
+# Tables are exported as NDJSON (one object per row, types preserved) or CSV
+# (header row first) straight off one read cursor per shard, EXPORT_CHUNK_ROWS
+# rows at a time and merged by id, so memory stays flat however large the
+# table is. With DB_SHARDS > 1 every row also carries its ``shard``: only
+# player ids are unique across shards, so attempts and saves are identified
+# by (shard, id). The importer reads the same formats back, routes each row to its
+# user's shard and writes with executemany in IMPORT_BATCH_SIZE-row
+# transactions.
+
+EXPORT_TABLES = ('players', 'puzzle_attempts', 'saved_games')
+EXPORT_FORMATS = {'ndjson': 'application/x-ndjson', 'csv': 'text/csv'}
+
+def table_columns(db, table):
+    return [row[1] for row in db.execute(f'PRAGMA main.table_info({table})')]
+
+def iter_cursor(cursor, size):
+    """Rows of ``cursor``, fetched ``size`` at a time."""
+    while True:
+        rows = cursor.fetchmany(size)
+        if not rows:
+            return
+        yield from rows
+
+def export_rows(dbs, table, fmt, chunk_rows=None):
+    """Yield ``table`` from ``dbs`` (one connection per shard) as NDJSON or CSV
+    text, one chunk of rows at a time.
+
+    Each shard is read from the snapshot its cursor opened with.
+    """
+    chunk_rows = chunk_rows or app.config['EXPORT_CHUNK_ROWS']
+    columns = table_columns(dbs[0], table)
+    selected = ', '.join(columns)
+    if len(dbs) > 1:
+        columns.append('shard')
+        cursors = [db.execute(f'SELECT {selected}, ? FROM main.{table} ORDER BY id', (shard,))
+                   for shard, db in enumerate(dbs)]
+    else:
+        cursors = [dbs[0].execute(f'SELECT {selected} FROM main.{table} ORDER BY id')]
+    id_index = columns.index('id')
+    merged = heapq.merge(*(iter_cursor(cursor, chunk_rows) for cursor in cursors),
+                         key=lambda row: (row[id_index], row[-1]))
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator='\n') if fmt == 'csv' else None
+    if writer:
+        writer.writerow(columns)
+    try:
+        while True:
+            rows = list(itertools.islice(merged, chunk_rows))
+            if not rows:
+                break
+            if writer:
+                writer.writerows(rows)
+            else:
+                for row in rows:
+                    buffer.write(json.dumps(dict(zip(columns, row))))
+                    buffer.write('\n')
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        if buffer.tell():
+            yield buffer.getvalue()
+    finally:
+        for cursor in cursors:
+            cursor.close()
+
+def read_import_rows(lines, fmt):
+    """Yield dicts from NDJSON or CSV lines; empty CSV fields become NULL."""
+    if fmt == 'csv':
+        for row in csv.DictReader(lines):
+            yield {column: value if value != '' else None for column, value in row.items()}
+        return
+    for line in lines:
+        if line.strip():
+            yield json.loads(line)
+
+def import_rows(table, rows, batch_size=None, on_conflict='abort', progress=None):
+    """Insert ``rows`` (dicts) into ``table`` on their users' shards, one write
+    transaction per batch and shard.
+
+    Only keys that are columns of the table are used; the first row decides
+    which. ``on_conflict`` is abort, ignore or replace (SQLite's INSERT OR
+    ...). Returns (rows read, rows written).
+    """
+    batch_size = batch_size or app.config['IMPORT_BATCH_SIZE']
+    storage = get_storage()
+    writers = {}
+    batches = {}
+    imported = written = 0
+
+    def flush(shard):
+        nonlocal written
+        db = writers[shard][1]
+        changes = db.total_changes
+        with db:
+            db.executemany(sql, batches.pop(shard))
+        written += db.total_changes - changes
+
+    try:
+        rows = iter(rows)
+        first = next(rows, None)
+        if first is None:
+            return 0, 0
+        shard = storage.shard_for_user(first.get('user_id'))
+        pool = get_pool(shard)
+        writers[shard] = (pool, pool.acquire_writer())
+        known = set(table_columns(writers[shard][1], table))
+        columns = [column for column in first if column in known]
+        if not columns:
+            raise ValueError(f'no columns of {table} in the input')
+        if table == 'players' and 'id' not in columns and storage.shard_count > 1:
+            # create_player_session keeps player ids unique across shards
+            raise ValueError('players rows need their id when DB_SHARDS > 1')
+        sql = (f'INSERT OR {on_conflict.upper()} INTO main.{table} ({", ".join(columns)}) '
+               f'VALUES ({", ".join("?" * len(columns))})')
+        check_ids = table == 'players' and storage.shard_count > 1
+        for row in itertools.chain([first], rows):
+            shard = storage.shard_for_user(row.get('user_id'))
+            residue = (shard + 1) % storage.shard_count
+            if check_ids and (row['id'] is None or int(row['id']) % storage.shard_count != residue):
+                # create_player_session would hand the same id out again on
+                # the shard whose residue it has
+                raise ValueError(f"players id {row['id']} does not belong to shard {shard} of "
+                                 f"user {row.get('user_id')} (ids there are {residue} mod "
+                                 f"{storage.shard_count}); import exports of a deployment "
+                                 f"with the same DB_SHARDS")
+            if shard not in writers:
+                pool = get_pool(shard)
+                writers[shard] = (pool, pool.acquire_writer())
+            batch = batches.setdefault(shard, [])
+            batch.append(tuple(row.get(column) for column in columns))
+            imported += 1
+            if len(batch) >= batch_size:
+                flush(shard)
+                if progress:
+                    progress(imported)
+        for shard in list(batches):
+            flush(shard)
+        if progress:
+            progress(imported)
+        return imported, written
+    finally:
+        for pool, db in writers.values():
+            pool.release_writer(db)
 
 # =============================================================================
-# GAME PROGRESS FUNCTIONS
+# PUZZLE VARIANTS
 # =============================================================================
+# Generating and proving puzzles is done ahead of time by build_puzzles.py;
+# a request only picks an index into the loaded pools, and checking an answer
+# is a lookup of the stored solution.
 
-def create_player_session(session_id, player_name, user_id=None):
-    db = get_db()
-    cursor = db.cursor()
-    cursor.execute('''
-        INSERT INTO players (session_id, player_name, user_id, start_time)
-        VALUES (?, ?, ?, ?)
-    ''', (session_id, player_name, user_id, datetime.datetime.now().isoformat()))
-    db.commit()
+_puzzle_pools = None
 
-def update_player_progress(session_id, room=None, completed=False):
-    db = get_db()
-    cursor = db.cursor()
-    if room and completed:
-        cursor.execute(f'UPDATE players SET {room}_complete = 1 WHERE session_id = ?', (session_id,))
-    db.commit()
+def load_puzzle_store():
+    global _puzzle_pools
+    store = _read_manifest(app.config['PUZZLE_STORE'])
+    _puzzle_pools = {
+        'laboratory': store.get('laboratory') or LABORATORY_PATTERNS,
+        'control': store.get('control') or [{'clues': CONTROL_CLUES, 'solution': CONTROL_SOLUTION}],
+    }
+    return _puzzle_pools
 
-def get_player_progress(session_id):
-    db = get_db()
-    cursor = db.cursor()
-    cursor.execute('SELECT * FROM players WHERE session_id = ?', (session_id,))
-    return cursor.fetchone()
+def puzzle_pool(kind):
+    pools = _puzzle_pools if _puzzle_pools is not None else load_puzzle_store()
+    return pools[kind]
 
-def log_puzzle_attempt(session_id, player_name, user_id, room_name, attempt, is_correct):
-    db = get_db()
-    cursor = db.cursor()
-    cursor.execute('''
-        INSERT INTO puzzle_attempts (session_id, player_name, user_id, room_name, attempt, is_correct)
-        VALUES (?, ?, ?, ?, ?, ?)
-    ''', (session_id, player_name, user_id, room_name, attempt, 1 if is_correct else 0))
-    db.commit()
+def get_puzzle(kind, index):
+    pool = puzzle_pool(kind)
+    if isinstance(index, int) and 0 <= index < len(pool):
+        return pool[index]
+    return None
 
-def complete_player_game(session_id, total_time):
-    db = get_db()
-    cursor = db.cursor()
-    cursor.execute('''
-        UPDATE players 
-        SET end_time = ?, total_time = ?, final_complete = 1
-        WHERE session_id = ?
-    ''', (datetime.datetime.now().isoformat(), total_time, session_id))
-    db.commit()
+def assign_puzzle(kind, session_key):
+    """This session's variant index, picked at random on the first visit."""
+    index = session.get(session_key)
+    if get_puzzle(kind, index) is None:
+        # Also re-picks when a rebuilt store no longer has the old index
+        index = session[session_key] = random.randrange(len(puzzle_pool(kind)))
+    return index
 
-def get_leaderboard():
-    db = get_db()
-    cursor = db.cursor()
-    cursor.execute('''
-        SELECT player_name, total_time, start_time, end_time
-        FROM players 
-        WHERE final_complete = 1 
-        ORDER BY total_time ASC
-        LIMIT 20
-    ''')
-    return cursor.fetchall()
+def get_laboratory_answer(pattern_index):
+    pattern = get_puzzle('laboratory', pattern_index)
+    return pattern['answer'] if pattern else None
 
-def get_all_players():
-    db = get_db()
-    cursor = db.cursor()
-    cursor.execute('''
-        SELECT player_name, start_time, end_time, total_time,
-               room1_complete, room2_complete, room3_complete, final_complete
-        FROM players 
-        ORDER BY start_time DESC
-    ''')
-    return cursor.fetchall()
+def get_control_answers(control_index):
+    variant = get_puzzle('control', control_index)
+    return dict(variant['solution']) if variant else None
 
 # =============================================================================
 # PUZZLE VALIDATION FUNCTIONS
@@ -387,25 +2736,494 @@ def validate_observatory_puzzle(answer):
     return answer.lower().strip() == OBSERVATORY_RIDDLE['answer']
 
 def validate_laboratory_puzzle(pattern_index, user_answer):
-    if 0 <= pattern_index < len(LABORATORY_PATTERNS):
-        return user_answer.strip() == LABORATORY_PATTERNS[pattern_index]['answer']
-    return False
-
-def validate_control_puzzle(answers):
-    correct_answers = {
-        'red_system': 'plumber',
-        'blue_system': 'electrician', 
-        'green_system': 'mechanic',
-        'alex_role': 'electrician',
-        'sam_role': 'mechanic',
-        'taylor_role': 'plumber'
-    }
+    answer = get_laboratory_answer(pattern_index)
+    return answer is not None and user_answer.strip() == answer
+
+def validate_control_puzzle(control_index, answers):
+    variant = get_puzzle('control', control_index)
+    if variant is None:
+        return False
     
-    for key, value in correct_answers.items():
+    for key, value in variant['solution'].items():
         if answers.get(key, '').lower().strip() != value:
             return False
     return True
 
+# =============================================================================
+# ROOM ANSWERS
+# =============================================================================
+# Submitting an answer is shared by the HTML room routes and /api/v1: which
+# flag unlocks a room, where a correct answer leads, and what a wrong one says.
+
+ROOM_RULES = {
+    'room1': {'requires': None, 'endpoint': 'room1', 'next': 'room2',
+              'error': "Incorrect assembly sequence! Check the blueprint carefully."},
+    'room2': {'requires': 'room1_complete', 'endpoint': 'room2', 'next': 'room3',
+              'error': "Wrong answer! Think about what repeats your words in empty spaces."},
+    'room3': {'requires': 'room2_complete', 'endpoint': 'room3', 'next': 'final_room',
+              'error': "Wrong pattern! Look for the mathematical relationship."},
+    'final': {'requires': 'room3_complete', 'endpoint': 'final_room', 'next': 'success',
+              'error': "Incorrect solution! Use all clues systematically."},
+}
+
+CONTROL_FIELDS = ['red_system', 'blue_system', 'green_system', 'alex_role', 'sam_role', 'taylor_role']
+
+def submit_room_answer(room, form, progress=None):
+    """Check, log and record one answer from ``form`` (the room's form fields).
+
+    Returns whether it was correct; a correct final answer also completes the game.
+    """
+    session_id, user_id = session['session_id'], session['user_id']
+    if room == 'room1':
+        attempt = form.getlist('part_seq')
+        is_correct = validate_workshop_puzzle(attempt)
+    elif room == 'room2':
+        attempt = form.get('riddle_answer', '')
+        is_correct = validate_observatory_puzzle(attempt)
+    elif room == 'room3':
+        attempt = form.get('pattern_answer', '')
+        is_correct = validate_laboratory_puzzle(assign_puzzle('laboratory', 'pattern_index'), attempt)
+    else:
+        attempt = {field: form.get(field, '') for field in CONTROL_FIELDS}
+        is_correct = validate_control_puzzle(assign_puzzle('control', 'control_index'), attempt)
+    
+    log_puzzle_attempt(session_id, session['player_name'], user_id, room,
+                       attempt if isinstance(attempt, str) else str(attempt), is_correct)
+    if not is_correct:
+        return False
+    
+    if room == 'final':
+        start_time = datetime.datetime.fromisoformat(progress['start_time'])
+        elapsed = datetime.datetime.now() - start_time
+        total_time = str(elapsed).split('.')[0]
+        total_time_ms = int(elapsed.total_seconds() * 1000)
+        complete_player_game(session_id, user_id, total_time, total_time_ms)
+        session.pop('control_index', None)
+    else:
+        update_player_progress(session_id, user_id, room, True)
+        if room == 'room3':
+            session.pop('pattern_index', None)
+    return True
+
+# =============================================================================
+# ANSWER THROTTLING
+# =============================================================================
+# Every answer becomes a puzzle_attempts row, so answer POSTs (HTML or
+# /api/v1) are throttled per player and room with token buckets before any
+# database work. Buckets live in this worker process only.
+
+class TokenBuckets:
+    """Token buckets keyed by caller; past ``max_buckets`` the idlest are evicted.
+
+    An evicted bucket simply starts full again, which is where an idle
+    bucket would have been anyway.
+    """
+
+    def __init__(self, max_buckets=100000):
+        self.max_buckets = max_buckets
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+        self.rejected = {}
+
+    def take(self, key, rate, burst):
+        """Spend a token from ``key``'s bucket; returns 0, or seconds until one is due."""
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated_at = self._buckets.pop(key, (burst, now))
+            tokens = min(burst, tokens + (now - updated_at) * rate)
+            if tokens >= 1:
+                tokens -= 1
+                wait = 0
+            else:
+                wait = (1 - tokens) / rate
+            self._buckets[key] = (tokens, now)
+            while len(self._buckets) > self.max_buckets:
+                self._buckets.popitem(last=False)
+                self.evictions += 1
+            return wait
+
+    def reject(self, name):
+        with self._lock:
+            self.rejected[name] = self.rejected.get(name, 0) + 1
+
+    def __len__(self):
+        with self._lock:
+            return len(self._buckets)
+
+answer_buckets = TokenBuckets(app.config['ANSWER_RATE_LIMIT_BUCKETS'])
+
+ROOM_ENDPOINTS = {rules['endpoint']: room for room, rules in ROOM_RULES.items()}
+
+@app.before_request
+def throttle_answers():
+    if request.method != 'POST':
+        return None
+    if request.endpoint == 'index':
+        # Each new game is a players insert, so it is charged too
+        name, limit = 'new_game', app.config['NEW_GAME_RATE_LIMIT']
+    else:
+        if request.endpoint == 'api_room_answer':
+            name = request.view_args.get('room')
+        else:
+            name = ROOM_ENDPOINTS.get(request.endpoint)
+        limit = app.config['ANSWER_RATE_LIMITS'].get(name)
+    # Without a logged-in player the route only redirects, which is cheap
+    if not limit or not limit[0] or 'user_id' not in session:
+        return None
+    
+    rate, burst = limit
+    # Keyed by player, not game: a new session_id must not refill the bucket
+    wait = answer_buckets.take((name, session['user_id']), rate, burst)
+    if not wait:
+        return None
+    answer_buckets.reject(name)
+    if name == 'new_game':
+        message = 'Too many new games; wait a moment before starting another.'
+    else:
+        message = 'Too many answers; wait a moment before trying again.'
+    if request.endpoint == 'api_room_answer':
+        response = jsonify({'success': False, 'message': message, 'next': None})
+    else:
+        response = make_response(message)
+        response.mimetype = 'text/plain'
+    response.status_code = 429
+    response.headers['Retry-After'] = str(math.ceil(wait))
+    return response
+
+# =============================================================================
+# STATIC ASSETS
+# =============================================================================
+
+_asset_manifest = None
+_image_manifest = None
+
+def _read_manifest(path):
+    try:
+        with open(path) as handle:
+            return json.load(handle)
+    except (OSError, ValueError):
+        return {}
+
+def load_asset_manifest():
+    global _asset_manifest
+    _asset_manifest = _read_manifest(app.config['ASSET_MANIFEST'])
+    return _asset_manifest
+
+def load_image_manifest():
+    global _image_manifest
+    _image_manifest = _read_manifest(app.config['IMAGE_MANIFEST'])
+    return _image_manifest
+
+def static_version():
+    """Digest of both manifests; changes whenever asset or image URLs change."""
+    assets = _asset_manifest if _asset_manifest is not None else load_asset_manifest()
+    images = _image_manifest if _image_manifest is not None else load_image_manifest()
+    payload = json.dumps([assets, images], sort_keys=True).encode()
+    return hashlib.sha256(payload).hexdigest()[:16]
+
+@app.template_global()
+def asset_url(filename):
+    """URL of the built, fingerprinted copy of a static file if there is one.
+
+    Falls back to the source file when build_assets.py has not been run, and
+    always in debug mode so edits show up without a rebuild.
+    """
+    manifest = _asset_manifest if _asset_manifest is not None else load_asset_manifest()
+    if not app.debug and filename in manifest:
+        filename = manifest[filename]
+    return url_for('static', filename=filename)
+
+@app.template_global()
+def picture(filename, alt='', sizes='100vw', class_=None, loading='eager'):
+    """<picture> markup offering every built AVIF/WebP width of an image.
+
+    Without a build_images.py manifest entry this is a plain <img>.
+    """
+    manifest = _image_manifest if _image_manifest is not None else load_image_manifest()
+    entry = manifest.get(filename)
+    
+    img_attributes = [f'src="{escape(url_for("static", filename=filename))}"',
+                      f'alt="{escape(alt)}"', f'loading="{escape(loading)}"', 'decoding="async"']
+    if entry:
+        img_attributes.append(f'width="{int(entry["width"])}" height="{int(entry["height"])}"')
+    
+    parts = [f'<picture class="{escape(class_)}">' if class_ else '<picture>']
+    for mime_type, candidates in (entry or {}).get('sources', {}).items():
+        srcset = ', '.join(f'{url_for("static", filename=path)} {width}w'
+                           for path, width, _ in candidates)
+        parts.append(f'<source type="{escape(mime_type)}" srcset="{escape(srcset)}" sizes="{escape(sizes)}">')
+    parts.append(f'<img {" ".join(img_attributes)}>')
+    parts.append('</picture>')
+    return Markup(''.join(parts))
+
+def is_immutable_asset(filename):
+    # Built assets and image variants carry their content hash in the name
+    return filename.startswith(('dist/', 'images/variants/'))
+
+@app.after_request
+def cache_fingerprinted_assets(response):
+    if request.endpoint == 'static' and is_immutable_asset(request.view_args.get('filename', '')):
+        response.cache_control.public = True
+        response.cache_control.max_age = app.config['IMMUTABLE_MAX_AGE']
+        response.cache_control.immutable = True
+    return response
+
+# =============================================================================
+# RESPONSE COMPRESSION
+# =============================================================================
+
+class _GzipEncoder:
+    def __init__(self, level):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data):
+        return self._compressor.compress(data)
+
+    def flush(self):
+        return self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        return self._compressor.flush()
+
+class _BrotliEncoder:
+    def __init__(self, quality):
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, data):
+        return self._compressor.process(data)
+
+    def flush(self):
+        return self._compressor.flush()
+
+    def finish(self):
+        return self._compressor.finish()
+
+class _ZstdEncoder:
+    def __init__(self, level):
+        self._compressor = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data):
+        return self._compressor.compress(data)
+
+    def flush(self):
+        return self._compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self):
+        return self._compressor.flush()
+
+def available_encodings():
+    encodings = {'gzip': lambda config: _GzipEncoder(config['COMPRESSION_GZIP_LEVEL'])}
+    if brotli is not None:
+        encodings['br'] = lambda config: _BrotliEncoder(config['COMPRESSION_BROTLI_QUALITY'])
+    if zstandard is not None:
+        encodings['zstd'] = lambda config: _ZstdEncoder(config['COMPRESSION_ZSTD_LEVEL'])
+    return encodings
+
+def negotiate_encoding(accept_encoding, offered, preference):
+    """Pick the best offered content-coding the client accepts, or None."""
+    accepted = parse_accept_header(accept_encoding)
+    best, best_quality = None, 0
+    for encoding in preference:
+        if encoding in offered:
+            quality = accepted.quality(encoding)
+            if quality > best_quality:
+                best, best_quality = encoding, quality
+    return best
+
+class CompressionMiddleware:
+    """WSGI middleware compressing eligible responses on the fly.
+
+    A response is compressed when the client accepts one of the available
+    codings, its type is in COMPRESSION_MIMETYPES, it is not already encoded
+    and it is at least COMPRESSION_MIN_SIZE bytes (responses without a
+    Content-Length are streamed and compressed chunk by chunk).
+    """
+
+    def __init__(self, wsgi_app, config):
+        self.wsgi_app = wsgi_app
+        self.config = config
+        self.encodings = available_encodings()
+
+    def __call__(self, environ, start_response):
+        if not self.config['COMPRESSION_ENABLED'] or environ.get('REQUEST_METHOD') == 'HEAD':
+            return self.wsgi_app(environ, start_response)
+        encoding = negotiate_encoding(environ.get('HTTP_ACCEPT_ENCODING', ''), self.encodings,
+                                      self.config['COMPRESSION_PREFERENCE'])
+        state = {'encoder': None, 'streaming': False}
+
+        def compressing_start_response(status, headers, exc_info=None):
+            headers = self._vary(headers)
+            if encoding and self._should_compress(status, headers):
+                state['encoder'] = self.encodings[encoding](self.config)
+                state['streaming'] = not any(name.lower() == 'content-length' for name, _ in headers)
+                headers = [(name, value) for name, value in headers
+                           if name.lower() != 'content-length']
+                headers = [(name, self._weaken(value) if name.lower() == 'etag' else value)
+                           for name, value in headers]
+                headers.append(('Content-Encoding', encoding))
+            return start_response(status, headers, exc_info)
+
+        app_iter = self.wsgi_app(environ, compressing_start_response)
+        if state['encoder'] is None:
+            return app_iter
+        return self._compress(app_iter, state['encoder'], state['streaming'])
+
+    def _should_compress(self, status, headers):
+        if not status.startswith('200'):
+            return False
+        values = {name.lower(): value for name, value in headers}
+        if 'content-encoding' in values or 'no-transform' in values.get('cache-control', ''):
+            return False
+        mimetype = values.get('content-type', '').split(';')[0].strip()
+        if mimetype not in self.config['COMPRESSION_MIMETYPES']:
+            return False
+        length = values.get('content-length')
+        return length is None or int(length) >= self.config['COMPRESSION_MIN_SIZE']
+
+    @staticmethod
+    def _vary(headers):
+        for index, (name, value) in enumerate(headers):
+            if name.lower() == 'vary':
+                if 'accept-encoding' not in value.lower():
+                    headers = list(headers)
+                    headers[index] = (name, f'{value}, Accept-Encoding')
+                return headers
+        return list(headers) + [('Vary', 'Accept-Encoding')]
+
+    @staticmethod
+    def _weaken(etag):
+        # The compressed bytes differ, so the entity tag can only be weak
+        return etag if etag.startswith('W/') else f'W/{etag}'
+
+    @staticmethod
+    def _compress(app_iter, encoder, streaming):
+        try:
+            for chunk in app_iter:
+                data = encoder.compress(chunk)
+                if streaming:
+                    # Push each chunk out now so streamed responses stay live
+                    data += encoder.flush()
+                if data:
+                    yield data
+            yield encoder.finish()
+        finally:
+            if hasattr(app_iter, 'close'):
+                app_iter.close()
+
+app.wsgi_app = CompressionMiddleware(app.wsgi_app, app.config)
+
+PRECOMPRESSED_SUFFIXES = [('br', '.br'), ('gzip', '.gz')]
+
+def serve_static(filename):
+    """Flask's static view, preferring a .br/.gz sibling written by build_assets.py."""
+    siblings = [(encoding, suffix) for encoding, suffix in PRECOMPRESSED_SUFFIXES
+                if os.path.isfile(os.path.join(app.static_folder, filename + suffix))]
+    accepted = request.accept_encodings
+    for encoding, suffix in siblings:
+        if accepted.quality(encoding) > 0:
+            response = send_from_directory(
+                app.static_folder, filename + suffix,
+                mimetype=mimetypes.guess_type(filename)[0] or 'application/octet-stream')
+            response.headers['Content-Encoding'] = encoding
+            response.vary.add('Accept-Encoding')
+            return response
+    response = app.send_static_file(filename)
+    if siblings:
+        response.vary.add('Accept-Encoding')
+    return response
+
+app.view_functions['static'] = serve_static
+
+# =============================================================================
+# ROOM PAGE CACHE
+# =============================================================================
+# A room page is the per-user base.html header wrapped around a big puzzle
+# fragment (templates/rooms/*.html) that depends only on the puzzle inputs.
+# Fragments are rendered once per distinct input and reused; GETs carry a
+# strong ETag so a repeat visit is answered with 304 before any rendering.
+
+class FragmentCache:
+    """Bounded LRU of rendered template fragments and their digests."""
+
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def render(self, template_name, context):
+        key = (template_name, json.dumps(context, sort_keys=True, default=str))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry
+            self.misses += 1
+        html = render_template(template_name, **context)
+        entry = (Markup(html), hashlib.sha256(html.encode()).hexdigest())
+        with self._lock:
+            self._entries[key] = entry
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return entry
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+room_fragments = FragmentCache(app.config['ROOM_FRAGMENT_CACHE_SIZE'])
+
+def room_page_etag(fragment_digest):
+    # Everything base.html reads besides the fragment (flashes are excluded
+    # by never sending an ETag on a page that shows them)
+    header_inputs = '|'.join([
+        fragment_digest,
+        request.endpoint or '',
+        str(session.get('username', '')),
+        str(bool(session.get('logged_in'))),
+        str('session_id' in session),
+        static_version(),
+    ])
+    return hashlib.sha256(header_inputs.encode()).hexdigest()
+
+def render_room(room, fragment_context, error=None):
+    fragment, digest = room_fragments.render(f'rooms/{room}.html',
+                                             dict(fragment_context, error=error))
+    
+    # Flashed messages are consumed by rendering, so a page showing them is
+    # never answered with (or stored for) a 304
+    cacheable = error is None and request.method == 'GET' and not session.get('_flashes')
+    etag = room_page_etag(digest) if cacheable else None
+    if etag and request.if_none_match.contains_weak(etag):
+        response = app.response_class(status=304)
+    else:
+        response = make_response(render_template(f'{room}.html', room_content=fragment))
+    
+    if etag:
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'private, no-cache'
+        response.vary.add('Cookie')
+    else:
+        response.headers['Cache-Control'] = 'no-store'
+    return response
+
+def room_fragment_contexts():
+    """Every (room, context) a room GET can render, for warming the cache."""
+    yield 'room1', {'parts': WORKSHOP_PARTS}
+    yield 'room2', {'riddle': OBSERVATORY_RIDDLE['question']}
+    for pattern in puzzle_pool('laboratory'):
+        yield 'room3', {'pattern': pattern}
+    for variant in puzzle_pool('control'):
+        yield 'final', {'clues': variant['clues']}
+
+def warm_room_fragments():
+    with app.test_request_context():
+        for room, context in room_fragment_contexts():
+            room_fragments.render(f'rooms/{room}.html', dict(context, error=None))
+
 # =============================================================================
 # AUTHENTICATION ROUTES
 # =============================================================================
@@ -467,7 +3285,8 @@ def profile():
         return redirect(url_for('login'))
     
     user_profile = get_user_profile(session['user_id'])
-    return render_template('profile.html', profile=user_profile)
+    return render_template('profile.html', profile=user_profile,
+                           stats=get_user_stats(session['user_id']))
 
 # =============================================================================
 # SAVE/LOAD ROUTES
@@ -483,7 +3302,8 @@ def save_current_game():
     
     save_name = request.json.get('save_name', f"Save_{datetime.datetime.now().strftime('%Y-%m-%d %H:%M')}")
     
-    game_data = get_game_state(session['session_id'])
+    progress = get_player_progress(session['session_id'], session['user_id'])
+    game_data = get_game_state(session['session_id'], session['user_id'], progress)
     if not game_data:
         return jsonify({'success': False, 'message': 'No game progress to save'})
     
@@ -492,7 +3312,7 @@ def save_current_game():
         save_name,
         session['session_id'],
         session['player_name'],
-        determine_current_room(get_player_progress(session['session_id'])),
+        determine_current_room(progress),
         game_data
     )
     
@@ -515,7 +3335,7 @@ def load_saved_game(save_id):
     session['session_id'] = saved_game['session_id']
     session['player_name'] = saved_game['player_name']
     
-    restore_game_state(saved_game['session_id'], saved_game['game_data'])
+    restore_game_state(saved_game['session_id'], session['user_id'], saved_game['game_data'])
     
     room_endpoint_map = {
         'room1': 'room1',
@@ -555,6 +3375,21 @@ def delete_saved_game(save_id):
     
     return redirect(url_for('saves'))
 
+@app.route('/saves/<int:save_id>/history')
+def save_history(save_id):
+    if 'user_id' not in session:
+        return jsonify({'success': False, 'message': 'Please log in to view save history'})
+    
+    snapshots = get_save_history(session['user_id'], save_id)
+    return jsonify({
+        'success': True,
+        'history': [{
+            'current_room': snapshot['current_room'],
+            'saved_at': snapshot['saved_at'],
+            'game_state': json.loads(snapshot['game_data'])
+        } for snapshot in snapshots]
+    })
+
 @app.route('/quick_save')
 def quick_save():
     if 'user_id' not in session:
@@ -563,22 +3398,35 @@ def quick_save():
     if 'session_id' not in session:
         return jsonify({'success': False, 'message': 'No active game'})
     
-    save_name = f"QuickSave_{datetime.datetime.now().strftime('%H:%M')}"
-    game_data = get_game_state(session['session_id'])
+    progress = get_player_progress(session['session_id'], session['user_id'])
+    game_data = get_game_state(session['session_id'], session['user_id'], progress)
     
     if not game_data:
         return jsonify({'success': False, 'message': 'No progress to save'})
     
-    success = save_game(
-        session['user_id'],
-        save_name,
-        session['session_id'],
-        session['player_name'],
-        determine_current_room(get_player_progress(session['session_id'])),
-        game_data
-    )
+    # game.js calls this on every page unload; only write when something changed
+    digest = hashlib.sha256(f"{session['session_id']}:{game_data}".encode()).hexdigest()
+    saved = False
+    if not quick_saves.is_recent(session['user_id'], digest):
+        try:
+            saved = save_game(
+                session['user_id'],
+                app.config['QUICK_SAVE_SLOT'],
+                session['session_id'],
+                session['player_name'],
+                determine_current_room(progress),
+                game_data,
+                only_if_changed=True
+            )
+        except sqlite3.Error:
+            quick_saves.forget(session['user_id'])
+            raise
+        quick_saves.record(session['user_id'], digest, saved)
     
-    return jsonify({'success': success, 'message': 'Quick save completed!' if success else 'Save failed'})
+    if not saved:
+        return jsonify({'success': True, 'saved': False, 'reason': 'unchanged',
+                        'message': 'Quick save is already up to date'})
+    return jsonify({'success': True, 'saved': True, 'message': 'Quick save completed!'})
 
 # =============================================================================
 # MAIN GAME ROUTES
@@ -599,10 +3447,10 @@ def index():
             return redirect(url_for('room1'))
     
     leaderboard = get_leaderboard()
-    all_players = get_all_players()
+    recent_players, _ = get_players_page(limit=10)
     return render_template('index.html', 
                          leaderboard=leaderboard, 
-                         all_players=all_players,
+                         recent_players=recent_players,
                          logged_in=session.get('logged_in'),
                          username=session.get('username'))
 
@@ -616,21 +3464,12 @@ def room1():
         return redirect(url_for('index'))
     
     if request.method == 'POST':
-        selected_sequence = request.form.getlist('part_seq')
-        
-        is_correct = validate_workshop_puzzle(selected_sequence)
-        log_puzzle_attempt(session['session_id'], session['player_name'], 
-                          session.get('user_id'), 'room1', str(selected_sequence), is_correct)
-        
-        if is_correct:
-            update_player_progress(session['session_id'], 'room1', True)
+        if submit_room_answer('room1', request.form):
             return redirect(url_for('room2'))
         else:
-            return render_template('room1.html', 
-                                 parts=WORKSHOP_PARTS,
-                                 error="Incorrect assembly sequence! Check the blueprint carefully.")
+            return render_room('room1', {'parts': WORKSHOP_PARTS}, error=ROOM_RULES['room1']['error'])
     
-    return render_template('room1.html', parts=WORKSHOP_PARTS)
+    return render_room('room1', {'parts': WORKSHOP_PARTS})
 
 @app.route('/room2', methods=['GET', 'POST'])
 def room2():
@@ -641,26 +3480,18 @@ def room2():
     if 'session_id' not in session:
         return redirect(url_for('index'))
     
-    progress = get_player_progress(session['session_id'])
+    progress = get_player_progress(session['session_id'], session['user_id'], require='room1_complete')
     if not progress or not progress['room1_complete']:
         return redirect(url_for('room1'))
     
     if request.method == 'POST':
-        answer = request.form.get('riddle_answer', '')
-        is_correct = validate_observatory_puzzle(answer)
-        
-        log_puzzle_attempt(session['session_id'], session['player_name'], 
-                          session.get('user_id'), 'room2', answer, is_correct)
-        
-        if is_correct:
-            update_player_progress(session['session_id'], 'room2', True)
+        if submit_room_answer('room2', request.form, progress):
             return redirect(url_for('room3'))
         else:
-            return render_template('room2.html', 
-                                 riddle=OBSERVATORY_RIDDLE['question'],
-                                 error="Wrong answer! Think about what repeats your words in empty spaces.")
+            return render_room('room2', {'riddle': OBSERVATORY_RIDDLE['question']},
+                               error=ROOM_RULES['room2']['error'])
     
-    return render_template('room2.html', riddle=OBSERVATORY_RIDDLE['question'])
+    return render_room('room2', {'riddle': OBSERVATORY_RIDDLE['question']})
 
 @app.route('/room3', methods=['GET', 'POST'])
 def room3():
@@ -671,32 +3502,20 @@ def room3():
     if 'session_id' not in session:
         return redirect(url_for('index'))
     
-    progress = get_player_progress(session['session_id'])
+    progress = get_player_progress(session['session_id'], session['user_id'], require='room2_complete')
     if not progress or not progress['room2_complete']:
         return redirect(url_for('room2'))
     
-    if 'pattern_index' not in session:
-        session['pattern_index'] = random.randint(0, len(LABORATORY_PATTERNS) - 1)
-    
-    pattern = LABORATORY_PATTERNS[session['pattern_index']]
+    pattern_index = assign_puzzle('laboratory', 'pattern_index')
+    pattern = get_puzzle('laboratory', pattern_index)
     
     if request.method == 'POST':
-        user_answer = request.form.get('pattern_answer', '')
-        is_correct = validate_laboratory_puzzle(session['pattern_index'], user_answer)
-        
-        log_puzzle_attempt(session['session_id'], session['player_name'], 
-                          session.get('user_id'), 'room3', user_answer, is_correct)
-        
-        if is_correct:
-            update_player_progress(session['session_id'], 'room3', True)
-            session.pop('pattern_index', None)
+        if submit_room_answer('room3', request.form, progress):
             return redirect(url_for('final_room'))
         else:
-            return render_template('room3.html', 
-                                 pattern=pattern,
-                                 error="Wrong pattern! Look for the mathematical relationship.")
+            return render_room('room3', {'pattern': pattern}, error=ROOM_RULES['room3']['error'])
     
-    return render_template('room3.html', pattern=pattern)
+    return render_room('room3', {'pattern': pattern})
 
 @app.route('/final', methods=['GET', 'POST'])
 def final_room():
@@ -707,44 +3526,27 @@ def final_room():
     if 'session_id' not in session:
         return redirect(url_for('index'))
     
-    progress = get_player_progress(session['session_id'])
+    progress = get_player_progress(session['session_id'], session['user_id'], require='room3_complete')
     if not progress or not progress['room3_complete']:
         return redirect(url_for('room3'))
     
+    control_index = assign_puzzle('control', 'control_index')
+    clues = get_puzzle('control', control_index)['clues']
+    
     if request.method == 'POST':
-        answers = {
-            'red_system': request.form.get('red_system', ''),
-            'blue_system': request.form.get('blue_system', ''),
-            'green_system': request.form.get('green_system', ''),
-            'alex_role': request.form.get('alex_role', ''),
-            'sam_role': request.form.get('sam_role', ''),
-            'taylor_role': request.form.get('taylor_role', '')
-        }
-        
-        is_correct = validate_control_puzzle(answers)
-        log_puzzle_attempt(session['session_id'], session['player_name'], 
-                          session.get('user_id'), 'final', str(answers), is_correct)
-        
-        if is_correct:
-            start_time = datetime.datetime.fromisoformat(progress['start_time'])
-            end_time = datetime.datetime.now()
-            total_time = str(end_time - start_time).split('.')[0]
-            
-            complete_player_game(session['session_id'], total_time)
+        if submit_room_answer('final', request.form, progress):
             return redirect(url_for('success'))
         else:
-            return render_template('final.html', 
-                                 clues=CONTROL_CLUES,
-                                 error="Incorrect solution! Use all clues systematically.")
+            return render_room('final', {'clues': clues}, error=ROOM_RULES['final']['error'])
     
-    return render_template('final.html', clues=CONTROL_CLUES)
+    return render_room('final', {'clues': clues})
 
 @app.route('/success')
 def success():
     if 'session_id' not in session:
         return redirect(url_for('index'))
     
-    progress = get_player_progress(session['session_id'])
+    progress = get_player_progress(session['session_id'], session.get('user_id'), require='final_complete')
     if not progress or not progress['final_complete']:
         return redirect(url_for('index'))
     
@@ -757,8 +3559,230 @@ def success():
 @app.route('/leaderboard')
 def leaderboard():
     leaderboard = get_leaderboard()
-    all_players = get_all_players()
-    return render_template('leaderboard.html', leaderboard=leaderboard, all_players=all_players)
+    after = request.args.get('after')
+    try:
+        players, next_cursor = get_players_page(after, app.config['PLAYERS_PAGE_SIZE'])
+    except ValueError:
+        return redirect(url_for('leaderboard'))
+    return render_template('leaderboard.html', leaderboard=leaderboard,
+                         players=players, next_cursor=next_cursor,
+                         is_first_page=not after)
+
+def leaderboard_event_stream(subscriber, backlog):
+    """SSE frames for one client, until it lags, the worker stops or the stream times out."""
+    heartbeat = app.config['LEADERBOARD_EVENTS_HEARTBEAT_SECONDS']
+    poll = app.config['LEADERBOARD_EVENTS_POLL_SECONDS']
+    wait = min(heartbeat, poll) if poll else heartbeat
+    ends_at = time.monotonic() + app.config['LEADERBOARD_EVENTS_MAX_SECONDS']
+    try:
+        yield f'retry: {SSE_RETRY_MS}\n\n'
+        yield from backlog
+        quiet_since = time.monotonic()
+        while time.monotonic() < ends_at:
+            if subscriber.dropped and subscriber.events.empty():
+                return
+            try:
+                event = subscriber.events.get(timeout=wait)
+            except queue.Empty:
+                event = ''
+            if event is None:
+                return
+            if event:
+                yield event
+                quiet_since = time.monotonic()
+                continue
+            if poll and leaderboard_events.claim_poll(poll):
+                # Picks up finishes recorded by other workers; a change lands
+                # in every subscriber's queue, this one included
+                with app.app_context():
+                    refresh_leaderboard()
+            if time.monotonic() - quiet_since >= heartbeat:
+                # Keeps proxies from timing the stream out, and finds dead clients
+                yield ': keep-alive\n\n'
+                quiet_since = time.monotonic()
+    finally:
+        leaderboard_events.unsubscribe(subscriber)
+
+@app.route('/events/leaderboard')
+def leaderboard_events_stream():
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    subscriber, backlog = leaderboard_events.subscribe(get_leaderboard(), last_event_id)
+    if subscriber is None:
+        response = make_response('Too many leaderboard listeners', 503)
+        response.headers['Retry-After'] = str(SSE_RETRY_MS // 1000)
+        return response
+    
+    # Not stream_with_context: the stream must not hold this request's
+    # pooled connections for its whole lifetime
+    response = Response(leaderboard_event_stream(subscriber, backlog), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-store'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+@app.route('/api/players')
+def api_players():
+    try:
+        limit = int(request.args.get('limit', app.config['PLAYERS_PAGE_SIZE']))
+    except ValueError:
+        return jsonify({'success': False, 'message': 'limit must be an integer'}), 400
+    limit = max(1, min(limit, app.config['PLAYERS_PAGE_MAX']))
+    
+    try:
+        players, next_cursor = get_players_page(request.args.get('after'), limit)
+    except ValueError:
+        return jsonify({'success': False, 'message': 'Invalid cursor'}), 400
+    
+    return jsonify({
+        'success': True,
+        'players': [{
+            'player_name': player['player_name'],
+            'start_time': player['start_time'],
+            'end_time': player['end_time'],
+            'total_time': player['total_time'],
+            'current_room': determine_current_room(player),
+        } for player in players],
+        'next': next_cursor
+    })
+
+def api_error(status, message, next_url=None):
+    return jsonify({'success': False, 'message': message, 'next': next_url}), status
+
+@app.route('/api/v1/rooms/<room>/answer', methods=['POST'])
+def api_room_answer(room):
+    """Answer a room from JSON: the room form's fields in, a few bytes of verdict out."""
+    rules = ROOM_RULES.get(room)
+    if rules is None:
+        return api_error(404, 'Unknown room')
+    if 'user_id' not in session:
+        return api_error(401, 'Please log in to play', url_for('login'))
+    if 'session_id' not in session:
+        return api_error(409, 'Start a game first', url_for('index'))
+    
+    progress = None
+    if rules['requires']:
+        progress = get_player_progress(session['session_id'], session['user_id'], require=rules['requires'])
+        if not progress or not progress[rules['requires']]:
+            previous = ROOM_ORDER[ROOM_ORDER.index(room) - 1]
+            return api_error(409, 'This room is still locked', url_for(ROOM_RULES[previous]['endpoint']))
+    
+    payload = request.get_json(silent=True)
+    if not isinstance(payload, dict):
+        return api_error(400, 'Expected a JSON object of form fields')
+    # Same shape as the HTML form: a list stands for a repeated field
+    form = MultiDict([(field, str(value)) for field, values in payload.items()
+                      for value in (values if isinstance(values, list) else [values])])
+    
+    if not submit_room_answer(room, form, progress):
+        return jsonify({'success': True, 'correct': False, 'message': rules['error']})
+    return jsonify({'success': True, 'correct': True, 'next': url_for(rules['next'])})
+
+def metrics_access_allowed():
+    token = app.config['METRICS_TOKEN']
+    if token:
+        return hmac.compare_digest(request.headers.get('Authorization', '').encode(),
+                                   f'Bearer {token}'.encode())
+    return request.remote_addr in ('127.0.0.1', '::1')
+
+@app.route('/api/stats/cache')
+def cache_stats():
+    if not metrics_access_allowed():
+        return 'Forbidden', 403
+    return jsonify({'progress': progress_cache.stats()})
+
+def runtime_metrics():
+    """Cache, queue and error counters as (name, type, help, labels, value)."""
+    progress = progress_cache.stats()
+    samples = [
+        ('database_busy_errors_total', 'counter', 'Requests answered 503 on SQLite lock contention.',
+         (), database_busy_errors),
+        ('progress_cache_entries', 'gauge', 'Sessions held in the progress cache.',
+         (), progress['entries']),
+        ('leaderboard_entries', 'gauge', 'Finishes held in the in-memory leaderboard.',
+         (), len(leaderboard_cache.top())),
+        ('leaderboard_subscribers', 'gauge', 'Open /events/leaderboard streams.',
+         (), leaderboard_events.subscriber_count()),
+        ('leaderboard_events_total', 'counter', 'Leaderboard changes pushed to subscribers.',
+         (), leaderboard_events.published),
+        ('leaderboard_subscribers_dropped_total', 'counter',
+         'Event streams cut off for falling too far behind.', (), leaderboard_events.dropped),
+    ]
+    for result in ('hits', 'misses', 'evictions'):
+        samples.append(('progress_cache_lookups_total', 'counter', 'Progress cache activity, by result.',
+                        (('result', result),), progress[result]))
+    samples.append(('answer_rate_limit_buckets', 'gauge', 'Players tracked by the answer throttle.',
+                    (), len(answer_buckets)))
+    for room in ROOM_ORDER:
+        samples.append(('answers_throttled_total', 'counter', 'Answer POSTs refused with 429, by room.',
+                        (('room', room),), answer_buckets.rejected.get(room, 0)))
+    samples.append(('new_games_throttled_total', 'counter', 'New game POSTs refused with 429.',
+                    (), answer_buckets.rejected.get('new_game', 0)))
+    for result in ('hits', 'misses'):
+        samples.append(('room_fragment_cache_lookups_total', 'counter',
+                        'Room fragment cache lookups, by result.',
+                        (('result', result),), getattr(room_fragments, result)))
+    for outcome, count in (('written', quick_saves.written),
+                           ('unchanged', quick_saves.skipped_unchanged),
+                           ('recent', quick_saves.skipped_recent)):
+        samples.append(('quick_saves_total', 'counter', 'Quick save requests, by outcome.',
+                        (('outcome', outcome),), count))
+    for writer in _background_writers:
+        labels = (('queue', writer.name),)
+        samples.append(('write_behind_pending', 'gauge', 'Rows waiting in a write-behind queue.',
+                        labels, writer.pending()))
+        for kind in ('written', 'batches', 'inline_writes', 'retries', 'failed'):
+            samples.append((f'write_behind_{kind}_total', 'counter',
+                            f'Write-behind queue {kind.replace("_", " ")}.', labels, getattr(writer, kind)))
+    return samples
+
+@app.route('/metrics')
+def metrics_endpoint():
+    if not app.config['METRICS_ENABLED']:
+        return 'Metrics are disabled', 404
+    if not metrics_access_allowed():
+        return 'Forbidden', 403
+    response = make_response(metrics.render(runtime_metrics()))
+    response.mimetype = 'text/plain'
+    response.headers['Content-Type'] = 'text/plain; version=0.0.4; charset=utf-8'
+    response.headers['Cache-Control'] = 'no-store'
+    return response
+
+def is_admin():
+    return session.get('username') in app.config['ADMIN_USERNAMES']
+
+@app.route('/admin/stats')
+def admin_stats():
+    if 'user_id' not in session:
+        flash('Please log in to view statistics', 'error')
+        return redirect(url_for('login', next=request.path))
+    if not is_admin():
+        return 'Forbidden', 403
+    
+    try:
+        days = min(max(int(request.args.get('days', 30)), 1), 366)
+    except ValueError:
+        days = 30
+    stats = get_rollup_stats(days)
+    if request.accept_mimetypes.best_match(['text/html', 'application/json']) == 'application/json' \
+            or request.args.get('format') == 'json':
+        return jsonify(stats)
+    return render_template('admin_stats.html', stats=stats, days=days)
+
+@app.route('/admin/export/<table>.<fmt>')
+def admin_export(table, fmt):
+    if 'user_id' not in session:
+        flash('Please log in to export data', 'error')
+        return redirect(url_for('login', next=request.path))
+    if not is_admin():
+        return 'Forbidden', 403
+    if table not in EXPORT_TABLES or fmt not in EXPORT_FORMATS:
+        return 'Not Found', 404
+    
+    # stream_with_context keeps the read connection until the last chunk
+    response = Response(stream_with_context(export_rows(shard_read_dbs(), table, fmt)),
+                        mimetype=EXPORT_FORMATS[fmt])
+    response.headers['Content-Disposition'] = f'attachment; filename={table}.{fmt}'
+    response.headers['Cache-Control'] = 'no-store'
+    return response
 
 @app.route('/restart')
 def restart():
@@ -767,16 +3791,301 @@ def restart():
 
 @app.teardown_appcontext
 def close_connection(exception):
-    db = getattr(g, '_database', None)
-    if db is not None:
-        db.close()
+    for pool, db in g.pop('_writers', {}).items():
+        pool.release_writer(db)
+    for pool, db in g.pop('_readers', {}).items():
+        pool.release_reader(db)
+
+database_busy_errors = 0
+
+@app.errorhandler(sqlite3.OperationalError)
+def database_error(error):
+    global database_busy_errors
+    message = str(error).lower()
+    if 'locked' in message or 'busy' in message:
+        # Lock contention is transient: tell the client to retry
+        database_busy_errors += 1
+        app.logger.warning('database busy on %s: %s', request.path, error)
+        response = make_response('The manor is busy, please try again.', 503)
+        response.headers['Retry-After'] = '1'
+        return response
+    app.logger.exception('database error on %s', request.path)
+    return 'Internal Server Error', 500
+
+# =============================================================================
+# MAINTENANCE COMMANDS
+# =============================================================================
+
+@app.cli.command('rebuild-rollups')
+@click.option('--chunk-size', type=int, default=5000, show_default=True,
+              help='Rows folded per write transaction.')
+def rebuild_rollups_command(chunk_size):
+    """Recompute the analytics rollup tables from puzzle_attempts and players."""
+    init_db()
+    started = time.perf_counter()
+    rebuild_rollups(chunk_size, progress=lambda table, done: click.echo(f'{table}: {done} rows'))
+    click.echo(f'Rollups rebuilt in {time.perf_counter() - started:.1f}s')
+
+@app.cli.command('archive')
+@click.option('--session-days', type=int, default=None,
+              help='Archive unfinished games started longer ago than this '
+                   '(default: ABANDONED_SESSION_RETENTION_DAYS).')
+@click.option('--attempt-days', type=int, default=None,
+              help='Archive puzzle attempts older than this (default: ATTEMPT_RETENTION_DAYS).')
+@click.option('--save-days', type=int, default=None,
+              help='Archive saves deleted longer ago than this (default: DELETED_SAVE_RETENTION_DAYS).')
+@click.option('--no-vacuum', is_flag=True, help='Move rows but leave the freed pages in place.')
+def archive_command(session_days, attempt_days, save_days, no_vacuum):
+    """Move expired rows to ARCHIVE_DATABASE and reclaim the freed pages."""
+    if session_days is None:
+        session_days = app.config['ABANDONED_SESSION_RETENTION_DAYS']
+    if attempt_days is None:
+        attempt_days = app.config['ATTEMPT_RETENTION_DAYS']
+    if save_days is None:
+        save_days = app.config['DELETED_SAVE_RETENTION_DAYS']
+    init_db()
+    report = archive_old_rows(session_days, attempt_days, save_days, vacuum=not no_vacuum)
+    for table, moved in report['moved'].items():
+        click.echo(f'{table}: {moved} rows archived')
+    reclaimed = report['pages_before'] - report['pages_after']
+    click.echo(f"Reclaimed {reclaimed} pages ({reclaimed * report['page_size'] // 1024} KiB); "
+               f"{report['free_pages']} free pages remain")
+    if report['free_pages'] and not no_vacuum:
+        click.echo('This database was not created with auto_vacuum = INCREMENTAL, so the free '
+                   'pages will be reused by new rows. To shrink it, stop the game and run '
+                   '"PRAGMA auto_vacuum = INCREMENTAL; VACUUM;" on it once.')
+
+@app.cli.command('export')
+@click.argument('table', type=click.Choice(EXPORT_TABLES))
+@click.option('--format', 'fmt', type=click.Choice(sorted(EXPORT_FORMATS)), default='ndjson',
+              show_default=True)
+@click.option('--output', type=click.File('w'), default='-', help='File to write (default: stdout).')
+def export_command(table, fmt, output):
+    """Stream a table out as NDJSON or CSV."""
+    init_db()
+    with app.app_context():
+        for chunk in export_rows(shard_read_dbs(), table, fmt):
+            output.write(chunk)
+
+@app.cli.command('import')
+@click.argument('table', type=click.Choice(EXPORT_TABLES))
+@click.argument('source', type=click.File('r'))
+@click.option('--format', 'fmt', type=click.Choice(sorted(EXPORT_FORMATS)), default=None,
+              help='Input format (default: from the file extension, else ndjson).')
+@click.option('--batch-size', type=int, default=None,
+              help='Rows per write transaction (default: IMPORT_BATCH_SIZE).')
+@click.option('--on-conflict', type=click.Choice(['abort', 'ignore', 'replace']), default='abort',
+              show_default=True, help='What to do with rows that clash with existing ones.')
+def import_command(table, source, fmt, batch_size, on_conflict):
+    """Bulk-load rows exported by `flask export` (or any NDJSON/CSV) into a table."""
+    if fmt is None:
+        fmt = 'csv' if source.name.endswith('.csv') else 'ndjson'
+    init_db()
+    started = time.perf_counter()
+    try:
+        read, written = import_rows(table, read_import_rows(source, fmt), batch_size, on_conflict,
+                                    progress=lambda done: click.echo(f'{table}: {done} rows', err=True))
+    except sqlite3.IntegrityError as exc:
+        raise click.ClickException(f'{exc}; the batches reported above were committed '
+                                   '(use --on-conflict ignore or replace to continue)')
+    except ValueError as exc:
+        raise click.ClickException(str(exc))
+    click.echo(f'Imported {written} of {read} {table} rows in {time.perf_counter() - started:.1f}s')
+    if table in ('players', 'puzzle_attempts'):
+        click.echo('Run `flask rebuild-rollups` to include them in /admin/stats.')
+
+@app.cli.command('purge-saves')
+@click.option('--days', type=int, default=None,
+              help='Keep soft-deleted saves younger than this (default: DELETED_SAVE_RETENTION_DAYS).')
+def purge_saves_command(days):
+    """Permanently remove soft-deleted saved games."""
+    if days is None:
+        days = app.config['DELETED_SAVE_RETENTION_DAYS']
+    init_db()
+    with app.app_context():
+        removed = purge_deleted_saves(days)
+    click.echo(f'Purged {removed} deleted saves older than {days} days')
+
+# =============================================================================
+# APPLICATION FACTORY & SERVING
+# =============================================================================
+# The app is configured at import time (defaults, then MANOR_* variables);
+# create_app() layers explicit settings on top and migrates the database.
+# `flask --app app serve` migrates once in the parent, then forks worker
+# processes that share one listening socket and each serve it with threads.
+
+_worker_start_hooks = []
+
+def on_worker_start(hook):
+    """Register a warmup hook, run (in an app context) by every worker before it serves."""
+    _worker_start_hooks.append(hook)
+    return hook
+
+on_worker_start(warm_room_fragments)
+on_worker_start(leaderboard_events.reset)
+on_worker_start(get_leaderboard)
+
+def apply_config():
+    """Push app.config into the per-process components created at import time."""
+    progress_cache.max_entries = app.config['PROGRESS_CACHE_MAX_ENTRIES']
+    progress_cache.ttl_seconds = app.config['PROGRESS_CACHE_TTL_SECONDS']
+    leaderboard_cache.size = app.config['LEADERBOARD_SIZE']
+    leaderboard_cache.reload_seconds = app.config['LEADERBOARD_RELOAD_SECONDS']
+    leaderboard_events.history = app.config['LEADERBOARD_EVENTS_HISTORY']
+    leaderboard_events.buffer_size = app.config['LEADERBOARD_EVENTS_BUFFER']
+    leaderboard_events.max_subscribers = app.config['LEADERBOARD_EVENTS_MAX_SUBSCRIBERS']
+    leaderboard_events.reset()
+    quick_saves.debounce_seconds = app.config['QUICK_SAVE_DEBOUNCE_SECONDS']
+    quick_saves.max_users = app.config['QUICK_SAVE_TRACKED_USERS']
+    room_fragments.max_entries = app.config['ROOM_FRAGMENT_CACHE_SIZE']
+    answer_buckets.max_buckets = app.config['ANSWER_RATE_LIMIT_BUCKETS']
+    load_puzzle_store()
+    metrics.request_buckets = app.config['METRICS_REQUEST_BUCKETS']
+    metrics.sql_buckets = app.config['METRICS_SQL_BUCKETS']
+    metrics.max_queries = app.config['METRICS_MAX_QUERIES']
+    attempt_log.batch_size = app.config['ATTEMPT_LOG_BATCH_SIZE']
+    attempt_log.flush_interval = app.config['ATTEMPT_LOG_FLUSH_SECONDS']
+    login_log.flush_interval = app.config['LAST_LOGIN_FLUSH_SECONDS']
+    # Reopen connections with the (possibly new) DATABASE and pool settings
+    close_pool()
+
+_app_created = False
+
+def create_app(config=None, migrate=True):
+    """Return the configured app; ``config`` overrides defaults and MANOR_* variables.
+
+    There is one app per process (the caches, pools and queues above are
+    module-level), so it is configured once: calling again returns it as is,
+    and passing ``config`` the second time raises RuntimeError.
+    """
+    global _app_created
+    if _app_created:
+        if config:
+            raise RuntimeError('create_app() has already configured the app in this process')
+        return app
+    settings = dict(app.config, **(config or {}))
+    if settings['SECRET_KEY'] == DEVELOPMENT_SECRET_KEY and not settings['DEBUG']:
+        raise RuntimeError('MANOR_SECRET_KEY is not set; the development key is only '
+                           'allowed with MANOR_DEBUG=true')
+    if config:
+        app.config.update(config)
+    apply_config()
+    if migrate:
+        init_db()
+    _app_created = True
+    return app
+
+class WorkerRequestHandler(WSGIRequestHandler):
+    # Bounds how long an idle keep-alive connection holds a thread
+    timeout = 5
+
+class WorkerServer(ThreadedWSGIServer):
+    # Non-daemon request threads: server_close() waits for in-flight requests
+    daemon_threads = False
+
+def run_worker(listener):
+    """Serve ``listener`` from this process until SIGTERM/SIGINT, then drain."""
+    # Forked workers would otherwise all replay the parent's random sequence
+    random.seed()
+    with app.app_context():
+        for hook in _worker_start_hooks:
+            hook()
+
+    WorkerRequestHandler.timeout = app.config['SERVE_KEEPALIVE_SECONDS']
+    host, port = listener.getsockname()[:2]
+    server = WorkerServer(host, port, app, handler=WorkerRequestHandler, fd=listener.fileno())
+
+    def stop(signum, frame):
+        # Event streams never finish on their own, and shutdown waits for them
+        leaderboard_events.close()
+        # shutdown() blocks until serve_forever() returns, so not from this thread
+        threading.Thread(target=server.shutdown, daemon=True).start()
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    try:
+        server.serve_forever()
+    finally:
+        shutdown_background_writers()
+        close_pool()
+
+def serve(host='127.0.0.1', port=5000, workers=1):
+    """Migrate once, then serve with ``workers`` pre-forked processes."""
+    create_app()
+    if app.secret_key == DEVELOPMENT_SECRET_KEY:
+        app.logger.warning('using the development secret key; set MANOR_SECRET_KEY')
+
+    family = socket.AF_INET6 if ':' in host else socket.AF_INET
+    listener = socket.create_server((host, port), family=family, backlog=1024)
+    # Every worker polls the same socket; the ones that lose the race for a
+    # connection get EAGAIN instead of blocking in accept()
+    listener.setblocking(False)
+    print(f'Serving on http://{host}:{listener.getsockname()[1]} with {workers} worker(s)')
+
+    if workers <= 1 or not hasattr(os, 'fork'):
+        run_worker(listener)
+        listener.close()
+        return
+
+    # No SQLite connection may be shared across fork()
+    close_pool()
+    children = set()
+    stopping = False
+
+    def spawn():
+        pid = os.fork()
+        if pid == 0:
+            status = 1
+            try:
+                run_worker(listener)
+                status = 0
+            finally:
+                os._exit(status)
+        children.add(pid)
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    for _ in range(workers):
+        spawn()
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        children.discard(pid)
+        if not stopping:
+            app.logger.warning('worker %d exited with status %d; starting a new one', pid, status)
+            time.sleep(1)
+            spawn()
+    listener.close()
+
+@app.cli.command('serve')
+@click.option('--host', default='127.0.0.1', show_default=True)
+@click.option('--port', type=int, default=5000, show_default=True)
+@click.option('--workers', type=int, default=os.cpu_count() or 1, show_default=True,
+              help='Worker processes; 1 serves from this process.')
+def serve_command(host, port, workers):
+    """Serve the game with pre-forked, threaded worker processes."""
+    serve(host, port, workers)
 
 # =============================================================================
 # APPLICATION STARTUP
 # =============================================================================
 
 if __name__ == '__main__':
-    if not os.path.exists(DATABASE):
-        init_db()
-        print("Database initialized successfully!")
-    app.run(debug=True)
\ No newline at end of file
+    # Development server; use `flask --app app serve` to run on every core
+    create_app({'DEBUG': True}, migrate=False)
+    applied = init_db()
+    if applied:
+        print(f"Database migrated to schema version {applied[-1]}")
+    warm_room_fragments()
+    app.run(debug=True)
@@ -0,0 +1,425 @@
+# =============================================================================
+# MANOR OF SHADOW - LOAD TEST
+# =============================================================================
+# Plays complete manor runs (register -> login -> entrance -> room1 ... final
+# -> success, with wrong answers, quick saves and leaderboard polling) and
+# reports throughput and p50/p95/p99 latency per route.
+#
+# Two drivers:
+#   flask  in-process Flask test client on a scratch copy of the database,
+#          one thread per concurrent player
+#   http   real HTTP against a running server, one process per concurrent
+#          player (start the server first, e.g. `flask --app app serve`)
+#
+#   python benchmarks/loadtest.py --driver flask --players 8 --journeys 40
+#   python benchmarks/loadtest.py --driver http --url http://127.0.0.1:5000 --players 16
+#
+# benchmarks/baselines/flask.json was recorded with
+#   python benchmarks/loadtest.py --players 8 --journeys 80 --hash-iterations 1000 \
+#       --seed-players 20000 --runs 5 --save-baseline benchmarks/baselines/flask.json
+# and the same arguments with --compare instead of --save-baseline check it.
+# The file also records the settings and the machine it was taken on; compare
+# on similar hardware, since latency scales with cores and disk.
+#
+# --seed-players pre-fills the scratch database (flask driver) through
+# benchmarks/seed.py so runs can be repeated against realistic table sizes.
+# --shards N (flask driver) splits game data over N shard databases; the
+# seeded rows only fill the single-file layout, so combine it with
+# --seed-players only to measure the empty-shard write path.
+# --runs N repeats the whole test (the flask driver in a fresh process each
+# time) and reports the median of the runs, so one noisy run cannot fail it.
+# --save-baseline writes the report; --compare exits non-zero when a route's
+# p95 latency regressed beyond --tolerance plus --slack-ms, or the overall
+# throughput beyond --tolerance, or the run used different settings.
+
+import argparse
+import base64
+import http.cookiejar
+import json
+import multiprocessing
+import os
+import platform
+import random
+import secrets
+import shutil
+import sqlite3
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+import zlib
+from collections import defaultdict
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+WORKSHOP_SEQUENCE = ['S', 'G', 'P', 'V', 'C']
+CONTROL_FIELDS = ['red_system', 'blue_system', 'green_system', 'alex_role', 'sam_role', 'taylor_role']
+
+# =============================================================================
+# CLIENTS
+# =============================================================================
+
+class Sample:
+    __slots__ = ('route', 'status', 'seconds')
+
+    def __init__(self, route, status, seconds):
+        self.route = route
+        self.status = status
+        self.seconds = seconds
+
+class FlaskClient:
+    """Drives the app in-process through its test client."""
+
+    def __init__(self, app):
+        self.client = app.test_client()
+        self.session_interface = app.session_interface
+        self.app = app
+
+    def request(self, method, path, data=None):
+        response = self.client.open(path, method=method, data=data)
+        response.close()
+        return response.status_code, response.get_data()
+
+    def session(self):
+        cookie = self.client.get_cookie(self.app.config['SESSION_COOKIE_NAME'])
+        return decode_session_cookie(cookie.value) if cookie else {}
+
+class HttpClient:
+    """Drives a running server over real HTTP, keeping cookies like a browser."""
+
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip('/')
+        self.cookies = http.cookiejar.CookieJar()
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(self.cookies), _NoRedirect())
+
+    def request(self, method, path, data=None):
+        body = urllib.parse.urlencode(data, doseq=True).encode() if data else None
+        request = urllib.request.Request(self.base_url + path, data=body, method=method)
+        try:
+            with self.opener.open(request, timeout=30) as response:
+                return response.status, response.read()
+        except urllib.error.HTTPError as error:
+            return error.code, error.read()
+
+    def session(self):
+        for cookie in self.cookies:
+            if cookie.name == 'session':
+                return decode_session_cookie(cookie.value)
+        return {}
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    # Redirects are timed as their own responses, like the flask driver
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+def decode_session_cookie(value):
+    """Read (not verify) the payload of Flask's signed session cookie."""
+    compressed = value.startswith('.')
+    payload = value.lstrip('.').split('.')[0]
+    raw = base64.urlsafe_b64decode(payload + '=' * (-len(payload) % 4))
+    if compressed:
+        raw = zlib.decompress(raw)
+    return json.loads(raw)
+
+# =============================================================================
+# JOURNEY
+# =============================================================================
+
+def laboratory_answer(session_data):
+    from app import get_laboratory_answer
+    return get_laboratory_answer(session_data.get('pattern_index'))
+
+def control_answers(session_data):
+    from app import get_control_answers
+    return get_control_answers(session_data.get('control_index'))
+
+def play_journey(client, player_number, rng, samples):
+    def call(route, method, path, data=None):
+        started = time.perf_counter()
+        status, body = client.request(method, path, data)
+        samples.append(Sample(route, status, time.perf_counter() - started))
+        return status, body
+
+    def wrong_answers(route, path, data, chance=0.6):
+        while rng.random() < chance:
+            call(route, 'POST', path, data)
+            chance /= 2
+
+    username = f'load_{os.getpid()}_{player_number}_{rng.randrange(1 << 30)}'
+    call('POST /auth/register', 'POST', '/auth/register',
+         {'username': username, 'password': 'loadtest', 'email': ''})
+    call('POST /auth/login', 'POST', '/auth/login', {'username': username, 'password': 'loadtest'})
+    call('GET /', 'GET', '/')
+    call('POST /', 'POST', '/', {'player_name': f'Load {player_number}'})
+
+    call('GET /room1', 'GET', '/room1')
+    wrong_answers('POST /room1', '/room1', {'part_seq': list(reversed(WORKSHOP_SEQUENCE))})
+    call('POST /room1', 'POST', '/room1', {'part_seq': WORKSHOP_SEQUENCE})
+    call('GET /quick_save', 'GET', '/quick_save?auto=1')
+
+    call('GET /room2', 'GET', '/room2')
+    wrong_answers('POST /room2', '/room2', {'riddle_answer': 'wind'})
+    call('POST /room2', 'POST', '/room2', {'riddle_answer': 'echo'})
+    call('GET /quick_save', 'GET', '/quick_save?auto=1')
+
+    call('GET /room3', 'GET', '/room3')
+    wrong_answers('POST /room3', '/room3', {'pattern_answer': '-1'})
+    call('POST /room3', 'POST', '/room3', {'pattern_answer': laboratory_answer(client.session())})
+
+    call('GET /final', 'GET', '/final')
+    wrong_answers('POST /final', '/final', {field: 'nobody' for field in CONTROL_FIELDS})
+    call('POST /final', 'POST', '/final', control_answers(client.session()))
+    call('GET /success', 'GET', '/success')
+
+    for _ in range(rng.randint(1, 3)):
+        call('GET /leaderboard', 'GET', '/leaderboard')
+    call('GET /api/players', 'GET', '/api/players?limit=20')
+
+# =============================================================================
+# DRIVERS
+# =============================================================================
+
+def run_flask(args):
+    import app as manor
+
+    workdir = tempfile.mkdtemp(prefix='manor-load-')
+    database = os.path.join(workdir, 'load.db')
+    if args.database:
+        shutil.copy(args.database, database)
+    if args.seed_players:
+        from seed import seed
+        seed(database, max(args.seed_players // 10, 1), args.seed_players)
+    config = {'DATABASE': database, 'DB_SHARDS': args.shards, 'SECRET_KEY': secrets.token_hex(16)}
+    if args.hash_iterations:
+        config['PASSWORD_HASH_ITERATIONS'] = args.hash_iterations
+    manor.create_app(config)
+    manor.warm_room_fragments()
+
+    samples = []
+    lock = threading.Lock()
+    next_journey = iter(range(args.journeys))
+
+    def worker(seed_value):
+        rng = random.Random(seed_value)
+        local = []
+        while True:
+            with lock:
+                number = next(next_journey, None)
+            if number is None:
+                break
+            play_journey(FlaskClient(manor.app), number, rng, local)
+        with lock:
+            samples.extend(local)
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker, args=(args.seed + n,)) for n in range(args.players)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    manor.shutdown_background_writers()
+    busy = manor.database_busy_errors
+    manor.close_pool()
+    shutil.rmtree(workdir, ignore_errors=True)
+    return samples, elapsed, busy
+
+def _http_worker(job):
+    base_url, journeys, seed_value = job
+    rng = random.Random(seed_value)
+    samples = []
+    for number in range(journeys):
+        play_journey(HttpClient(base_url), number, rng, samples)
+    return [(s.route, s.status, s.seconds) for s in samples]
+
+def _flask_report(args):
+    # Runs in a fresh process: the app can only be configured once per process
+    return summarize(*run_flask(args))
+
+def run_http(args):
+    per_process = [args.journeys // args.players + (1 if n < args.journeys % args.players else 0)
+                   for n in range(args.players)]
+    jobs = [(args.url, count, args.seed + n) for n, count in enumerate(per_process) if count]
+    started = time.perf_counter()
+    with multiprocessing.Pool(len(jobs)) as pool:
+        results = pool.map(_http_worker, jobs)
+    elapsed = time.perf_counter() - started
+    samples = [Sample(*sample) for result in results for sample in result]
+    busy = sum(1 for sample in samples if sample.status == 503)
+    return samples, elapsed, busy
+
+# =============================================================================
+# REPORTING
+# =============================================================================
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+def summarize(samples, elapsed, busy):
+    by_route = defaultdict(list)
+    errors = defaultdict(int)
+    for sample in samples:
+        by_route[sample.route].append(sample.seconds)
+        if sample.status >= 500:
+            errors[sample.route] += 1
+
+    routes = {}
+    for route, latencies in sorted(by_route.items()):
+        latencies.sort()
+        routes[route] = {
+            'requests': len(latencies),
+            'errors': errors[route],
+            'p50_ms': round(percentile(latencies, 0.50) * 1000, 3),
+            'p95_ms': round(percentile(latencies, 0.95) * 1000, 3),
+            'p99_ms': round(percentile(latencies, 0.99) * 1000, 3),
+        }
+    return {
+        'requests': len(samples),
+        'seconds': round(elapsed, 3),
+        'throughput_rps': round(len(samples) / elapsed, 2) if elapsed else 0.0,
+        'busy_errors': busy,
+        'routes': routes,
+    }
+
+def print_report(report):
+    print(f"{report['requests']} requests in {report['seconds']}s "
+          f"= {report['throughput_rps']} req/s, {report['busy_errors']} SQLite busy errors")
+    print(f"{'route':<22}{'count':>7}{'errors':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for route, stats in report['routes'].items():
+        print(f"{route:<22}{stats['requests']:>7}{stats['errors']:>8}"
+              f"{stats['p50_ms']:>10}{stats['p95_ms']:>10}{stats['p99_ms']:>10}")
+
+def median_report(reports):
+    """One report from several runs: median latencies and throughput, worst errors."""
+    if len(reports) == 1:
+        return reports[0]
+    routes = {}
+    for route in sorted({route for report in reports for route in report['routes']}):
+        runs = [report['routes'][route] for report in reports if route in report['routes']]
+        routes[route] = {
+            'requests': sum(stats['requests'] for stats in runs),
+            'errors': max(stats['errors'] for stats in runs),
+        }
+        for key in ('p50_ms', 'p95_ms', 'p99_ms'):
+            routes[route][key] = round(statistics.median(stats[key] for stats in runs), 3)
+    return {
+        'requests': sum(report['requests'] for report in reports),
+        'seconds': round(sum(report['seconds'] for report in reports), 3),
+        'throughput_rps': round(statistics.median(report['throughput_rps'] for report in reports), 2),
+        'busy_errors': max(report['busy_errors'] for report in reports),
+        'routes': routes,
+    }
+
+def environment():
+    return {
+        'cpus': os.cpu_count(),
+        'machine': platform.machine(),
+        'platform': platform.platform(),
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+    }
+
+SETTINGS = ('driver', 'players', 'journeys', 'seed', 'seed_players', 'shards', 'hash_iterations', 'runs')
+
+def compare(report, baseline, tolerance, slack_ms=5.0):
+    """List regressions against a saved baseline report."""
+    problems = []
+    for key, value in baseline.get('settings', {}).items():
+        # More or fewer runs only change how much noise the median absorbs
+        if key != 'runs' and report['settings'].get(key) != value:
+            problems.append(f"--{key.replace('_', '-')} is {report['settings'].get(key)}, "
+                            f"the baseline used {value}")
+    floor = baseline['throughput_rps'] * (1 - tolerance)
+    if report['throughput_rps'] < floor:
+        problems.append(f"throughput {report['throughput_rps']} req/s < {floor:.2f} req/s")
+    if report['busy_errors'] > baseline['busy_errors']:
+        problems.append(f"busy errors {report['busy_errors']} > {baseline['busy_errors']}")
+    for route, stats in report['routes'].items():
+        base = baseline['routes'].get(route)
+        if not base:
+            continue
+        # The fixed slack absorbs scheduler jitter on routes that answer in a
+        # few milliseconds, where a relative threshold alone is too tight
+        ceiling = base['p95_ms'] * (1 + tolerance) + slack_ms
+        if stats['p95_ms'] > ceiling:
+            problems.append(f"{route} p95 {stats['p95_ms']} ms > {ceiling:.3f} ms")
+        if stats['errors'] > base['errors']:
+            problems.append(f"{route} errors {stats['errors']} > {base['errors']}")
+    return problems
+
+def main():
+    parser = argparse.ArgumentParser(description='Play full manor runs and measure latency')
+    parser.add_argument('--driver', choices=['flask', 'http'], default='flask')
+    parser.add_argument('--url', default='http://127.0.0.1:5000', help='server for the http driver')
+    parser.add_argument('--players', type=int, default=8, help='concurrent players')
+    parser.add_argument('--journeys', type=int, default=40, help='total runs through the manor')
+    parser.add_argument('--seed', type=int, default=1234)
+    parser.add_argument('--database', help='flask driver: start from a copy of this database')
+    parser.add_argument('--seed-players', type=int, default=0,
+                        help='flask driver: pre-seed this many synthetic players')
+    parser.add_argument('--shards', type=int, default=1,
+                        help='flask driver: DB_SHARDS for the scratch database')
+    parser.add_argument('--hash-iterations', type=int, default=0,
+                        help='flask driver: override PASSWORD_HASH_ITERATIONS')
+    parser.add_argument('--save-baseline', metavar='PATH')
+    parser.add_argument('--compare', metavar='PATH')
+    parser.add_argument('--tolerance', type=float, default=1.0,
+                        help='allowed fractional regression against the baseline')
+    parser.add_argument('--slack-ms', type=float, default=5.0,
+                        help='p95 latency allowed on top of --tolerance, in milliseconds')
+    parser.add_argument('--runs', type=int, default=1,
+                        help='repeat the test and report the median of the runs')
+    args = parser.parse_args()
+
+    reports = []
+    if args.driver == 'http':
+        for _ in range(args.runs):
+            reports.append(summarize(*run_http(args)))
+    elif args.runs == 1:
+        reports.append(summarize(*run_flask(args)))
+    else:
+        with multiprocessing.get_context('spawn').Pool(1, maxtasksperchild=1) as pool:
+            for _ in range(args.runs):
+                reports.append(pool.apply(_flask_report, (args,)))
+    if len(reports) > 1:
+        print('req/s per run: ' + ', '.join(str(report['throughput_rps']) for report in reports))
+    report = median_report(reports)
+    report['driver'] = args.driver
+    report['players'] = args.players
+    report['journeys'] = args.journeys
+    report['settings'] = {key: getattr(args, key) for key in SETTINGS}
+    report['environment'] = environment()
+    print_report(report)
+
+    if args.save_baseline:
+        with open(args.save_baseline, 'w') as handle:
+            json.dump(report, handle, indent=2, sort_keys=True)
+        print(f'Baseline written to {args.save_baseline}')
+
+    if args.compare:
+        with open(args.compare) as handle:
+            baseline = json.load(handle)
+        recorded = baseline.get('environment', {})
+        if recorded and recorded.get('cpus') != report['environment']['cpus']:
+            print(f"warning: the baseline was recorded with {recorded.get('cpus')} CPUs, "
+                  f"this machine has {report['environment']['cpus']}")
+        problems = compare(report, baseline, args.tolerance, args.slack_ms)
+        if problems:
+            print('REGRESSION:')
+            for problem in problems:
+                print(f'  {problem}')
+            sys.exit(1)
+        print('No regression against baseline')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,131 @@
+# =============================================================================
+# MANOR OF SHADOW - QUERY PLAN BENCHMARK
+# =============================================================================
+# Seeds a throwaway database, then prints EXPLAIN QUERY PLAN output and the
+# average run time of every hot query, first on the base schema (version 1)
+# and again after all migrations have been applied.
+#
+#   python benchmarks/query_plans.py [--players 50000] [--repeat 20]
+
+import argparse
+import datetime
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import migrate_db  # noqa: E402
+
+HOT_QUERIES = [
+    ('get_player_progress',
+     'SELECT * FROM players WHERE session_id = ?',
+     lambda p: (f'session-{random.randrange(p)}',)),
+    ('get_leaderboard', '''
+        SELECT player_name, total_time, start_time, end_time
+        FROM players
+        WHERE final_complete = 1
+        ORDER BY total_time ASC
+        LIMIT 20
+     ''', lambda p: ()),
+    ('get_players_page (first page)', '''
+        SELECT player_name, start_time, end_time, total_time,
+               room1_complete, room2_complete, room3_complete, final_complete
+        FROM players
+        ORDER BY start_time DESC, id DESC
+        LIMIT 10
+     ''', lambda p: ()),
+    ('get_user_saves', '''
+        SELECT id, save_name, current_room, created_at, last_updated
+        FROM saved_games
+        WHERE user_id = ? AND is_active = 1
+        ORDER BY last_updated DESC
+     ''', lambda p: (random.randrange(p // 10 or 1),)),
+    ('puzzle_attempts by session', '''
+        SELECT COUNT(*) FROM puzzle_attempts
+        WHERE session_id = ? AND room_name = ?
+     ''', lambda p: (f'session-{random.randrange(p)}', 'room2')),
+    ('puzzle_attempts by user', '''
+        SELECT room_name, COUNT(*), SUM(is_correct) FROM puzzle_attempts
+        WHERE user_id = ?
+        GROUP BY room_name
+     ''', lambda p: (random.randrange(p // 10 or 1),)),
+]
+
+def seed(db, players):
+    users = max(players // 10, 1)
+    base = datetime.datetime(2024, 1, 1)
+    rooms = ['room1', 'room2', 'room3', 'final']
+
+    player_rows, attempt_rows, save_rows = [], [], []
+    for i in range(players):
+        user_id = i % users
+        start = base + datetime.timedelta(seconds=i * 37)
+        finished = random.random() < 0.3
+        duration = datetime.timedelta(seconds=random.randint(60, 7200))
+        player_rows.append((
+            f'session-{i}', f'Player {i}', user_id, start.isoformat(),
+            (start + duration).isoformat() if finished else None,
+            str(duration) if finished else None,
+            1, int(finished), int(finished), int(finished)))
+        for room in rooms[:random.randint(1, 4)]:
+            for attempt in range(random.randint(1, 4)):
+                attempt_rows.append((f'session-{i}', f'Player {i}', user_id, room,
+                                     'guess', int(attempt == 0)))
+        if i % 5 == 0:
+            save_rows.append((user_id, f'Save {i}', f'session-{i}', f'Player {i}',
+                              'room2', '{}', int(random.random() < 0.8)))
+
+    db.execute('BEGIN')
+    db.executemany('''
+        INSERT INTO players (session_id, player_name, user_id, start_time, end_time,
+                             total_time, room1_complete, room2_complete,
+                             room3_complete, final_complete)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ''', player_rows)
+    db.executemany('''
+        INSERT INTO puzzle_attempts (session_id, player_name, user_id, room_name, attempt, is_correct)
+        VALUES (?, ?, ?, ?, ?, ?)
+    ''', attempt_rows)
+    db.executemany('''
+        INSERT INTO saved_games (user_id, save_name, session_id, player_name,
+                                 current_room, game_data, is_active)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    ''', save_rows)
+    db.commit()
+    db.execute('ANALYZE')
+
+def report(db, players, repeat, label):
+    print(f'\n=== {label} (schema version {db.execute("PRAGMA user_version").fetchone()[0]}) ===')
+    for name, sql, params in HOT_QUERIES:
+        plan = db.execute('EXPLAIN QUERY PLAN ' + sql, params(players)).fetchall()
+        started = time.perf_counter()
+        for _ in range(repeat):
+            db.execute(sql, params(players)).fetchall()
+        elapsed_ms = (time.perf_counter() - started) * 1000 / repeat
+        print(f'\n{name}: {elapsed_ms:.3f} ms')
+        for row in plan:
+            print(f'    {row[3]}')
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare hot query plans before and after migrations')
+    parser.add_argument('--players', type=int, default=50000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    random.seed(1234)
+    with tempfile.TemporaryDirectory() as tmp:
+        db = sqlite3.connect(os.path.join(tmp, 'bench.db'))
+        migrate_db(db, target=1)
+        seed(db, args.players)
+        report(db, args.players, args.repeat, 'before')
+        migrate_db(db)
+        db.execute('ANALYZE')
+        report(db, args.players, args.repeat, 'after')
+        db.close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,165 @@
+# =============================================================================
+# MANOR OF SHADOW - SYNTHETIC DATA SEEDER
+# =============================================================================
+# Fills a database with realistic volumes of users, players, puzzle_attempts
+# and saved_games for capacity testing. Rows are generated and inserted in
+# chunks, so memory stays flat even for millions of rows.
+#
+#   python benchmarks/seed.py --database /tmp/load.db --players 1000000
+#
+# Every seeded user can log in as seed_user_<n> with the password 'password'.
+
+import argparse
+import datetime
+import hashlib
+import json
+import os
+import random
+import sqlite3
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import migrate_db  # noqa: E402
+
+SEED_PASSWORD = 'password'
+ROOMS = ['room1', 'room2', 'room3', 'final']
+WRONG_ANSWERS = {
+    'room1': "['G', 'S', 'P', 'V', 'C']",
+    'room2': 'wind',
+    'room3': '42',
+    'final': "{'red_system': 'mechanic'}",
+}
+
+def seed_password_hash():
+    # One legacy sha256 hash shared by all seed users: logging in upgrades it,
+    # and seeding a million users does not spend a million KDF runs
+    return hashlib.sha256(SEED_PASSWORD.encode()).hexdigest()
+
+def chunked(rows, size):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def generate_users(count, first_id):
+    created = datetime.datetime(2024, 1, 1).isoformat()
+    password_hash = seed_password_hash()
+    for n in range(first_id, first_id + count):
+        yield (f'seed_user_{n}', password_hash, f'seed{n}@example.com', created)
+
+def generate_players(count, user_ids, start, rng):
+    """Yield (player_row, attempt_rows, save_row_or_None) tuples."""
+    for n in range(count):
+        user_id = rng.choice(user_ids)
+        session_id = f'seed-{start.timestamp():.0f}-{n}'
+        player_name = f'Seeker {n}'
+        started = start + datetime.timedelta(seconds=n * 13)
+        # Most sessions are abandoned early; about a quarter escape
+        reached = rng.choices(range(1, 6), weights=[30, 20, 15, 10, 25])[0]
+        finished = reached == 5
+        duration = datetime.timedelta(seconds=rng.randint(90, 5400))
+        player = (
+            session_id, player_name, user_id, started.isoformat(),
+            (started + duration).isoformat() if finished else None,
+            str(duration) if finished else None,
+            int(duration.total_seconds() * 1000) if finished else None,
+            int(reached > 1), int(reached > 2), int(reached > 3), int(finished))
+
+        attempts = []
+        attempted_at = started
+        for index, room in enumerate(ROOMS[:min(reached, 4)]):
+            solved = index < reached - 1
+            for _ in range(rng.choices([0, 1, 2, 5], weights=[50, 25, 15, 10])[0]):
+                attempted_at += datetime.timedelta(seconds=rng.randint(5, 90))
+                attempts.append((session_id, player_name, user_id, room, WRONG_ANSWERS[room], 0,
+                                 attempted_at.strftime('%Y-%m-%d %H:%M:%S')))
+            if solved:
+                attempted_at += datetime.timedelta(seconds=rng.randint(5, 90))
+                attempts.append((session_id, player_name, user_id, room, 'correct', 1,
+                                 attempted_at.strftime('%Y-%m-%d %H:%M:%S')))
+
+        save = None
+        if rng.random() < 0.2:
+            state = json.dumps({
+                'room1_complete': reached > 1, 'room2_complete': reached > 2,
+                'room3_complete': reached > 3, 'final_complete': finished,
+                'start_time': started.isoformat(),
+            })
+            current_room = ['room1', 'room2', 'room3', 'final', 'completed'][reached - 1]
+            save = (user_id, f'Seed save {n}', session_id, player_name, current_room, state,
+                    attempted_at.isoformat(), int(rng.random() < 0.9))
+        yield player, attempts, save
+
+def seed(database, users, players, chunk_size=20000, seed_value=1234):
+    rng = random.Random(seed_value)
+    db = sqlite3.connect(database)
+    db.execute('PRAGMA auto_vacuum = INCREMENTAL')
+    db.execute('PRAGMA journal_mode = WAL')
+    db.execute('PRAGMA synchronous = OFF')
+    migrate_db(db)
+
+    first_id = (db.execute('SELECT COALESCE(MAX(id), 0) FROM users').fetchone()[0]) + 1
+    with db:
+        db.executemany('''
+            INSERT INTO users (username, password_hash, email, created_at)
+            VALUES (?, ?, ?, ?)
+        ''', generate_users(users, first_id))
+        db.execute('''
+            INSERT OR IGNORE INTO user_profiles (user_id, display_name)
+            SELECT id, username FROM users WHERE username LIKE 'seed_user_%'
+        ''')
+    user_ids = [row[0] for row in db.execute("SELECT id FROM users WHERE username LIKE 'seed_user_%'")]
+
+    totals = {'players': 0, 'puzzle_attempts': 0, 'saved_games': 0}
+    start = datetime.datetime(2024, 1, 1) + datetime.timedelta(
+        seconds=db.execute('SELECT COUNT(*) FROM players').fetchone()[0] * 13)
+    for chunk in chunked(generate_players(players, user_ids, start, rng), chunk_size):
+        with db:
+            db.executemany('''
+                INSERT INTO players (session_id, player_name, user_id, start_time, end_time,
+                                     total_time, total_time_ms, room1_complete, room2_complete,
+                                     room3_complete, final_complete)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', [player for player, _, _ in chunk])
+            attempts = [attempt for _, player_attempts, _ in chunk for attempt in player_attempts]
+            db.executemany('''
+                INSERT INTO puzzle_attempts (session_id, player_name, user_id, room_name,
+                                             attempt, is_correct, attempted_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', attempts)
+            saves = [save for _, _, save in chunk if save]
+            db.executemany('''
+                INSERT OR IGNORE INTO saved_games (user_id, save_name, session_id, player_name,
+                                                   current_room, game_data, last_updated, is_active)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ''', saves)
+        totals['players'] += len(chunk)
+        totals['puzzle_attempts'] += len(attempts)
+        totals['saved_games'] += len(saves)
+    db.execute('ANALYZE')
+    db.close()
+    return totals
+
+def main():
+    parser = argparse.ArgumentParser(description='Seed a Manor of Shadow database with synthetic data')
+    parser.add_argument('--database', required=True)
+    parser.add_argument('--users', type=int, default=10000)
+    parser.add_argument('--players', type=int, default=100000)
+    parser.add_argument('--chunk-size', type=int, default=20000)
+    parser.add_argument('--seed', type=int, default=1234)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    totals = seed(args.database, args.users, args.players, args.chunk_size, args.seed)
+    elapsed = time.perf_counter() - started
+    print(f'Seeded {args.users} users, ' + ', '.join(f'{count} {table}' for table, count in totals.items())
+          + f' in {elapsed:.1f}s')
+
+if __name__ == '__main__':
+    main()
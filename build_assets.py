@@ -0,0 +1,137 @@
+# =============================================================================
+# MANOR OF SHADOW - STATIC ASSET BUILD
+# =============================================================================
+# Minifies every stylesheet and script under static/css and static/js, writes
+# them to static/dist with a content hash in the file name, precompresses
+# them (gzip, plus brotli when the `brotli` package is installed) and records
+# the mapping in static/dist/manifest.json for app.asset_url().
+#
+#   python build_assets.py [--no-minify]
+
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import re
+import shutil
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import rjsmin
+except ImportError:
+    rjsmin = None
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+STATIC_DIR = os.path.join(BASE_DIR, 'static')
+DIST_DIR = os.path.join(STATIC_DIR, 'dist')
+SOURCE_DIRS = ['css', 'js']
+HASH_LENGTH = 12
+
+# =============================================================================
+# MINIFIERS
+# =============================================================================
+
+_CSS_COMMENT = re.compile(r'/\*.*?\*/', re.S)
+_CSS_STRING = re.compile(r'''("(?:\\.|[^"\\])*"|'(?:\\.|[^'\\])*')''')
+
+def minify_css(source):
+    # Split out string literals so their contents are left untouched
+    parts = _CSS_STRING.split(_CSS_COMMENT.sub('', source))
+    for index in range(0, len(parts), 2):
+        code = re.sub(r'\s+', ' ', parts[index])
+        code = re.sub(r'\s*([{};,>])\s*', r'\1', code)
+        code = re.sub(r':\s+', ':', code)
+        parts[index] = code.replace(';}', '}')
+    return ''.join(parts).strip() + '\n'
+
+def minify_js(source):
+    if rjsmin is not None:
+        return rjsmin.jsmin(source) + '\n'
+    # Conservative fallback: keep every line break (no ASI surprises) and only
+    # drop indentation, blank lines and whole-line comments.
+    lines = []
+    in_block_comment = False
+    for line in source.splitlines():
+        stripped = line.strip()
+        if in_block_comment:
+            if '*/' in stripped:
+                in_block_comment = False
+            continue
+        if stripped.startswith('/*') and '*/' not in stripped:
+            in_block_comment = True
+            continue
+        if not stripped or stripped.startswith('//') or (
+                stripped.startswith('/*') and stripped.endswith('*/')):
+            continue
+        lines.append(stripped)
+    return '\n'.join(lines) + '\n'
+
+MINIFIERS = {'.css': minify_css, '.js': minify_js}
+
+# =============================================================================
+# BUILD
+# =============================================================================
+
+def fingerprint(relative_path, content):
+    digest = hashlib.sha256(content).hexdigest()[:HASH_LENGTH]
+    stem, extension = os.path.splitext(relative_path)
+    return f'{stem}.{digest}{extension}'
+
+def precompress(path, content):
+    with open(path + '.gz', 'wb') as handle:
+        # mtime=0 keeps the .gz byte-identical between builds
+        with gzip.GzipFile(fileobj=handle, mode='wb', compresslevel=9, mtime=0) as compressed:
+            compressed.write(content)
+    if brotli is not None:
+        with open(path + '.br', 'wb') as handle:
+            handle.write(brotli.compress(content, quality=11))
+
+def iter_sources():
+    for source_dir in SOURCE_DIRS:
+        for root, _, files in os.walk(os.path.join(STATIC_DIR, source_dir)):
+            for filename in sorted(files):
+                if os.path.splitext(filename)[1] in MINIFIERS:
+                    path = os.path.join(root, filename)
+                    yield os.path.relpath(path, STATIC_DIR).replace(os.sep, '/')
+
+def build(minify=True):
+    shutil.rmtree(DIST_DIR, ignore_errors=True)
+    manifest = {}
+    for relative_path in iter_sources():
+        with open(os.path.join(STATIC_DIR, relative_path), encoding='utf-8') as handle:
+            source = handle.read()
+        if minify:
+            source = MINIFIERS[os.path.splitext(relative_path)[1]](source)
+        content = source.encode('utf-8')
+
+        built_path = 'dist/' + fingerprint(relative_path, content)
+        output = os.path.join(STATIC_DIR, built_path)
+        os.makedirs(os.path.dirname(output), exist_ok=True)
+        with open(output, 'wb') as handle:
+            handle.write(content)
+        precompress(output, content)
+        manifest[relative_path] = built_path
+
+    with open(os.path.join(DIST_DIR, 'manifest.json'), 'w') as handle:
+        json.dump(manifest, handle, indent=2, sort_keys=True)
+    return manifest
+
+def main():
+    parser = argparse.ArgumentParser(description='Build fingerprinted static assets')
+    parser.add_argument('--no-minify', action='store_true', help='copy sources without minifying')
+    args = parser.parse_args()
+
+    manifest = build(minify=not args.no_minify)
+    for source, built in manifest.items():
+        size = os.path.getsize(os.path.join(STATIC_DIR, built))
+        print(f'{source} -> {built} ({size} bytes)')
+    if brotli is None:
+        print('brotli not installed: only .gz files were written')
+
+if __name__ == '__main__':
+    main()
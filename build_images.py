@@ -0,0 +1,115 @@
+# =============================================================================
+# MANOR OF SHADOW - RESPONSIVE IMAGE BUILD
+# =============================================================================
+# Writes resized WebP and AVIF variants of the room art in static/images to
+# static/images/variants, with a content hash in every file name, and records
+# them in static/images/variants/manifest.json for the picture() template
+# helper. Images are never scaled up, and a variant that is not smaller than
+# its source is dropped. Requires Pillow; AVIF is skipped when the installed
+# Pillow cannot encode it.
+#
+#   python build_images.py [--widths 480 960 1600] [--quality 80]
+
+import argparse
+import hashlib
+import io
+import json
+import os
+import shutil
+import sys
+
+try:
+    from PIL import Image, features
+except ImportError:
+    Image = features = None
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+STATIC_DIR = os.path.join(BASE_DIR, 'static')
+IMAGES_DIR = os.path.join(STATIC_DIR, 'images')
+VARIANTS_DIR = os.path.join(IMAGES_DIR, 'variants')
+SOURCE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.webp')
+DEFAULT_WIDTHS = [480, 960, 1600]
+HASH_LENGTH = 12
+
+# Listed best-first: browsers take the first <source> they support
+FORMATS = [
+    ('image/avif', 'AVIF', '.avif'),
+    ('image/webp', 'WEBP', '.webp'),
+]
+
+def available_formats():
+    formats = []
+    for mime_type, pillow_format, extension in FORMATS:
+        if features.check(pillow_format.lower()):
+            formats.append((mime_type, pillow_format, extension))
+    return formats
+
+def encode(image, pillow_format, quality):
+    buffer = io.BytesIO()
+    image.save(buffer, pillow_format, quality=quality)
+    return buffer.getvalue()
+
+def build_variants(filename, widths, quality, formats):
+    source_size = os.path.getsize(os.path.join(IMAGES_DIR, filename))
+    with Image.open(os.path.join(IMAGES_DIR, filename)) as original:
+        original.load()
+        image = original.convert('RGBA' if 'A' in original.getbands() else 'RGB')
+    width, height = image.size
+    stem = os.path.splitext(filename)[0]
+
+    entry = {
+        'fallback': f'images/{filename}',
+        'width': width,
+        'height': height,
+        'sources': {},
+    }
+    targets = sorted({w for w in widths if w < width} | {width})
+    for mime_type, pillow_format, extension in formats:
+        candidates = []
+        for target in targets:
+            resized = image if target == width else image.resize(
+                (target, round(height * target / width)), Image.LANCZOS)
+            content = encode(resized, pillow_format, quality)
+            if len(content) >= source_size:
+                # No saving over the original (it may already be compressed)
+                continue
+            digest = hashlib.sha256(content).hexdigest()[:HASH_LENGTH]
+            variant = f'{stem}-{target}.{digest}{extension}'
+            with open(os.path.join(VARIANTS_DIR, variant), 'wb') as handle:
+                handle.write(content)
+            candidates.append([f'images/variants/{variant}', target, len(content)])
+        if candidates:
+            entry['sources'][mime_type] = candidates
+    return entry
+
+def build(widths=DEFAULT_WIDTHS, quality=80):
+    shutil.rmtree(VARIANTS_DIR, ignore_errors=True)
+    os.makedirs(VARIANTS_DIR)
+    formats = available_formats()
+    manifest = {}
+    for filename in sorted(os.listdir(IMAGES_DIR)):
+        if filename.lower().endswith(SOURCE_EXTENSIONS):
+            manifest[f'images/{filename}'] = build_variants(filename, widths, quality, formats)
+    with open(os.path.join(VARIANTS_DIR, 'manifest.json'), 'w') as handle:
+        json.dump(manifest, handle, indent=2, sort_keys=True)
+    return manifest
+
+def main():
+    parser = argparse.ArgumentParser(description='Build responsive image variants')
+    parser.add_argument('--widths', type=int, nargs='+', default=DEFAULT_WIDTHS)
+    parser.add_argument('--quality', type=int, default=80)
+    args = parser.parse_args()
+
+    if Image is None:
+        sys.exit('Pillow is required: pip install Pillow')
+
+    manifest = build(args.widths, args.quality)
+    for source, entry in manifest.items():
+        original = os.path.getsize(os.path.join(STATIC_DIR, source))
+        print(f'{source} ({entry["width"]}x{entry["height"]}, {original} bytes)')
+        for mime_type, candidates in entry['sources'].items():
+            for path, width, size in candidates:
+                print(f'    {mime_type} {width}w -> {path} ({size} bytes)')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,251 @@
+# =============================================================================
+# MANOR OF SHADOW - PUZZLE VARIANT BUILD
+# =============================================================================
+# Generates number sequences for the laboratory (room3) and logic grids for
+# the control room (final), proves with the solvers below that each one has
+# exactly one answer, and writes them to puzzle_variants.json for app.py.
+# Generation runs in seeded chunks on a process pool, so the same --seed
+# always builds the same store however many workers are used.
+#
+#   python build_puzzles.py [--sequences 200] [--grids 200] [--workers 4] [--seed 1]
+
+import argparse
+import itertools
+import json
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+OUTPUT = os.path.join(BASE_DIR, 'puzzle_variants.json')
+CHUNK_SIZE = 25
+STORE_VERSION = 1
+
+# =============================================================================
+# SEQUENCE PUZZLES
+# =============================================================================
+# Every rule family the laboratory uses. A sequence is only accepted when all
+# families that fit its visible terms predict the same next number.
+
+SHOWN_TERMS = 5
+MAX_TERM = 100000
+
+SEQUENCE_HINTS = {
+    'arithmetic': 'The same amount is added at every step',
+    'geometric': 'Each number multiplies the previous one by the same factor',
+    'fibonacci': 'Each number is the sum of the two before it',
+    'quadratic': 'The gaps between numbers grow by the same amount each step',
+    'affine': 'Each number is the previous one multiplied, then the same amount is added',
+}
+
+def make_sequence(rule, rng):
+    count = SHOWN_TERMS + 1
+    if rule == 'arithmetic':
+        start, step = rng.randint(1, 30), rng.randint(2, 15)
+        return [start + step * i for i in range(count)]
+    if rule == 'geometric':
+        start, ratio = rng.randint(1, 6), rng.randint(2, 4)
+        return [start * ratio ** i for i in range(count)]
+    if rule == 'quadratic':
+        a, b, c = rng.randint(0, 10), rng.randint(0, 6), rng.randint(1, 3)
+        return [a + b * i + c * i * i for i in range(count)]
+    if rule == 'fibonacci':
+        terms = [rng.randint(1, 9), rng.randint(1, 9)]
+        while len(terms) < count:
+            terms.append(terms[-1] + terms[-2])
+        return terms
+    # affine
+    terms = [rng.randint(1, 6)]
+    multiplier, offset = rng.randint(2, 3), rng.randint(1, 5)
+    while len(terms) < count:
+        terms.append(terms[-1] * multiplier + offset)
+    return terms
+
+def predict_next(terms):
+    """Map each rule family that explains ``terms`` to its next number."""
+    predictions = {}
+    differences = [b - a for a, b in zip(terms, terms[1:])]
+
+    if len(set(differences)) == 1:
+        predictions['arithmetic'] = terms[-1] + differences[0]
+
+    if terms[0] and all(b * terms[0] == a * terms[1] for a, b in zip(terms, terms[1:])):
+        ratio, remainder = divmod(terms[1], terms[0])
+        if not remainder:
+            predictions['geometric'] = terms[-1] * ratio
+
+    if all(terms[i] == terms[i - 1] + terms[i - 2] for i in range(2, len(terms))):
+        predictions['fibonacci'] = terms[-1] + terms[-2]
+
+    second = [b - a for a, b in zip(differences, differences[1:])]
+    if len(set(second)) == 1:
+        predictions['quadratic'] = terms[-1] + differences[-1] + second[0]
+
+    # x[n+1] = m * x[n] + c, with m and c taken from the first three terms
+    if differences[0]:
+        multiplier, remainder = divmod(differences[1], differences[0])
+        offset = terms[1] - multiplier * terms[0]
+        if not remainder and all(b == multiplier * a + offset for a, b in zip(terms, terms[1:])):
+            predictions['affine'] = multiplier * terms[-1] + offset
+    return predictions
+
+def generate_sequence(rng):
+    while True:
+        rule = rng.choice(sorted(SEQUENCE_HINTS))
+        terms = make_sequence(rule, rng)
+        shown, answer = terms[:SHOWN_TERMS], terms[SHOWN_TERMS]
+        if answer > MAX_TERM or len(set(shown)) < SHOWN_TERMS:
+            continue
+        predictions = predict_next(shown)
+        if set(predictions.values()) != {answer}:
+            continue
+        return {
+            'sequence': shown + ['?'],
+            'answer': str(answer),
+            'hint': SEQUENCE_HINTS[rule],
+            'rule': rule,
+        }
+
+# =============================================================================
+# LOGIC GRID PUZZLES
+# =============================================================================
+# Three systems and three technicians each map to one of three roles. A
+# candidate solution is (roles by system, roles by technician); clues are
+# (kind, subject, object, holds) lists so they survive the JSON store.
+
+SYSTEMS = ['red', 'blue', 'green']
+TECHNICIANS = ['alex', 'sam', 'taylor']
+ROLES = ['electrician', 'plumber', 'mechanic']
+MIN_CLUES = 4
+
+CANDIDATES = [(systems, technicians)
+              for systems in itertools.permutations(ROLES)
+              for technicians in itertools.permutations(ROLES)]
+
+def clue_holds(clue, candidate):
+    kind, subject, obj, expected = clue
+    systems, technicians = candidate
+    if kind == 'system_role':
+        actual = systems[SYSTEMS.index(subject)] == obj
+    elif kind == 'tech_role':
+        actual = technicians[TECHNICIANS.index(subject)] == obj
+    else:  # system_tech: the technician looks after the system
+        actual = systems[SYSTEMS.index(subject)] == technicians[TECHNICIANS.index(obj)]
+    return actual == expected
+
+def solve_grid(clues):
+    """Every candidate consistent with all clues (exhaustive, 36 candidates)."""
+    return [candidate for candidate in CANDIDATES
+            if all(clue_holds(clue, candidate) for clue in clues)]
+
+def all_clues():
+    for system, role in itertools.product(SYSTEMS, ROLES):
+        yield from (['system_role', system, role, True], ['system_role', system, role, False])
+    for technician, role in itertools.product(TECHNICIANS, ROLES):
+        yield from (['tech_role', technician, role, True], ['tech_role', technician, role, False])
+    for system, technician in itertools.product(SYSTEMS, TECHNICIANS):
+        yield from (['system_tech', system, technician, True], ['system_tech', system, technician, False])
+
+def clue_text(clue):
+    kind, subject, obj, holds = clue
+    if kind == 'system_role':
+        if holds:
+            return f'The {subject.title()} System belongs to the {obj.title()}'
+        return f"The {obj.title()} doesn't have the {subject.title()} System"
+    if kind == 'tech_role':
+        verb = 'is' if holds else "isn't"
+        return f'{subject.title()} {verb} the {obj.title()}'
+    if holds:
+        return f'{obj.title()} looks after the {subject.title()} System'
+    return f"The {subject.title()} System technician isn't {obj.title()}"
+
+def generate_grid(rng):
+    while True:
+        solution = rng.choice(CANDIDATES)
+        truths = [clue for clue in all_clues() if clue_holds(clue, solution)]
+        rng.shuffle(truths)
+
+        # Take clues that still rule something out until one candidate is left
+        chosen, remaining = [], CANDIDATES
+        for clue in truths:
+            narrowed = [candidate for candidate in remaining if clue_holds(clue, candidate)]
+            if len(narrowed) < len(remaining):
+                chosen.append(clue)
+                remaining = narrowed
+                if len(remaining) == 1:
+                    break
+
+        # Then drop every clue the others already imply
+        for clue in list(chosen):
+            rest = [other for other in chosen if other is not clue]
+            if len(solve_grid(rest)) == 1:
+                chosen = rest
+
+        if len(chosen) < MIN_CLUES or solve_grid(chosen) != [solution]:
+            continue
+        systems, technicians = solution
+        answers = {f'{system}_system': role for system, role in zip(SYSTEMS, systems)}
+        answers.update({f'{technician}_role': role for technician, role in zip(TECHNICIANS, technicians)})
+        return {
+            'clues': [clue_text(clue) for clue in chosen],
+            'solution': answers,
+        }
+
+# =============================================================================
+# BUILD
+# =============================================================================
+
+def build_chunk(job):
+    kind, seed, count = job
+    rng = random.Random(seed)
+    generate = generate_sequence if kind == 'laboratory' else generate_grid
+    return kind, [generate(rng) for _ in range(count)]
+
+def chunk_jobs(kind, total, seed):
+    for index, start in enumerate(range(0, total, CHUNK_SIZE)):
+        # Kind and chunk number both feed the seed, so chunks never repeat
+        chunk_seed = f'{seed}:{kind}:{index}'
+        yield kind, chunk_seed, min(CHUNK_SIZE, total - start)
+
+def puzzle_key(kind, variant):
+    if kind == 'laboratory':
+        return json.dumps(variant['sequence'])
+    return json.dumps(sorted(variant['clues']))
+
+def build(sequences=200, grids=200, workers=None, seed=1, output=OUTPUT):
+    jobs = list(chunk_jobs('laboratory', sequences, seed)) + list(chunk_jobs('control', grids, seed))
+    store = {'version': STORE_VERSION, 'seed': seed, 'laboratory': [], 'control': []}
+    seen = set()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        # map() keeps job order, so the store does not depend on scheduling
+        for kind, variants in pool.map(build_chunk, jobs):
+            for variant in variants:
+                key = (kind, puzzle_key(kind, variant))
+                if key not in seen:
+                    seen.add(key)
+                    store[kind].append(variant)
+
+    temporary = output + '.tmp'
+    with open(temporary, 'w') as handle:
+        json.dump(store, handle, indent=1)
+    os.replace(temporary, output)
+    return store
+
+def main():
+    parser = argparse.ArgumentParser(description='Build the room3 and final puzzle variant store')
+    parser.add_argument('--sequences', type=int, default=200)
+    parser.add_argument('--grids', type=int, default=200)
+    parser.add_argument('--workers', type=int, default=None, help='processes (default: one per CPU)')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', default=OUTPUT)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    store = build(args.sequences, args.grids, args.workers, args.seed, args.output)
+    elapsed = time.perf_counter() - started
+    print(f"{len(store['laboratory'])} sequences and {len(store['control'])} logic grids "
+          f"written to {args.output} in {elapsed:.1f}s")
+
+if __name__ == '__main__':
+    main()
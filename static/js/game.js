@@ -320,6 +320,7 @@ class PuzzleManager {
             form.addEventListener('submit', function() {
                 const submitButton = this.querySelector('button[type="submit"]');
                 if (submitButton) {
+                    submitButton.dataset.idleLabel = submitButton.innerHTML;
                     submitButton.classList.add('loading');
                     submitButton.disabled = true;
                     submitButton.innerHTML = 'Processing' + submitButton.innerHTML;
@@ -471,6 +472,134 @@ class SaveManager {
     }
 }
 
+// Room answers over the JSON API (/api/v1): a wrong answer only updates the
+// error message instead of reloading the whole room. Anything unexpected
+// falls back to the plain form POST, which the server still handles.
+class AnswerClient {
+    static rooms = {
+        workshop: 'room1',
+        observatory: 'room2',
+        laboratory: 'room3',
+        control: 'final'
+    };
+
+    static attach(currentRoom) {
+        const room = this.rooms[currentRoom];
+        const form = room && document.querySelector('.puzzle-area form');
+        if (!form || !window.fetch) return;
+        form.addEventListener('submit', event => {
+            event.preventDefault();
+            this.submit(room, form);
+        });
+    }
+
+    static formFields(form) {
+        const fields = {};
+        new FormData(form).forEach((value, name) => {
+            if (name in fields) {
+                fields[name] = [].concat(fields[name], value);
+            } else {
+                fields[name] = form.querySelectorAll(`[name="${name}"]`).length > 1 ? [value] : value;
+            }
+        });
+        return fields;
+    }
+
+    static async submit(room, form) {
+        let response, data;
+        try {
+            response = await fetch(`/api/v1/rooms/${room}/answer`, {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json', 'Accept': 'application/json' },
+                body: JSON.stringify(this.formFields(form))
+            });
+            data = await response.json();
+        } catch (error) {
+            form.submit();
+            return;
+        }
+
+        if (data.next) {
+            window.location.assign(data.next);
+        } else if ((data.success && !data.correct) || response.status === 429) {
+            this.resetButton(form);
+            this.showError(form, data.message);
+        } else {
+            form.submit();
+        }
+    }
+
+    static resetButton(form) {
+        const submitButton = form.querySelector('button[type="submit"]');
+        if (submitButton && submitButton.dataset.idleLabel !== undefined) {
+            submitButton.innerHTML = submitButton.dataset.idleLabel;
+            submitButton.classList.remove('loading');
+            submitButton.disabled = false;
+        }
+    }
+
+    static showError(form, message) {
+        let error = form.parentNode.querySelector('.error-message');
+        if (!error) {
+            error = document.createElement('div');
+            error.className = 'error-message';
+            error.innerHTML = '<span class="error-icon">❌</span><div class="error-content"><p></p></div>';
+            form.insertAdjacentElement('afterend', error);
+        }
+        error.querySelector('.error-content p').textContent = message;
+        error.scrollIntoView({ behavior: 'smooth', block: 'nearest' });
+    }
+}
+
+// Live leaderboards: a [data-live-leaderboard] board subscribes to
+// /events/leaderboard and is redrawn from the pushed snapshot and diffs
+// instead of the page being reloaded. EventSource reconnects (and resumes
+// with Last-Event-ID) on its own.
+class LiveLeaderboard {
+    constructor(container) {
+        this.container = container;
+        this.template = container.querySelector('template');
+        this.places = (container.dataset.places || '').split(' ').filter(Boolean);
+        this.entries = null;
+    }
+
+    connect() {
+        if (!window.EventSource || !this.template) return;
+        this.source = new EventSource('/events/leaderboard');
+        this.source.addEventListener('snapshot', event => {
+            this.entries = JSON.parse(event.data).entries;
+            this.render();
+        });
+        this.source.addEventListener('update', event => {
+            if (!this.entries) return;
+            const update = JSON.parse(event.data);
+            update.changes.forEach(([rank, entry]) => {
+                this.entries[rank] = entry;
+            });
+            this.entries.length = update.size;
+            this.render();
+        });
+    }
+
+    render() {
+        const parent = this.template.parentNode;
+        parent.querySelectorAll('[data-leaderboard-row]').forEach(row => row.remove());
+        this.entries.forEach((entry, index) => {
+            const row = this.template.content.firstElementChild.cloneNode(true);
+            if (this.places[index]) row.classList.add(this.places[index]);
+            row.querySelector('.rank').textContent = `#${index + 1}`;
+            row.querySelector('.name, .player-name').textContent = entry.player_name;
+            row.querySelector('.time').textContent = entry.total_time;
+            parent.insertBefore(row, this.template);
+        });
+
+        const empty = this.entries.length === 0;
+        const scope = this.container.parentNode;
+        scope.querySelectorAll('[data-leaderboard-empty]').forEach(el => { el.hidden = !empty; });
+        scope.querySelectorAll('[data-leaderboard-filled]').forEach(el => { el.hidden = empty; });
+    }
+}
+
 // Global functions for template use
 function quickSave() {
     return SaveManager.quickSave();
@@ -513,6 +642,11 @@ document.addEventListener('DOMContentLoaded', function() {
     window.authManager = authManager;
     window.SaveManager = SaveManager;
     
+    AnswerClient.attach(puzzleManager.currentRoom);
+    document.querySelectorAll('[data-live-leaderboard]').forEach(board => {
+        new LiveLeaderboard(board).connect();
+    });
+    
     // Start timer if in game room and authenticated
     if (puzzleManager.currentRoom !== 'entrance' && 
         !window.location.pathname.includes('auth') &&
@@ -533,8 +667,9 @@ document.addEventListener('DOMContentLoaded', function() {
     // Add auto-save on page unload
     window.addEventListener('beforeunload', function() {
         if (puzzleManager.currentRoom !== 'entrance' && authManager.isAuthenticated()) {
-            // Quick save without waiting for response
-            fetch('/quick_save').catch(() => {}); // Silent fail
+            // Quick save without waiting for response; the server skips
+            // states it has already saved
+            fetch('/quick_save', { keepalive: true }).catch(() => {}); // Silent fail
         }
     });
     
@@ -548,5 +683,5 @@ window.addEventListener('error', function(e) {
 
 // Export for module use (if needed)
 if (typeof module !== 'undefined' && module.exports) {
-    module.exports = { GameTimer, PuzzleManager, AuthManager, SaveManager };
+    module.exports = { GameTimer, PuzzleManager, AuthManager, SaveManager, AnswerClient, LiveLeaderboard };
 }
\ No newline at end of file
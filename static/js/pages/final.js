@@ -0,0 +1,137 @@
+// Create control room background
+function createControlBackground() {
+    const controlBg = document.getElementById('controlBg');
+    const nodeCount = 50;
+    
+    for (let i = 0; i < nodeCount; i++) {
+        const node = document.createElement('div');
+        node.className = 'control-node';
+        
+        // Random properties
+        const size = Math.random() * 8 + 2;
+        const left = Math.random() * 100;
+        const top = Math.random() * 100;
+        const delay = Math.random() * 5;
+        const duration = Math.random() * 3 + 2;
+        
+        // Color based on position
+        const colors = [
+            'rgba(255, 0, 0, 0.3)',    // Red
+            'rgba(0, 100, 255, 0.3)',  // Blue
+            'rgba(0, 255, 100, 0.3)'   // Green
+        ];
+        const colorIndex = Math.floor(left / 33.3);
+        
+        node.style.width = `${size}px`;
+        node.style.height = `${size}px`;
+        node.style.left = `${left}%`;
+        node.style.top = `${top}%`;
+        node.style.background = colors[colorIndex];
+        node.style.animationDelay = `${delay}s`;
+        node.style.animationDuration = `${duration}s`;
+        
+        controlBg.appendChild(node);
+    }
+}
+
+document.addEventListener('DOMContentLoaded', function() {
+    createControlBackground();
+    
+    const selects = document.querySelectorAll('.cosmic-select');
+    const submitBtn = document.querySelector('.cosmic-btn');
+    
+    // Enhanced selection validation
+    selects.forEach(select => {
+        select.addEventListener('change', function() {
+            validateLogicSelection(this);
+            updateButtonState();
+        });
+        
+        // Add focus effects
+        select.addEventListener('focus', function() {
+            this.parentElement.classList.add('input-focused');
+            this.parentElement.querySelector('.select-glow').style.opacity = '1';
+        });
+        
+        select.addEventListener('blur', function() {
+            this.parentElement.classList.remove('input-focused');
+            this.parentElement.querySelector('.select-glow').style.opacity = '0.3';
+        });
+    });
+
+    function validateLogicSelection(changedSelect) {
+        const allSelects = Array.from(selects);
+        const values = allSelects.map(s => s.value).filter(v => v);
+        const duplicates = values.filter((value, index) => values.indexOf(value) !== index);
+        
+        allSelects.forEach(select => {
+            const parent = select.parentElement;
+            const glow = parent.querySelector('.select-glow');
+            
+            if (duplicates.includes(select.value) && select.value) {
+                select.style.borderColor = '#ff6b6b';
+                glow.style.background = 'linear-gradient(45deg, rgba(255, 107, 107, 0.6), rgba(255, 0, 0, 0.3))';
+            } else if (select.value) {
+                select.style.borderColor = '#4caf50';
+                glow.style.background = 'linear-gradient(45deg, rgba(76, 175, 80, 0.6), rgba(0, 255, 100, 0.3))';
+            } else {
+                select.style.borderColor = '#666';
+                glow.style.background = 'linear-gradient(45deg, rgba(74, 144, 226, 0.6), rgba(123, 104, 238, 0.3))';
+            }
+        });
+    }
+    
+    function updateButtonState() {
+        const allFilled = Array.from(selects).every(select => select.value);
+        const values = Array.from(selects).map(s => s.value).filter(v => v);
+        const noDuplicates = new Set(values).size === values.length;
+        
+        if (allFilled && noDuplicates) {
+            submitBtn.style.background = 'linear-gradient(135deg, #4caf50, #45a049)';
+            submitBtn.style.boxShadow = '0 4px 15px rgba(76, 175, 80, 0.4)';
+        } else {
+            submitBtn.style.background = 'linear-gradient(135deg, rgba(165, 42, 42, 0.9), rgba(205, 92, 92, 0.9))';
+            submitBtn.style.boxShadow = '0 4px 15px rgba(165, 42, 42, 0.4)';
+        }
+    }
+    
+    // Interactive clue cards
+    const clueCards = document.querySelectorAll('.control-clue');
+    clueCards.forEach(card => {
+        card.addEventListener('click', function() {
+            this.classList.toggle('clue-active');
+        });
+    });
+    
+    // Initial validation
+    validateLogicSelection();
+    updateButtonState();
+});
+
+// Enhanced animations for control room
+const controlStyles = document.createElement('style');
+controlStyles.textContent = `
+    @keyframes systemPulse {
+        0%, 100% { transform: scale(1); opacity: 0.7; }
+        50% { transform: scale(1.05); opacity: 1; }
+    }
+    
+    @keyframes glowPulse {
+        0%, 100% { box-shadow: 0 0 5px currentColor; }
+        50% { box-shadow: 0 0 20px currentColor; }
+    }
+    
+    .red-glow { animation: glowPulse 2s ease-in-out infinite; color: #ff4444; }
+    .blue-glow { animation: glowPulse 2s ease-in-out infinite 0.3s; color: #4444ff; }
+    .green-glow { animation: glowPulse 2s ease-in-out infinite 0.6s; color: #44ff44; }
+    
+    .control-clue.clue-active {
+        animation: systemPulse 1s ease-in-out;
+        border-color: #4a90e2 !important;
+    }
+    
+    .input-focused .cosmic-select {
+        transform: scale(1.02);
+    }
+`;
+document.head.appendChild(controlStyles);
@@ -0,0 +1,173 @@
+document.addEventListener('DOMContentLoaded', function() {
+    const selects = document.querySelectorAll('.part-select');
+    const partCards = document.querySelectorAll('.part-card');
+    const preview = document.querySelector('.preview-sequence');
+    const statusIndicators = document.querySelectorAll('.status-indicator');
+    const statusTexts = document.querySelectorAll('.status-text');
+    
+    // Enhanced select interactions
+    selects.forEach((select, index) => {
+        select.addEventListener('change', function() {
+            const selectedValue = this.value;
+            const selectedOption = this.options[this.selectedIndex];
+            const description = selectedOption.getAttribute('data-description');
+            
+            // Update slot status
+            updateSlotStatus(this.parentElement, selectedValue);
+            
+            // Clear duplicate selections with animation
+            selects.forEach((otherSelect, otherIndex) => {
+                if (otherIndex !== index && otherSelect.value === selectedValue) {
+                    otherSelect.parentElement.classList.add('slot-clearing');
+                    setTimeout(() => {
+                        otherSelect.value = '';
+                        updateSlotStatus(otherSelect.parentElement, '');
+                        otherSelect.parentElement.classList.remove('slot-clearing');
+                    }, 300);
+                }
+            });
+            
+            updateAssemblyPreview();
+        });
+        
+        // Enhanced hover effects
+        select.addEventListener('mouseenter', function() {
+            if (!this.value) {
+                this.parentElement.classList.add('slot-hover');
+            }
+        });
+        
+        select.addEventListener('mouseleave', function() {
+            this.parentElement.classList.remove('slot-hover');
+        });
+    });
+
+    // Enhanced part cards with better interactions
+    partCards.forEach(card => {
+        card.addEventListener('click', function() {
+            const code = this.dataset.code;
+            const emptySlot = Array.from(selects).find(select => !select.value);
+            
+            if (emptySlot) {
+                // Find the option with this code
+                const options = Array.from(emptySlot.options);
+                const targetOption = options.find(opt => opt.value === code);
+                
+                if (targetOption) {
+                    emptySlot.value = code;
+                    emptySlot.dispatchEvent(new Event('change'));
+                    
+                    // Enhanced card animation
+                    this.classList.add('card-selected');
+                    setTimeout(() => {
+                        this.classList.remove('card-selected');
+                    }, 1000);
+                }
+            } else {
+                // Show "no empty slots" feedback
+                this.classList.add('card-error');
+                setTimeout(() => {
+                    this.classList.remove('card-error');
+                }, 1000);
+            }
+        });
+        
+        // Enhanced hover effects
+        card.addEventListener('mouseenter', function() {
+            this.style.transform = 'translateY(-8px) scale(1.02)';
+            this.style.boxShadow = '0 10px 25px rgba(255, 215, 0, 0.4)';
+        });
+        
+        card.addEventListener('mouseleave', function() {
+            this.style.transform = 'translateY(0) scale(1)';
+            this.style.boxShadow = '';
+        });
+    });
+
+    function updateSlotStatus(slotElement, value) {
+        const statusIndicator = slotElement.querySelector('.status-indicator');
+        const statusText = slotElement.querySelector('.status-text');
+        
+        if (value) {
+            statusIndicator.textContent = '✅';
+            statusText.textContent = 'Filled';
+            statusText.style.color = '#4caf50';
+            slotElement.classList.add('slot-filled');
+            slotElement.classList.remove('slot-empty');
+        } else {
+            statusIndicator.textContent = '⏳';
+            statusText.textContent = 'Empty';
+            statusText.style.color = '#ff9800';
+            slotElement.classList.add('slot-empty');
+            slotElement.classList.remove('slot-filled');
+        }
+    }
+
+    function updateAssemblyPreview() {
+        const sequence = Array.from(selects).map(select => select.value).filter(val => val);
+        const previewElement = document.getElementById('assembly-preview');
+        
+        if (preview) {
+            if (sequence.length > 0) {
+                const sequenceHTML = sequence.map(item => 
+                    `<span class="sequence-part">${item}</span>`
+                ).join(' <span class="sequence-arrow">➡️</span> ');
+                
+                preview.innerHTML = sequenceHTML;
+                previewElement.classList.add('preview-active');
+                previewElement.classList.remove('preview-inactive');
+            } else {
+                preview.innerHTML = '<span class="preview-placeholder">🎯 Select parts to begin assembly...</span>';
+                previewElement.classList.add('preview-inactive');
+                previewElement.classList.remove('preview-active');
+            }
+        }
+    }
+    
+    // Initialize all slot statuses
+    selects.forEach(select => {
+        updateSlotStatus(select.parentElement, select.value);
+    });
+    updateAssemblyPreview();
+});
+
+// Enhanced CSS animations
+const enhancedStyles = document.createElement('style');
+enhancedStyles.textContent = `
+    @keyframes pulseGlow {
+        0% { box-shadow: 0 0 5px rgba(76, 175, 80, 0.5); }
+        50% { box-shadow: 0 0 20px rgba(76, 175, 80, 0.8); }
+        100% { box-shadow: 0 0 5px rgba(76, 175, 80, 0.5); }
+    }
+    
+    @keyframes bounceIn {
+        0% { transform: scale(0.8); opacity: 0; }
+        60% { transform: scale(1.1); }
+        100% { transform: scale(1); opacity: 1; }
+    }
+    
+    @keyframes shake {
+        0%, 100% { transform: translateX(0); }
+        25% { transform: translateX(-5px); }
+        75% { transform: translateX(5px); }
+    }
+    
+    .card-selected {
+        animation: pulseGlow 1s ease-in-out;
+    }
+    
+    .card-error {
+        animation: shake 0.5s ease-in-out;
+        background: rgba(244, 67, 54, 0.2) !important;
+    }
+    
+    .slot-clearing {
+        animation: shake 0.3s ease-in-out;
+    }
+    
+    .slot-hover {
+        transform: translateY(-2px);
+        transition: all 0.3s ease;
+    }
+`;
+document.head.appendChild(enhancedStyles);
@@ -0,0 +1,153 @@
+document.addEventListener('DOMContentLoaded', function() {
+    const answerInput = document.getElementById('riddle_answer');
+    const clueCards = document.querySelectorAll('.clue-card');
+    const feedbackMessage = document.querySelector('.feedback-text');
+    const feedbackIcon = document.querySelector('.feedback-icon');
+    
+    // Enhanced input interactions
+    if (answerInput) {
+        answerInput.addEventListener('input', function() {
+            const answer = this.value.toLowerCase().trim();
+            
+            if (answer.includes('echo')) {
+                this.style.borderColor = '#4caf50';
+                this.style.background = 'linear-gradient(135deg, rgba(76, 175, 80, 0.1), rgba(76, 175, 80, 0.05))';
+                this.style.boxShadow = '0 0 15px rgba(76, 175, 80, 0.3)';
+                
+                // Update feedback
+                feedbackIcon.textContent = '✅';
+                feedbackMessage.textContent = 'Good thinking! This might be the answer...';
+                feedbackMessage.style.color = '#4caf50';
+            } else if (answer.length > 0) {
+                this.style.borderColor = '#ff9800';
+                this.style.background = 'linear-gradient(135deg, rgba(255, 152, 0, 0.1), rgba(255, 152, 0, 0.05))';
+                this.style.boxShadow = '0 0 10px rgba(255, 152, 0, 0.2)';
+                
+                // Update feedback
+                feedbackIcon.textContent = '💭';
+                feedbackMessage.textContent = 'Keep thinking about sound repetition...';
+                feedbackMessage.style.color = '#ff9800';
+            } else {
+                this.style.borderColor = '#666';
+                this.style.background = '';
+                this.style.boxShadow = 'none';
+                
+                // Reset feedback
+                feedbackIcon.textContent = '🎯';
+                feedbackMessage.textContent = 'Your answer will be checked for accuracy';
+                feedbackMessage.style.color = '#ccc';
+            }
+        });
+        
+        // Enhanced focus effects
+        answerInput.addEventListener('focus', function() {
+            this.parentElement.classList.add('input-focused');
+        });
+        
+        answerInput.addEventListener('blur', function() {
+            this.parentElement.classList.remove('input-focused');
+        });
+    }
+
+    // Interactive clue cards
+    clueCards.forEach(card => {
+        let isRevealed = false;
+        
+        card.addEventListener('click', function() {
+            const revealElement = this.querySelector('.clue-reveal');
+            
+            if (!isRevealed) {
+                // Reveal the clue
+                revealElement.style.display = 'flex';
+                this.classList.add('clue-revealed');
+                this.style.transform = 'scale(1.05)';
+                
+                // Add success animation
+                this.classList.add('clue-success');
+                setTimeout(() => {
+                    this.classList.remove('clue-success');
+                }, 1000);
+                
+                isRevealed = true;
+            } else {
+                // Hide the clue
+                revealElement.style.display = 'none';
+                this.classList.remove('clue-revealed');
+                this.style.transform = 'scale(1)';
+                isRevealed = false;
+            }
+        });
+        
+        // Enhanced hover effects
+        card.addEventListener('mouseenter', function() {
+            if (!this.classList.contains('clue-revealed')) {
+                this.style.transform = 'translateY(-5px) scale(1.02)';
+                this.style.boxShadow = '0 8px 20px rgba(255, 215, 0, 0.3)';
+            }
+        });
+        
+        card.addEventListener('mouseleave', function() {
+            if (!this.classList.contains('clue-revealed')) {
+                this.style.transform = 'translateY(0) scale(1)';
+                this.style.boxShadow = '';
+            }
+        });
+    });
+    
+    // Add typing effect to riddle text
+    const riddleText = document.querySelector('.riddle-text');
+    if (riddleText) {
+        const originalText = riddleText.textContent;
+        riddleText.textContent = '';
+        
+        let i = 0;
+        const typeWriter = () => {
+            if (i < originalText.length) {
+                riddleText.textContent += originalText.charAt(i);
+                i++;
+                setTimeout(typeWriter, 30);
+            }
+        };
+        
+        // Start typing effect after a short delay
+        setTimeout(typeWriter, 1000);
+    }
+});
+
+// Enhanced CSS animations for room2
+const observatoryStyles = document.createElement('style');
+observatoryStyles.textContent = `
+    @keyframes typewriter {
+        from { width: 0; }
+        to { width: 100%; }
+    }
+    
+    @keyframes blink {
+        0%, 50% { opacity: 1; }
+        51%, 100% { opacity: 0; }
+    }
+    
+    @keyframes float {
+        0%, 100% { transform: translateY(0); }
+        50% { transform: translateY(-10px); }
+    }
+    
+    @keyframes sparkle {
+        0%, 100% { opacity: 0; transform: scale(0); }
+        50% { opacity: 1; transform: scale(1); }
+    }
+    
+    .clue-success {
+        animation: pulseGlow 1s ease-in-out;
+    }
+    
+    .typing-cursor::after {
+        content: '|';
+        animation: blink 1s infinite;
+    }
+    
+    .floating {
+        animation: float 3s ease-in-out infinite;
+    }
+`;
+document.head.appendChild(observatoryStyles);
@@ -0,0 +1,252 @@
+document.addEventListener('DOMContentLoaded', function() {
+    const answerInput = document.getElementById('pattern_answer');
+    const analysisTools = document.querySelectorAll('.analysis-tool');
+    const sequenceItems = document.querySelectorAll('.sequence-item');
+    const confidenceFill = document.querySelector('.confidence-fill');
+    const confidenceValue = document.querySelector('.confidence-value');
+    const feedbackText = document.querySelector('.feedback-text');
+    const feedbackIcon = document.querySelector('.feedback-icon');
+    
+    let currentPattern = null;
+    let userConfidence = 0;
+
+    // Initialize pattern analysis
+    analyzePattern();
+
+    // Enhanced input interactions
+    if (answerInput) {
+        answerInput.addEventListener('input', function() {
+            const userAnswer = parseInt(this.value);
+            
+            if (!isNaN(userAnswer)) {
+                checkPatternPrediction(userAnswer);
+                updateConfidence(userAnswer);
+            } else {
+                resetFeedback();
+            }
+        });
+        
+        // Enhanced focus effects
+        answerInput.addEventListener('focus', function() {
+            this.parentElement.classList.add('input-focused');
+        });
+        
+        answerInput.addEventListener('blur', function() {
+            this.parentElement.classList.remove('input-focused');
+        });
+    }
+
+    // Interactive analysis tools
+    analysisTools.forEach(tool => {
+        tool.addEventListener('click', function() {
+            const toolType = this.dataset.tool;
+            performAnalysis(toolType);
+            this.classList.add('tool-active');
+            
+            setTimeout(() => {
+                this.classList.remove('tool-active');
+            }, 1000);
+        });
+        
+        // Enhanced hover effects
+        tool.addEventListener('mouseenter', function() {
+            this.style.transform = 'translateY(-3px)';
+            this.style.boxShadow = '0 5px 15px rgba(76, 175, 80, 0.3)';
+        });
+        
+        tool.addEventListener('mouseleave', function() {
+            this.style.transform = 'translateY(0)';
+            this.style.boxShadow = '';
+        });
+    });
+
+    // Enhanced sequence item interactions
+    sequenceItems.forEach(item => {
+        if (!item.classList.contains('missing')) {
+            item.addEventListener('mouseenter', function() {
+                this.style.transform = 'scale(1.05)';
+                this.style.zIndex = '10';
+            });
+            
+            item.addEventListener('mouseleave', function() {
+                this.style.transform = 'scale(1)';
+                this.style.zIndex = '1';
+            });
+            
+            item.addEventListener('click', function() {
+                this.classList.add('item-highlight');
+                setTimeout(() => {
+                    this.classList.remove('item-highlight');
+                }, 1000);
+            });
+        }
+    });
+
+    function analyzePattern() {
+        const numbers = Array.from(document.querySelectorAll('.sequence-item:not(.missing) .number'))
+            .map(el => parseInt(el.textContent));
+        
+        currentPattern = {
+            numbers: numbers,
+            type: 'unknown',
+            difference: null,
+            ratio: null,
+            expectedNext: null
+        };
+        
+        // Analyze arithmetic pattern
+        if (numbers.length >= 3) {
+            const differences = [];
+            for (let i = 1; i < numbers.length; i++) {
+                differences.push(numbers[i] - numbers[i-1]);
+            }
+            
+            if (differences.every(diff => diff === differences[0])) {
+                currentPattern.type = 'arithmetic';
+                currentPattern.difference = differences[0];
+                currentPattern.expectedNext = numbers[numbers.length - 1] + differences[0];
+            }
+        }
+        
+        // Analyze geometric pattern
+        if (currentPattern.type === 'unknown' && numbers.length >= 3) {
+            const ratios = [];
+            for (let i = 1; i < numbers.length; i++) {
+                ratios.push(numbers[i] / numbers[i-1]);
+            }
+            
+            if (ratios.every(ratio => Math.abs(ratio - ratios[0]) < 0.001)) {
+                currentPattern.type = 'geometric';
+                currentPattern.ratio = ratios[0];
+                currentPattern.expectedNext = numbers[numbers.length - 1] * ratios[0];
+            }
+        }
+        
+        // Analyze Fibonacci-like pattern
+        if (currentPattern.type === 'unknown' && numbers.length >= 4) {
+            let isFibonacci = true;
+            for (let i = 2; i < numbers.length; i++) {
+                if (numbers[i] !== numbers[i-2] + numbers[i-1]) {
+                    isFibonacci = false;
+                    break;
+                }
+            }
+            
+            if (isFibonacci) {
+                currentPattern.type = 'fibonacci';
+                currentPattern.expectedNext = numbers[numbers.length - 2] + numbers[numbers.length - 1];
+            }
+        }
+    }
+
+    function checkPatternPrediction(userAnswer) {
+        if (!currentPattern || !currentPattern.expectedNext) return;
+        
+        const difference = Math.abs(userAnswer - currentPattern.expectedNext);
+        const tolerance = Math.max(1, currentPattern.expectedNext * 0.1); // 10% tolerance
+        
+        if (difference <= tolerance) {
+            answerInput.style.borderColor = '#4caf50';
+            answerInput.style.background = 'linear-gradient(135deg, rgba(76, 175, 80, 0.1), rgba(76, 175, 80, 0.05))';
+            answerInput.style.boxShadow = '0 0 15px rgba(76, 175, 80, 0.3)';
+            
+            feedbackIcon.textContent = '✅';
+            feedbackText.textContent = 'Great prediction! This matches the pattern.';
+            feedbackText.style.color = '#4caf50';
+        } else {
+            answerInput.style.borderColor = '#ff9800';
+            answerInput.style.background = 'linear-gradient(135deg, rgba(255, 152, 0, 0.1), rgba(255, 152, 0, 0.05))';
+            answerInput.style.boxShadow = '0 0 10px rgba(255, 152, 0, 0.2)';
+            
+            feedbackIcon.textContent = '💭';
+            feedbackText.textContent = 'Check the pattern relationships again.';
+            feedbackText.style.color = '#ff9800';
+        }
+    }
+
+    function updateConfidence(userAnswer) {
+        if (!currentPattern || !currentPattern.expectedNext) {
+            userConfidence = 0;
+        } else {
+            const difference = Math.abs(userAnswer - currentPattern.expectedNext);
+            const maxDifference = Math.max(10, currentPattern.expectedNext * 0.5);
+            userConfidence = Math.max(0, 100 - (difference / maxDifference) * 100);
+        }
+        
+        confidenceFill.style.width = `${userConfidence}%`;
+        confidenceValue.textContent = `${Math.round(userConfidence)}%`;
+        
+        // Update confidence bar color
+        if (userConfidence >= 80) {
+            confidenceFill.style.background = 'linear-gradient(135deg, #4caf50, #45a049)';
+        } else if (userConfidence >= 50) {
+            confidenceFill.style.background = 'linear-gradient(135deg, #ff9800, #f57c00)';
+        } else {
+            confidenceFill.style.background = 'linear-gradient(135deg, #f44336, #d32f2f)';
+        }
+    }
+
+    function performAnalysis(toolType) {
+        // Visual feedback for analysis
+        const missingItem = document.querySelector('.sequence-item.missing');
+        if (missingItem) {
+            missingItem.classList.add('analyzing');
+            setTimeout(() => {
+                missingItem.classList.remove('analyzing');
+            }, 500);
+        }
+        
+        // Could add more sophisticated analysis feedback here
+    }
+
+    function resetFeedback() {
+        answerInput.style.borderColor = '#666';
+        answerInput.style.background = '';
+        answerInput.style.boxShadow = 'none';
+        
+        feedbackIcon.textContent = '🎯';
+        feedbackText.textContent = 'Analyze the pattern carefully';
+        feedbackText.style.color = '#ccc';
+        
+        confidenceFill.style.width = '0%';
+        confidenceValue.textContent = '0%';
+    }
+});
+
+// Enhanced CSS animations for laboratory
+const laboratoryStyles = document.createElement('style');
+laboratoryStyles.textContent = `
+    @keyframes chemicalReaction {
+        0% { transform: scale(1); background: #4caf50; }
+        50% { transform: scale(1.1); background: #ffeb3b; }
+        100% { transform: scale(1); background: #4caf50; }
+    }
+    
+    @keyframes analyzingPulse {
+        0%, 100% { opacity: 1; }
+        50% { opacity: 0.7; }
+    }
+    
+    @keyframes numberPop {
+        0% { transform: scale(0.8); opacity: 0; }
+        70% { transform: scale(1.1); }
+        100% { transform: scale(1); opacity: 1; }
+    }
+    
+    .item-highlight {
+        animation: chemicalReaction 1s ease-in-out;
+    }
+    
+    .tool-active {
+        animation: chemicalReaction 0.5s ease-in-out;
+    }
+    
+    .analyzing {
+        animation: analyzingPulse 0.5s ease-in-out infinite;
+    }
+    
+    .sequence-item .number {
+        animation: numberPop 0.5s ease-out;
+    }
+`;
+document.head.appendChild(laboratoryStyles);
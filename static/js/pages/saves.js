@@ -0,0 +1,15 @@
+function quickSave() {
+    fetch('/quick_save')
+        .then(response => response.json())
+        .then(data => {
+            if (data.success) {
+                alert('Game saved successfully!');
+                location.reload();
+            } else {
+                alert('Save failed: ' + data.message);
+            }
+        })
+        .catch(error => {
+            alert('Error: ' + error.message);
+        });
+}